@@ -0,0 +1,119 @@
+"""
+Admission control for the LLM pipelines.
+
+Every pipeline competes for the same LLM rate limit and CPU, so running all requests of
+a burst at once only makes all of them slow. The controller runs at most `limit`
+pipelines at a time and queues the rest by priority (interactive before batch, then
+arrival order). When the queue is full, callers are turned away with an estimate of
+when to retry, based on recent pipeline durations.
+
+The controller lives on the event loop and is not thread-safe.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Server busy: admission queue is full. Retry in {retry_after}s.")
+        self.retry_after = retry_after
+
+class AdmissionController:
+    def __init__(self, limit, max_queue):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = {name: 0 for name in PRIORITIES}
+        # (priority, arrival, future, name); abandoned entries are skipped on release
+        self._queue = []
+        self._arrivals = itertools.count()
+        self._waits = deque(maxlen=200)
+        self._service_s = None
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def queued(self):
+        return sum(self.waiting.values())
+
+    def retry_after(self):
+        """
+        Seconds until a slot is likely free for a new arrival: the queue ahead of it drains
+        `limit` pipelines per average pipeline duration.
+        """
+        service = self._service_s or 5.0
+        return max(1, math.ceil(service * (self.queued() + 1) / max(1, self.limit)))
+
+    async def acquire(self, priority="interactive", timeout=None):
+        """
+        Waits for a pipeline slot. Returns the seconds spent queued. Raises QueueFull when
+        the queue is full, asyncio.TimeoutError if no slot frees up within `timeout`.
+        Every successful acquire must be paired with release().
+        """
+        if not self.limit or (self.active < self.limit and not self.queued()):
+            self.active += 1
+            self.admitted += 1
+            self._waits.append(0.0)
+            return 0.0
+        if self.queued() >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull(self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (PRIORITIES[priority], next(self._arrivals), future, priority))
+        self.waiting[priority] += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(future, timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # Granted just as the caller gave up: hand the slot on
+                self.release()
+            else:
+                future.cancel()
+                self.waiting[priority] -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+            raise
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self._waits.append(waited)
+        return waited
+
+    def release(self, service_s=None):
+        """
+        Frees a slot, passing it straight to the first live waiter if there is one.
+        service_s (the pipeline's duration) feeds the Retry-After estimate.
+        """
+        if service_s is not None:
+            self._service_s = service_s if self._service_s is None else 0.8 * self._service_s + 0.2 * service_s
+        while self._queue:
+            _, _, future, name = heapq.heappop(self._queue)
+            if not future.cancelled():
+                self.waiting[name] -= 1
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self):
+        waits = sorted(self._waits)
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queue_depth": self.queued(),
+            "queued_by_priority": dict(self.waiting),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            # Over the last admitted requests
+            "avg_wait_s": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "p95_wait_s": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+            "max_wait_s": round(waits[-1], 3) if waits else 0.0,
+            "avg_pipeline_s": round(self._service_s, 3) if self._service_s is not None else None,
+        }
@@ -1,33 +1,16 @@
-from openai import OpenAI
 try:
-    import config
+    import compactor
+    import llm
+    import prompts
+    import topics
 except ImportError:
-    from . import config
+    from . import compactor
+    from . import llm
+    from . import prompts
+    from . import topics
 
-def get_client():
-    api_key = config.OPENAI_API_KEY
-    if not api_key:
-        print("Warning: OPENAI_API_KEY is not set.")
-        return None
-    return OpenAI(api_key=api_key)
-
-client = None # Lazy init inside functions
-
-def align_documents(doc_a_content, doc_b_content):
-    """
-    Aligns two documents using GPT-5.
-    """
-    prompt = f"""
-You are a legal document alignment expert. Your task is to align two legal documents based on similar content and topics.
-
-Input:
-=== DOCUMENT A START ===
-{doc_a_content}
-=== DOCUMENT A END ===
-
-=== DOCUMENT B START ===
-{doc_b_content}
-=== DOCUMENT B END ===
+# Constant across calls: with the target block right after it, it forms the reusable prompt prefix
+INSTRUCTIONS = """You are a precise legal assistant and legal document alignment expert. Your task is to align two legal documents based on similar content and topics. The user message contains Document A followed by Document B.
 
 Instructions:
 1. Identify similar content or topics between the two documents (e.g., Definitions, Confidentiality Obligations, Term, Termination, Governing Law, etc.).
@@ -42,6 +25,7 @@ Instructions:
 Rules:
 - The text extracted must be an EXACT copy of the content in the original document, including punctuation, whitespace, and NEWLINES.
 - Do NOT fix line breaks, typos, spacing errors, or PDF extraction artifacts (e.g., "discussi ons"). Copy it exactly as it appears in the input text.
+- Clause numbers and headings (e.g. "1.", "Section 2", "Article IV") are part of the clause: copy them exactly as well.
 - If the text is interrupted by page numbers, headers, or footers (e.g. "Page 1 of 10"), INCLUDE them in the extraction if they appear within the text block in the input.
 - Do not paraphrase or summarize.
 - If a topic is present in one but not the other, you can skip it or mark the missing one as "N/A".
@@ -49,21 +33,27 @@ Rules:
 - Output ONLY the alignments.
 """
 
+def _document_block(text, label):
+    return f"=== DOCUMENT {label} START ===\n{compactor.get_compacted(text).text}\n=== DOCUMENT {label} END ==="
+
+def align_documents(doc_a_content, doc_b_content):
+    """
+    Aligns two documents using GPT-5.
+    The documents are compacted for the prompt; use restore_alignments on the parsed
+    result to map the extracted clauses back to the original text.
+    Document A (the target) comes first, so calls sharing it share a prompt prefix.
+    """
+    messages, prefix_tokens = prompts.build(
+        INSTRUCTIONS,
+        prompts.target_block(doc_a_content, "standard", lambda t: _document_block(t, "A")),
+        _document_block(doc_b_content, "B"),
+    )
+
     try:
-        global client
-        if not client:
-            client = get_client()
-        
-        if not client:
+        if not llm.get_client():
             return "Error: OPENAI_API_KEY not configured."
 
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",  # Use a valid model name (gpt-5 isn't public yet)
-            messages=[
-                {"role": "system", "content": "You are a precise legal assistant."},
-                {"role": "user", "content": prompt}
-            ]
-        )
+        response = llm.chat_completion(messages=messages, prefix_tokens=prefix_tokens)
         return response.choices[0].message.content
     except Exception as e:
         print(f"Error calling LLM: {e}")
@@ -73,6 +63,7 @@ def parse_alignments(alignment_text):
     """
     Parses the alignment output into a structured format.
     Returns a list of dicts: [{'topic': ..., 'doc_a': ..., 'doc_b': ...}]
+    Topic names are canonicalized (see topics.py).
     """
     alignments = []
     # Split by semicolon
@@ -109,7 +100,8 @@ def parse_alignments(alignment_text):
                 content_b = rest[idx_doc_b + 8 :].strip()
                 
                 alignments.append({
-                    'topic': topic,
+                    'topic': topics.canonical(topic),
+                    'model_topic': topics.clean(topic),
                     'doc_a': content_a,
                     'doc_b': content_b
                 })
@@ -117,3 +109,14 @@ def parse_alignments(alignment_text):
             print(f"Error parsing item '{item}': {e}")
             
     return alignments
+
+def restore_alignments(alignments, doc_a_content, doc_b_content):
+    """
+    Maps clauses copied from the compacted prompt text back to the exact original text.
+    """
+    compact_a = compactor.get_compacted(doc_a_content)
+    compact_b = compactor.get_compacted(doc_b_content)
+    for align in alignments:
+        align['doc_a'] = compactor.restore_clause(compact_a, align['doc_a'])
+        align['doc_b'] = compactor.restore_clause(compact_b, align['doc_b'])
+    return alignments
@@ -1,37 +1,28 @@
-from openai import OpenAI
 import re
 
 try:
     import config
+    import compactor
+    import deadlines
+    import fuzzy
+    import llm
+    import prompts
+    import topics
 except ImportError:
     from . import config
+    from . import compactor
+    from . import deadlines
+    from . import fuzzy
+    from . import llm
+    from . import prompts
+    from . import topics
 
-def get_client():
-    api_key = config.OPENAI_API_KEY
-    if not api_key:
-        print("Warning: OPENAI_API_KEY is not set.")
-        return None
-    return OpenAI(api_key=api_key)
-
-client = None
-
-def align_documents_anchors(doc_a_content, doc_b_content):
-    """
-    Aligns documents by asking LLM for start/end anchors (first 2 words, last 2 words).
-    Then reconstructs the full text by finding these anchors in the source.
-    """
-    prompt = f"""
-You are a precise legal document alignment assistant.
-Your goal is to identify similar topics in two documents.
-
-Input:
-=== DOC A ===
-{doc_a_content}
-=== END DOC A ===
+# Edit distance allowed when an anchor has no exact/whitespace-insensitive match
+ANCHOR_MAX_DISTANCE = 2
 
-=== DOC B ===
-{doc_b_content}
-=== END DOC B ===
+# Constant across calls: with the target block right after it, it forms the reusable prompt prefix
+INSTRUCTIONS = """You are a robotic alignment tool and precise legal document alignment assistant.
+Your goal is to identify similar topics in two documents. The user message contains DOC A followed by DOC B.
 
 Task:
 1. Find similar topics (e.g. Definitions, Term, Termination).
@@ -52,26 +43,39 @@ Rules:
 - Output ONLY the structured data.
 """
 
+def _document_block(text, label):
+    return f"=== DOC {label} ===\n{compactor.get_compacted(text).text}\n=== END DOC {label} ==="
+
+def align_documents_anchors(doc_a_content, doc_b_content):
+    """
+    Aligns documents by asking LLM for start/end anchors (first 2 words, last 2 words).
+    Then reconstructs the full text by finding these anchors in the source.
+    Document A (the target) comes first, so calls sharing it share a prompt prefix.
+    """
+    messages, prefix_tokens = prompts.build(
+        INSTRUCTIONS,
+        prompts.target_block(doc_a_content, "anchors", lambda t: _document_block(t, "A")),
+        _document_block(doc_b_content, "B"),
+    )
+
     try:
-        global client
-        if not client:
-            client = get_client()
-        
-        if not client:
+        if not llm.get_client():
             return "Error: OPENAI_API_KEY not set"
 
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {"role": "system", "content": "You are a robotic alignment tool."},
-                {"role": "user", "content": prompt}
-            ]
-        )
+        response = llm.chat_completion(messages=messages, prefix_tokens=prefix_tokens)
         
         raw_output = response.choices[0].message.content
         print("DEBUG: Anchor Output:", raw_output)
         
-        return parse_and_reconstruct(raw_output, doc_a_content, doc_b_content)
+        failures = []
+        alignments = parse_and_reconstruct(raw_output, doc_a_content, doc_b_content, failures)
+        if failures and config.ANCHOR_REPAIR:
+            try:
+                repair_failed_anchors(alignments, failures, doc_a_content, doc_b_content)
+            except deadlines.DeadlineExceeded:
+                # Out of time: keep the unrepaired anchors
+                deadlines.mark_partial()
+        return alignments
 
     except Exception as e:
         import traceback
@@ -81,6 +85,16 @@ Rules:
         return f"Error in anchor aligner: {str(e)}"
 
 def reconstruct_text(full_text, start_anchor, end_anchor):
+    span = locate_anchors(full_text, start_anchor, end_anchor)
+    if isinstance(span, str):
+        return span
+    return full_text[span[0]:span[1]]
+
+def locate_anchors(full_text, start_anchor, end_anchor):
+    """
+    Finds the clause delimited by the anchors.
+    Returns (start, end) offsets, or "N/A" / an "[Error: ...]" message.
+    """
     if start_anchor == "N/A" or end_anchor == "N/A":
         return "N/A"
 
@@ -105,33 +119,24 @@ def reconstruct_text(full_text, start_anchor, end_anchor):
     if start_idx != -1 and end_idx == -1:
         try:
             end_pattern = re.escape(end_anchor).replace(r'\ ', r'\s+')
-            # Search for end anchor starting from start_idx
-            match = re.search(end_pattern, full_text[start_idx:])
+            # Search for end anchor starting from start_idx (pos argument: no tail copy)
+            match = re.compile(end_pattern).search(full_text, start_idx)
             if match:
-                end_idx = start_idx + match.start()
+                end_idx = match.start()
         except:
             pass
             
     # --- Strategy 3: Fuzzy Match (Handles typos/OCR errors) ---
-    try:
-        from fuzzysearch import find_near_matches
-        
-        # Helper for fuzzy search
-        def fuzzy_find(query, text, start_from=0, max_l_dist=2):
-            matches = find_near_matches(query, text[start_from:], max_l_dist=max_l_dist)
-            if matches:
-                 # Return absolute index of best match (first one usually best in fuzzysearch)
-                 return start_from + matches[0].start
-            return -1
-
-        if start_idx == -1:
-            start_idx = fuzzy_find(start_anchor, full_text)
-            
-        if start_idx != -1 and end_idx == -1:
-             end_idx = fuzzy_find(end_anchor, full_text, start_from=start_idx)
+    # Best match by edit distance; the end anchor is searched from start_idx in place
+    if start_idx == -1:
+        match = fuzzy.find_best(start_anchor, full_text, max_distance=ANCHOR_MAX_DISTANCE)
+        if match:
+            start_idx = match.start
 
-    except ImportError:
-        print("Warning: fuzzysearch not installed, skipping fuzzy step.")
+    if start_idx != -1 and end_idx == -1:
+        match = fuzzy.find_best(end_anchor, full_text, start=start_idx, max_distance=ANCHOR_MAX_DISTANCE)
+        if match:
+            end_idx = match.start
 
     # --- Strategy 4: Fallback (First/Last Word) ---
     if start_idx == -1:
@@ -152,9 +157,28 @@ def reconstruct_text(full_text, start_anchor, end_anchor):
          
     # Extract including the end anchor length
     # Note: If fuzzy match, typical length of anchor is len(end_anchor) roughly.
-    return full_text[start_idx : end_idx + len(end_anchor)]
+    return start_idx, min(end_idx + len(end_anchor), len(full_text))
+
+def reconstruct_compacted(full_text, start_anchor, end_anchor, compacted=None):
+    """
+    Locates anchors in the compacted text the model saw and returns the exact original text.
+    Pass `compacted` when reconstructing many clauses: looking it up hashes the whole text.
+    """
+    if compacted is None:
+        compacted = compactor.get_compacted(full_text)
+    span = locate_anchors(compacted.text, start_anchor, end_anchor)
+    if isinstance(span, str):
+        return span
+    return compacted.restore(*span)
 
-def parse_and_reconstruct(output, doc_a, doc_b):
+def parse_and_reconstruct(output, doc_a, doc_b, failures=None):
+    """
+    Parses the anchor output and reconstructs each clause from the documents.
+    Topic names are canonicalized (see topics.py).
+    Anchors that cannot be located leave an "[Error: ...]" string in place of the clause;
+    if `failures` is a list, (alignment index, "doc_a"/"doc_b", start anchor, end anchor)
+    is appended to it for each of them (see repair_failed_anchors).
+    """
     alignments = []
     
     # Robust Regex Pattern
@@ -172,10 +196,13 @@ def parse_and_reconstruct(output, doc_a, doc_b):
               r".*?DocB_Start:\s*(?P<b_start>.*?),\s*(?:DocB_End|DocA_End|End):\s*(?P<b_end>.*?)[;\n]"
               
     matches = re.finditer(pattern, output, re.IGNORECASE | re.DOTALL)
+    compact_a = compactor.get_compacted(doc_a)
+    compact_b = compactor.get_compacted(doc_b)
     
     for match in matches:
         try:
-            topic = match.group("topic").strip()
+            model_topic = topics.clean(match.group("topic"))
+            topic = topics.canonical(model_topic)
             a_start = match.group("a_start").strip()
             a_end = match.group("a_end").strip()
             b_start = match.group("b_start").strip()
@@ -189,15 +216,20 @@ def parse_and_reconstruct(output, doc_a, doc_b):
             b_end = clean(b_end)
             
             # Reconstruct
-            text_a = reconstruct_text(doc_a, a_start, a_end)
-            text_b = reconstruct_text(doc_b, b_start, b_end)
+            text_a = reconstruct_compacted(doc_a, a_start, a_end, compact_a)
+            text_b = reconstruct_compacted(doc_b, b_start, b_end, compact_b)
             
             alignments.append({
                 "topic": topic,
+                "model_topic": model_topic,
                 "doc_a": text_a,
                 "doc_b": text_b,
                 "strategy": "anchors"
             })
+            if failures is not None:
+                for key, text, start, end in (("doc_a", text_a, a_start, a_end), ("doc_b", text_b, b_start, b_end)):
+                    if text.startswith("[Error:"):
+                        failures.append((len(alignments) - 1, key, start, end))
         except Exception as e:
              print(f"Error processing match: {e}")
 
@@ -213,3 +245,113 @@ def parse_and_reconstruct(output, doc_a, doc_b):
         })
             
     return alignments
+
+# --- Repair pass for anchors that could not be located ---
+
+def repair_window(text, start_anchor, end_anchor, topic):
+    """
+    Picks the part of text most likely to hold a clause whose anchors were not found:
+    around the best approximate matches of the anchors (and the topic name, if it occurs).
+    Returns (start, end) of at most ANCHOR_REPAIR_WINDOW_CHARS characters, or None.
+    """
+    size = config.ANCHOR_REPAIR_WINDOW_CHARS
+    candidates = []
+    for anchor in (start_anchor, end_anchor):
+        if anchor and anchor != "N/A":
+            match = fuzzy.find_best(anchor, text)
+            candidates.append((match.start, match.end))
+    position = text.lower().find(topic.lower()) if topic else -1
+    if position != -1:
+        candidates.append((position, position + len(topic)))
+    if not candidates:
+        return None
+
+    low = min(c[0] for c in candidates)
+    high = max(c[1] for c in candidates)
+    if high - low > size:
+        # Candidates disagree: trust the start anchor's (clauses run forward from it)
+        low, high = candidates[0]
+    # Spread the remaining room mostly after the candidates
+    room = max(0, size - (high - low))
+    low = max(0, low - room // 4)
+    high = min(len(text), low + max(size, high - low))
+    return low, high
+
+def repair_failed_anchors(alignments, failures, doc_a, doc_b):
+    """
+    Re-queries only the clauses whose anchors failed: the model sees a short excerpt around
+    the local fuzzy candidates of each one (not the documents) and returns corrected anchors,
+    which are located within that excerpt and merged into `alignments` in place.
+    Prompt size grows with the number of failures, not with document size.
+    """
+    docs = {"doc_a": doc_a, "doc_b": doc_b}
+    items = []
+    for index, key, start_anchor, end_anchor in failures:
+        compacted = compactor.get_compacted(docs[key])
+        window = repair_window(compacted.text, start_anchor, end_anchor, alignments[index]["topic"])
+        if window is not None:
+            items.append((index, key, start_anchor, end_anchor, compacted, window))
+    if not items:
+        return alignments
+
+    sections = []
+    for number, (index, key, start_anchor, end_anchor, compacted, (low, high)) in enumerate(items, 1):
+        label = "A" if key == "doc_a" else "B"
+        sections.append(f"""=== ITEM {number} (Topic: {alignments[index]["topic"]}, Doc {label}) ===
+Previous anchors (not found): Start: {start_anchor}, End: {end_anchor}
+Excerpt:
+{compacted.text[low:high]}
+=== END ITEM {number} ===""")
+    excerpts = "\n\n".join(sections)
+
+    prompt = f"""
+The anchors below were not found in their documents. Each item shows the previous anchors
+and an excerpt of the document where the clause should be.
+
+{excerpts}
+
+Task:
+For each item, find the clause for its topic in the excerpt and output its FIRST 2 WORDS and
+LAST 2 WORDS copied EXACTLY from the excerpt (same spelling, punctuation and spacing).
+Format, one line per item:
+   <item number>: Start: <first 2 words>, End: <last 2 words>
+If the clause is not in the excerpt, write:
+   <item number>: N/A
+Output ONLY these lines.
+"""
+
+    try:
+        response = llm.chat_completion(
+            messages=[
+                {"role": "system", "content": "You are a robotic alignment tool."},
+                {"role": "user", "content": prompt}
+            ]
+        )
+        raw_output = response.choices[0].message.content
+    except Exception as e:
+        print(f"Error in anchor repair: {e}")
+        return alignments
+
+    repaired = 0
+    for line in raw_output.splitlines():
+        match = re.match(r"\s*(?:ITEM\s*)?(\d+)\s*[:.)]\s*(.*)", line, re.IGNORECASE)
+        if not match or not 1 <= int(match.group(1)) <= len(items):
+            continue
+        index, key, _, _, compacted, (low, high) = items[int(match.group(1)) - 1]
+        answer = match.group(2).strip()
+        if answer.upper().startswith("N/A"):
+            alignments[index][key] = "N/A"
+            continue
+        anchors = re.match(r"Start:\s*(.*?),\s*End:\s*(.*)", answer, re.IGNORECASE)
+        if not anchors:
+            continue
+        start_anchor, end_anchor = (a.strip().strip('"').strip("'") for a in anchors.groups())
+        span = locate_anchors(compacted.text[low:high], start_anchor, end_anchor)
+        if isinstance(span, str):
+            continue
+        alignments[index][key] = compacted.restore(low + span[0], low + span[1])
+        alignments[index]["repaired"] = True
+        repaired += 1
+
+    print(f"Anchor repair: fixed {repaired} of {len(failures)} failed anchors.")
+    return alignments
@@ -0,0 +1,264 @@
+import re
+
+try:
+    import config
+    import compactor
+    import deadlines
+    import lexical
+    import llm
+    import prompts
+    import segmenter
+    import tokens
+    import topics
+except ImportError:
+    from . import config
+    from . import compactor
+    from . import deadlines
+    from . import lexical
+    from . import llm
+    from . import prompts
+    from . import segmenter
+    from . import tokens
+    from . import topics
+
+def number_segments(text, segments, label):
+    """
+    Renders a document as numbered clauses: "[A1] <clause text>" one per line.
+    Clause text is compacted and whitespace collapsed; the model only needs to read it,
+    never copy it. Clauses that are pure boilerplate (headers, page numbers) are left out.
+    """
+    compacted = compactor.get_compacted(text)
+    lines = []
+    for seg in segments:
+        body = compacted.text[compacted.to_compact(seg["start"]):compacted.to_compact(seg["end"])]
+        body = " ".join(body.split())
+        if body:
+            lines.append(f"[{label}{seg['id']}] {body}")
+    return "\n".join(lines)
+
+# Constant across calls: with the target block right after it, it forms the reusable prompt prefix
+INSTRUCTIONS = """You are a robotic alignment tool and precise legal document alignment assistant.
+The user message contains two documents split into numbered clauses. Document A clauses are labelled [A1], [A2], ...; Document B clauses are labelled [B1], [B2], ...
+
+Task:
+1. Find similar topics (e.g. Definitions, Confidentiality Obligations, Term, Termination, Governing Law).
+2. For each topic, list the clause numbers that cover it in each document. Prefer consecutive clauses.
+3. Output one line per topic, in this exact format:
+   Topic: <TopicName> | A: <numbers> | B: <numbers>
+
+   Example:
+   Topic: Confidentiality | A: 3, 4 | B: 7
+   Topic: Governing Law | A: 12 | B: N/A
+
+Rules:
+- Use only the numbers (without the A/B prefix is fine). Ranges like 4-6 are allowed.
+- If a topic is missing in one document, write N/A for that document.
+- Do NOT copy any clause text. Output ONLY the topic lines.
+"""
+
+def _document_block(text, segments, label):
+    return f"=== DOC {label} ===\n{number_segments(text, segments, label)}\n=== END DOC {label} ==="
+
+def align_documents_clauses(doc_a_content, doc_b_content, segments_a=None, segments_b=None):
+    """
+    Aligns documents by clause id: both documents are pre-segmented into numbered clauses
+    and the LLM returns only "topic -> ids" lines, which are mapped back to exact spans.
+    segments_a/segments_b restrict the prompt to a subset of clauses (ids stay document-wide).
+    Document A (the target) comes first; with all of its clauses, its numbered block is
+    cached and calls sharing it share a prompt prefix.
+    """
+    full_a = segmenter.get_segments(doc_a_content)
+    if segments_a is None:
+        segments_a = full_a
+    if segments_b is None:
+        segments_b = segmenter.get_segments(doc_b_content)
+
+    if segments_a is full_a:
+        target = prompts.target_block(doc_a_content, "clauses",
+                                      lambda t: _document_block(t, segmenter.get_segments(t), "A"))
+    else:
+        block = _document_block(doc_a_content, segments_a, "A")
+        target = (block, tokens.estimate_tokens(block))
+    messages, prefix_tokens = prompts.build(INSTRUCTIONS, target, _document_block(doc_b_content, segments_b, "B"))
+
+    try:
+        if not llm.get_client():
+            return "Error: OPENAI_API_KEY not set"
+
+        response = llm.chat_completion(messages=messages, prefix_tokens=prefix_tokens)
+
+        raw_output = response.choices[0].message.content
+        return parse_clause_ids(raw_output, doc_a_content, doc_b_content, segments_a, segments_b)
+
+    except Exception as e:
+        print(f"Error in clause-id aligner: {e}")
+        # Return error string to be caught by index.py
+        return f"Error in clause-id aligner: {str(e)}"
+
+def parse_id_list(value, valid_ids):
+    """
+    Parses "3, 4-6, A7" into sorted ids, keeping only those in valid_ids.
+    Returns [] for N/A or nothing valid.
+    """
+    ids = set()
+    for part in re.split(r"[,\s]+", value.strip()):
+        part = part.strip().strip("[]").lstrip("ABab")
+        if not part:
+            continue
+        bounds = part.split("-")
+        try:
+            if len(bounds) == 2:
+                low = int(bounds[0].lstrip("ABab"))
+                high = int(bounds[1].lstrip("ABab"))
+                ids.update(range(low, high + 1))
+            else:
+                ids.add(int(part))
+        except ValueError:
+            continue
+    return sorted(i for i in ids if i in valid_ids)
+
+def ids_to_spans(ids, segments_by_id):
+    """
+    Groups ids into runs of consecutive clauses and returns one [start, end] span per run.
+    """
+    spans = []
+    prev = None
+    for i in ids:
+        seg = segments_by_id[i]
+        if spans and i - 1 == prev:
+            spans[-1][1] = seg["end"]
+        else:
+            spans.append([seg["start"], seg["end"]])
+        prev = i
+    return spans
+
+def build_alignment(topic, ids_a, ids_b, doc_a, doc_b, segments_a_by_id, segments_b_by_id):
+    spans_a = ids_to_spans(ids_a, segments_a_by_id)
+    spans_b = ids_to_spans(ids_b, segments_b_by_id)
+    return {
+        "topic": topic,
+        "doc_a": doc_a[spans_a[0][0]:spans_a[-1][1]] if spans_a else "N/A",
+        "doc_b": doc_b[spans_b[0][0]:spans_b[-1][1]] if spans_b else "N/A",
+        "a_ids": ids_a,
+        "b_ids": ids_b,
+        "spans_a": spans_a,
+        "spans_b": spans_b,
+        "strategy": "clauses"
+    }
+
+def parse_clause_ids(output, doc_a, doc_b, segments_a, segments_b):
+    """
+    Maps "Topic: ... | A: ... | B: ..." lines back to exact text. Every returned clause is a
+    slice of its source document, so exact-match verification passes by construction.
+    When a topic spans non-consecutive clauses, the text covers the first through the last
+    clause and spans_a/spans_b list the individual runs. Topic names are canonicalized, so
+    chunks naming a topic differently still merge (see align_documents_chunked).
+    """
+    alignments = []
+    segments_a_by_id = {seg["id"]: seg for seg in segments_a}
+    segments_b_by_id = {seg["id"]: seg for seg in segments_b}
+    pattern = re.compile(
+        r"^\W*(?:Topic:)?\s*(?P<topic>[^|\n]+?)\s*(?:\||->|→)\s*A:\s*(?P<a>[^|\n]*?)\s*(?:\||->|→)\s*B:\s*(?P<b>[^|\n]*?)\s*;?\s*$",
+        re.IGNORECASE | re.MULTILINE
+    )
+
+    for match in pattern.finditer(output):
+        model_topic = topics.clean(match.group("topic"))
+        ids_a = parse_id_list(match.group("a"), segments_a_by_id)
+        ids_b = parse_id_list(match.group("b"), segments_b_by_id)
+        if not ids_a and not ids_b:
+            continue
+        alignment = build_alignment(topics.canonical(model_topic), ids_a, ids_b, doc_a, doc_b, segments_a_by_id, segments_b_by_id)
+        alignment["model_topic"] = model_topic
+        alignments.append(alignment)
+
+    if not alignments:
+        print("DEBUG: Parsing failed. Raw output snippet:", output[:100])
+        alignments.append({
+            "topic": "DEBUG: Parsing Failed",
+            "doc_a": f"Could not parse LLM output.\nRaw:\n{output}",
+            "doc_b": "Check logs."
+        })
+
+    return alignments
+
+def align_documents_chunked(doc_a_content, doc_b_content):
+    """
+    Clause-ID alignment for pairs too large for one prompt. Document A is split into
+    chunks of consecutive clauses (CHUNK_INPUT_TOKENS each, half for each side); each chunk
+    is sent with only the Document B clauses that are lexically closest to it (plus their
+    neighbours). Results for the same topic across chunks are merged.
+    """
+    segments_a = segmenter.get_segments(doc_a_content)
+    segments_b = segmenter.get_segments(doc_b_content)
+    texts_a = [segmenter.segment_text(doc_a_content, s) for s in segments_a]
+    texts_b = [segmenter.segment_text(doc_b_content, s) for s in segments_b]
+    vectors = lexical.tfidf_vectors(texts_a + texts_b)
+    vectors_a, vectors_b = vectors[:len(texts_a)], vectors[len(texts_a):]
+
+    budget = config.CHUNK_INPUT_TOKENS // 2
+    chunks = [[]]
+    used = 0
+    for i, text in enumerate(texts_a):
+        cost = tokens.estimate_tokens(text)
+        if chunks[-1] and used + cost > budget:
+            chunks.append([])
+            used = 0
+        chunks[-1].append(i)
+        used += cost
+
+    merged = {}
+    order = []
+    for chunk in chunks:
+        # Relevance of each B clause to this chunk: its best cosine with any chunk clause,
+        # with the two best matches per A clause and their neighbours always considered
+        relevance = {}
+        for i in chunk:
+            scores = [lexical.cosine(vectors_a[i], vec_b) for vec_b in vectors_b]
+            ranked = sorted(range(len(scores)), key=lambda j: scores[j], reverse=True)[:2]
+            for j in ranked:
+                for k in (j - 1, j, j + 1):
+                    if 0 <= k < len(segments_b):
+                        relevance[k] = max(relevance.get(k, 0.0), scores[k])
+
+        # Keep the B side within budget too, dropping the least relevant clauses first
+        selected = []
+        used_b = 0
+        for j in sorted(relevance, key=lambda k: relevance[k], reverse=True):
+            cost = tokens.estimate_tokens(texts_b[j])
+            if selected and used_b + cost > budget:
+                continue
+            selected.append(j)
+            used_b += cost
+        sub_b = [segments_b[j] for j in sorted(selected)]
+
+        try:
+            result = align_documents_clauses(doc_a_content, doc_b_content, [segments_a[i] for i in chunk], sub_b)
+        except deadlines.DeadlineExceeded:
+            if not merged:
+                raise
+            # Out of time: return the chunks aligned so far
+            deadlines.mark_partial()
+            break
+        if isinstance(result, str):
+            return result
+        for align in result:
+            if "a_ids" not in align:
+                continue
+            key = align["topic"].lower()
+            if key not in merged:
+                merged[key] = {"topic": align["topic"], "a_ids": set(), "b_ids": set()}
+                order.append(key)
+            merged[key]["a_ids"].update(align["a_ids"])
+            merged[key]["b_ids"].update(align["b_ids"])
+
+    segments_a_by_id = {seg["id"]: seg for seg in segments_a}
+    segments_b_by_id = {seg["id"]: seg for seg in segments_b}
+    alignments = []
+    for key in order:
+        item = merged[key]
+        align = build_alignment(item["topic"], sorted(item["a_ids"]), sorted(item["b_ids"]),
+                                doc_a_content, doc_b_content, segments_a_by_id, segments_b_by_id)
+        align["strategy"] = "chunked"
+        alignments.append(align)
+    return alignments
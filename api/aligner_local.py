@@ -0,0 +1,66 @@
+import re
+
+try:
+    import config
+    import lexical
+    import segmenter
+except ImportError:
+    from . import config
+    from . import lexical
+    from . import segmenter
+
+def topic_from_heading(heading):
+    """
+    Derives a topic name from a clause's first line: "2. Confidentiality: Recipient..." -> "Confidentiality".
+    """
+    match = segmenter.HEADING_PATTERN.match(heading)
+    text = heading[match.end():] if match else heading
+    # Definitions: '“Term” means ...' -> 'Term'
+    quoted = re.match(r'\s*[“"]([^”"]{1,60})[”"]', text)
+    if quoted:
+        return quoted.group(1).strip()
+    text = text.strip(" .,:;-–")
+    cut = re.search(r"[.:;]", text)
+    if cut and 0 < cut.start() <= 60:
+        text = text[:cut.start()]
+    else:
+        text = " ".join(text.split()[:6])
+    return text.strip(' "“”') or heading[:40]
+
+def align_documents_local(doc_a_content, doc_b_content, segments_a=None, segments_b=None):
+    """
+    Aligns documents without an LLM: each Document A clause is paired with the most
+    similar Document B clause (TF-IDF cosine over words). Suited to near-identical
+    versions of the same agreement; clauses without a counterpart get "N/A".
+    segments_a/segments_b restrict the pairing to a subset of clauses.
+    """
+    if segments_a is None:
+        segments_a = segmenter.get_segments(doc_a_content)
+    if segments_b is None:
+        segments_b = segmenter.get_segments(doc_b_content)
+    texts_a = [segmenter.segment_text(doc_a_content, s) for s in segments_a]
+    texts_b = [segmenter.segment_text(doc_b_content, s) for s in segments_b]
+    vectors = lexical.tfidf_vectors(texts_a + texts_b)
+    vectors_a, vectors_b = vectors[:len(texts_a)], vectors[len(texts_a):]
+
+    alignments = []
+    for seg_a, text_a, vec_a in zip(segments_a, texts_a, vectors_a):
+        best_score, best = 0.0, None
+        for seg_b, vec_b in zip(segments_b, vectors_b):
+            score = lexical.cosine(vec_a, vec_b)
+            if score > best_score:
+                best_score, best = score, seg_b
+
+        matched = best is not None and best_score >= config.LOCAL_MIN_SIMILARITY
+        alignments.append({
+            "topic": topic_from_heading(seg_a["heading"]),
+            "doc_a": text_a,
+            "doc_b": segmenter.segment_text(doc_b_content, best) if matched else "N/A",
+            "a_ids": [seg_a["id"]],
+            "b_ids": [best["id"]] if matched else [],
+            "spans_a": [[seg_a["start"], seg_a["end"]]],
+            "spans_b": [[best["start"], best["end"]]] if matched else [],
+            "score": round(best_score, 3),
+            "strategy": "local"
+        })
+    return alignments
@@ -1,41 +1,89 @@
-from openai import OpenAI
 try:
     import config
+    import compactor
+    import deadlines
+    import docstore
+    import fuzzy
+    import insertion
+    import lexical
+    import llm
+    import piecetable
+    import segmenter
+    import singleflight
+    import topics
+    import utils
 except ImportError:
     from . import config
+    from . import compactor
+    from . import deadlines
+    from . import docstore
+    from . import fuzzy
+    from . import insertion
+    from . import lexical
+    from . import llm
+    from . import piecetable
+    from . import segmenter
+    from . import singleflight
+    from . import topics
+    from . import utils
 
-def get_client():
-    api_key = config.OPENAI_API_KEY
-    if not api_key:
-        print("Warning: OPENAI_API_KEY is not set.")
-        return None
-    return OpenAI(api_key=api_key)
-
-client = None
+# Concurrent augmentations generating the same clause share one LLM call
+clause_flights = singleflight.Group()
 
 def identify_missing_topics(alignments):
     """
     Identifies topics that are present in Doc A (Target) but missing in Doc B (Mod).
     Returns a list of dicts: [{'topic': ..., 'target_content': ...}]
+    A topic is not missing if another alignment finds it in Doc B under exactly the same
+    name (see topics.covered_in_mod).
     """
     missing = []
+    covered = topics.covered_in_mod(alignments)
     for align in alignments:
         # Check if Doc B is N/A or empty
         if align['doc_b'] == "N/A" or not align['doc_b'].strip():
             # Ensure Doc A has content
             if align['doc_a'] != "N/A" and align['doc_a'].strip():
+                if topics.model_name(align) in covered:
+                    continue
                 missing.append({
                     'topic': align['topic'],
                     'target_content': align['doc_a']
                 })
     return missing
 
+def build_style_index(mod_full_text):
+    """
+    Paragraphs of the (compacted) mod document and their TF-IDF vectors, for picking
+    style samples. Built once per document (cached in the docstore) and shared by all
+    missing topics.
+    """
+    text = compactor.get_compacted(mod_full_text).text
+    paragraphs = [segmenter.segment_text(text, s) for s in segmenter.segment_document(text)]
+    vectors, idf = lexical.tfidf_index(paragraphs)
+    return {"paragraphs": paragraphs, "vectors": vectors, "idf": idf}
+
+def style_sample_for(target_clause, mod_full_text):
+    """
+    The mod paragraphs most similar to the target clause, in document order, each cut to
+    an equal share of STYLE_SAMPLE_CHARS: the sample size does not grow with the document.
+    """
+    index = docstore.artifact_for_text(mod_full_text, "style_index", build_style_index)
+    k = config.STYLE_SAMPLE_PARAGRAPHS
+    chosen = lexical.top_matches(lexical.tfidf_query(target_clause, index["idf"]), index["vectors"], k)
+    if not chosen:
+        # Nothing in common: skip the first paragraph (usually the title/parties block)
+        first = 1 if len(index["paragraphs"]) > k else 0
+        chosen = list(range(first, min(len(index["paragraphs"]), first + k)))
+    share = config.STYLE_SAMPLE_CHARS // max(1, len(chosen))
+    return "\n...\n".join(index["paragraphs"][i][:share] for i in sorted(chosen))
+
 def generate_missing_clause(target_clause, mod_full_text, topic):
     """
     Generates a new clause for the missing topic, matching the style of the mod document.
     """
-    # Take a sample of the mod document to understand style
-    style_sample = mod_full_text[:2000] + "\n...\n" + mod_full_text[-1000:]
+    # Sample the mod paragraphs closest to the target clause to understand style
+    style_sample = style_sample_for(target_clause, mod_full_text)
     
     prompt = f"""
 You are a legal expert and skilled legal drafter.
@@ -57,15 +105,10 @@ Instructions:
 """
 
     try:
-        global client
-        if not client:
-            client = get_client()
-            
-        if not client:
+        if not llm.get_client():
             return None
 
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",
+        response = llm.chat_completion(
             messages=[
                 {"role": "system", "content": "You are a precise legal drafter."},
                 {"role": "user", "content": prompt}
@@ -83,7 +126,14 @@ def determine_insertion_point(mod_full_text, new_clause, topic):
     and potentially a prefix/suffix (like newlines).
     """
     # We will ask the LLM to identify the preceding text snippet.
-    
+    # The prompt shows the compacted document; the snippet is located there and its
+    # end mapped back to the original text.
+    compacted = compactor.get_compacted(mod_full_text)
+    doc_prompt = compacted.text
+
+    def snippet_end(end):
+        return compacted.to_original(end - 1) + 1 if end > 0 else 0
+
     prompt = f"""
 You are a legal document editor.
 We need to insert a new clause about "{topic}" into the following document.
@@ -93,7 +143,7 @@ New Clause:
 
 Document:
 === START DOCUMENT ===
-{mod_full_text}
+{doc_prompt}
 === END DOCUMENT ===
 
 Instructions:
@@ -108,15 +158,10 @@ Instructions:
 """
 
     try:
-        global client
-        if not client:
-            client = get_client()
-        
-        if not client:
+        if not llm.get_client():
              return len(mod_full_text), "\n\n"
              
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",
+        response = llm.chat_completion(
             messages=[
                 {"role": "system", "content": "You are a helpful assistant."},
                 {"role": "user", "content": prompt}
@@ -131,23 +176,16 @@ Instructions:
                 snippet = snippet[1:-1]
             
             # 1. Try Exact Search
-            idx = mod_full_text.find(snippet)
+            idx = doc_prompt.find(snippet)
             if idx != -1:
-                return idx + len(snippet), "\n\n"
+                return snippet_end(idx + len(snippet)), "\n\n"
             
-            # 2. Try Fuzzy Search
-            try:
-                from fuzzysearch import find_near_matches
-                # Allow some errors relative to snippet length
-                max_dist = min(5, int(len(snippet) * 0.2)) 
-                matches = find_near_matches(snippet, mod_full_text, max_l_dist=max_dist)
-                
-                if matches:
-                    print(f"DEBUG: Found insertion point via fuzzy match: {matches[0]}")
-                    return matches[0].end, "\n\n"
-            except ImportError:
-                 print("Warning: fuzzysearch not installed, skipping fuzzy insertion.")
-                 
+            # 2. Try Fuzzy Search (closest match, allowing some errors relative to snippet length)
+            max_dist = min(5, int(len(snippet) * 0.2))
+            match = fuzzy.find_best(snippet, doc_prompt, max_distance=max_dist)
+            if match:
+                return snippet_end(match.end), "\n\n"
+
             # 3. Fallback: Split snippet?
             # If still nothing, warn and append
             print(f"Could not find snippet '{snippet}' in text (Exact or Fuzzy).")
@@ -161,53 +199,114 @@ Instructions:
 def augment_document(target_text, mod_text, alignments):
     """
     Main function to augment the mod document.
+    Insertion points are planned locally from the document structure (see insertion.py);
+    the LLM only breaks ties the local planner flags as ambiguous.
+    If the request deadline passes, the clauses generated so far are inserted and the
+    remaining topics are listed in skipped_topics.
     """
-    missing_items = identify_missing_topics(alignments)
-    print(f"Found {len(missing_items)} missing topics.")
-    
-    augmented_text = mod_text
-    
-    # Sort insertions by index to avoid messing up offsets? 
-    # Actually, if we insert one by one, we need to be careful.
-    # Easiest is to do it one by one and re-calculate indices or just do it.
-    # But determine_insertion_point uses the full text. 
-    # If we modify text, the next insertion point might be wrong if we use the original text.
-    # Let's update the text iteratively.
+    plans = insertion.plan_insertions(mod_text, alignments)
+    print(f"Found {len(plans)} missing topics.")
     
     # Track insertions for frontend highlighting
     insertions = []
+    placed = []
+    mod_hash = utils.content_hash(mod_text)
+    seen = set()
+    # Topics not attempted before the request deadline
+    skipped = []
     
-    for item in missing_items:
-        topic = item['topic']
-        target_content = item['target_content']
+    for plan in plans:
+        topic = plan['topic']
+        target_content = plan['target_content']
+        
+        # A topic repeated with the same content would only insert the same clause twice
+        key = singleflight.make_key(config.LLM_MODEL, mod_hash, topic, target_content)
+        if key in seen:
+            print(f"Skipping repeated topic: {topic}")
+            continue
+        seen.add(key)
         
         print(f"Processing missing topic: {topic}")
         
-        # 1. Generate Clause
-        new_clause = generate_missing_clause(target_content, mod_text, topic) # Use original mod text for style sample
+        try:
+            # 1. Generate Clause (joins an identical generation already running in another request)
+            new_clause, _ = clause_flights.do(key, generate_missing_clause, target_content, mod_text, topic) # Use original mod text for style sample
+        except deadlines.DeadlineExceeded:
+            # Out of time: insert the clauses generated so far
+            skipped.extend(p['topic'] for p in plans[plans.index(plan):])
+            deadlines.mark_partial()
+            break
         if not new_clause:
             print("Failed to generate clause.")
             continue
             
         print(f"Generated clause: {new_clause[:50]}...")
         
-        # 2. Determine Insertion Point (in the CURRENT augmented_text)
-        idx, prefix = determine_insertion_point(augmented_text, new_clause, topic)
-        
-        # 3. Insert
+        # 2. Insertion point in the original mod_text
+        idx, prefix = plan['offset'], "\n\n"
+        method = plan['method']
+        if plan['ambiguous'] and config.INSERTION_LLM_TIEBREAK and not deadlines.expired():
+            try:
+                idx, prefix = determine_insertion_point(mod_text, new_clause, topic)
+                method = "llm"
+            except deadlines.DeadlineExceeded:
+                # Keep the local plan
+                pass
+        print(f"Inserting at {idx} ({method})")
+        placed.append((idx, prefix, new_clause, plan, method))
+    
+    # 3. Insert into a piece table. Offsets refer to mod_text and are mapped through the
+    # edits made so far; going in offset order, a recorded span never moves again
+    # (sorted is stable: clauses planned at one offset keep the target's order)
+    table = piecetable.PieceTable(mod_text)
+    offset_map = []
+    patches = []
+    inserted = {}
+    for idx, prefix, new_clause, plan, method in sorted(placed, key=lambda p: p[0]):
         # We might need a suffix too, usually newlines
         suffix = "\n"
-        
-        insertion = prefix + new_clause + suffix
-        augmented_text = augmented_text[:idx] + insertion + augmented_text[idx:]
-        
-        # Record insertion for frontend
-        insertions.append({
-            "topic": topic,
-            "text": new_clause # backend returns just the clause text for fuzzy matching
-        })
+        start, end = table.insert(table.to_current(idx), prefix + new_clause + suffix)
+        offset_map.append([idx, end - start])
+        patches.append([idx, prefix + new_clause + suffix])
+        inserted[plan['index']] = [start + len(prefix), end - len(suffix)]
+    
+    # Record insertions for frontend (exact spans in the augmented text)
+    by_index = {}
+    for idx, prefix, new_clause, plan, method in placed:
+        by_index[plan['index']] = {
+            "topic": plan['topic'],
+            "text": new_clause,
+            "span": inserted[plan['index']],
+            "placement": method
+        }
+        insertions.append(by_index[plan['index']])
         
     return {
-        "augmented_text": augmented_text,
-        "insertions": insertions
+        "augmented_text": table.text(),
+        "insertions": insertions,
+        # [[mod_text offset, inserted length], ...]: see piecetable.shift_offset
+        "offset_map": offset_map,
+        # [[mod_text offset, inserted text], ...]: see piecetable.apply_patches
+        "patches": patches,
+        "alignments": remap_alignments(alignments, table, by_index),
+        "skipped_topics": skipped
     }
+
+def remap_alignments(alignments, table, insertions=None):
+    """
+    Returns copies of the alignments in augmented-text coordinates: mod-side spans
+    (spans_b) are shifted through the piece table's edits, and alignments whose clause
+    was inserted (insertions: alignment index -> insertion record) point at the new clause.
+    """
+    insertions = insertions or {}
+    remapped = []
+    for i, align in enumerate(alignments):
+        align = dict(align)
+        if i in insertions:
+            align["doc_b"] = insertions[i]["text"]
+            align["spans_b"] = [list(insertions[i]["span"])]
+            align["augmented"] = True
+        elif align.get("spans_b"):
+            align["spans_b"] = [list(table.remap_span(start, end)) for start, end in align["spans_b"]]
+        remapped.append(align)
+    return remapped
@@ -0,0 +1,117 @@
+"""
+Budget-driven strategy selection for strategy="auto".
+
+Predicts prompt/completion tokens, cost and latency of each alignment strategy from
+local token counts and a quick similarity estimate, then picks the cheapest one that
+fits the model limits:
+
+- local:    near-identical documents, paired lexically with no LLM call
+- standard: small pairs, where copying the aligned text back is affordable
+- clauses:  clause-ID protocol, output independent of clause length
+- chunked:  clause-ID per chunk when the pair does not fit one prompt
+"""
+import math
+
+try:
+    import config
+    import lexical
+    import segmenter
+    import tokens
+except ImportError:
+    from . import config
+    from . import lexical
+    from . import segmenter
+    from . import tokens
+
+# Fixed prompt overhead (instructions, markers) per call
+PROMPT_OVERHEAD_TOKENS = 400
+# Fraction of each document the standard strategy typically copies back
+STANDARD_COPY_RATIO = 0.7
+# Output tokens per topic line in the clause-ID format
+CLAUSE_ID_TOKENS_PER_TOPIC = 15
+
+def _prediction(input_tokens, output_tokens, calls=1):
+    cost, latency = tokens.estimate_cost(input_tokens, output_tokens)
+    if calls == 0:
+        cost, latency = 0.0, 0.0
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "calls": calls,
+            "cost_usd": cost, "latency_s": latency}
+
+def predict(target_text, mod_text):
+    """
+    Returns (stats, predictions) where predictions maps strategy -> predicted usage.
+    """
+    tokens_a = tokens.document_tokens(target_text)
+    tokens_b = tokens.document_tokens(mod_text)
+    segments_a = len(segmenter.get_segments(target_text))
+    segments_b = len(segmenter.get_segments(mod_text))
+    topics = max(1, min(segments_a, segments_b))
+
+    both = tokens_a + tokens_b
+    id_labels = 3 * (segments_a + segments_b)
+    chunks = max(1, math.ceil(tokens_a / (config.CHUNK_INPUT_TOKENS / 2)))
+
+    predictions = {
+        "local": _prediction(0, 0, calls=0),
+        "standard": _prediction(both + PROMPT_OVERHEAD_TOKENS,
+                                int(STANDARD_COPY_RATIO * 2 * min(tokens_a, tokens_b)) + 10 * topics),
+        "clauses": _prediction(both + id_labels + PROMPT_OVERHEAD_TOKENS, CLAUSE_ID_TOKENS_PER_TOPIC * topics),
+        "chunked": _prediction(min(both, chunks * config.CHUNK_INPUT_TOKENS) + id_labels + chunks * PROMPT_OVERHEAD_TOKENS,
+                               CLAUSE_ID_TOKENS_PER_TOPIC * topics, calls=chunks),
+    }
+    # Chunks run one after another: latency is per call
+    predictions["chunked"]["latency_s"] = round(
+        sum(tokens.estimate_cost(predictions["chunked"]["input_tokens"] / chunks,
+                                 predictions["chunked"]["output_tokens"] / chunks)[1] for _ in range(chunks)), 2)
+
+    stats = {
+        "target_tokens": tokens_a,
+        "mod_tokens": tokens_b,
+        "target_clauses": segments_a,
+        "mod_clauses": segments_b,
+        "similarity": round(lexical.document_similarity(target_text, mod_text), 3),
+    }
+    return stats, predictions
+
+def _fits(prediction):
+    return (prediction["input_tokens"] + prediction["output_tokens"] <= config.MODEL_CONTEXT_TOKENS
+            and prediction["output_tokens"] <= config.MODEL_MAX_OUTPUT_TOKENS)
+
+def plan_alignment(target_text, mod_text):
+    """
+    Chooses a strategy for the pair. Returns {"strategy", "reason", "stats", "predicted"}
+    where "predicted" is the usage expected for the chosen strategy.
+    """
+    stats, predictions = predict(target_text, mod_text)
+
+    if stats["similarity"] >= config.AUTO_LOCAL_SIMILARITY:
+        choice, reason = "local", f"documents are near-identical (similarity {stats['similarity']})"
+    elif _fits(predictions["standard"]) and predictions["standard"]["output_tokens"] <= config.AUTO_STANDARD_MAX_OUTPUT:
+        choice, reason = "standard", "small pair, full-text output is affordable"
+    elif _fits(predictions["clauses"]):
+        choice, reason = "clauses", "full-text output too large, clause ids fit in one prompt"
+    else:
+        choice, reason = "chunked", "pair exceeds the model context"
+
+    return {
+        "strategy": choice,
+        "reason": reason,
+        "stats": stats,
+        "predicted": predictions[choice],
+        "alternatives": predictions,
+    }
+
+def actual_usage(usage, elapsed_s):
+    """
+    Turns the accumulated provider usage of a request into the same shape as a prediction.
+    """
+    usage = usage or {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
+    cost, _ = tokens.estimate_cost(usage["input_tokens"], usage["output_tokens"])
+    return {
+        "input_tokens": usage["input_tokens"],
+        "output_tokens": usage["output_tokens"],
+        "cached_tokens": usage["cached_tokens"],
+        "calls": usage["calls"],
+        "cost_usd": cost,
+        "latency_s": round(elapsed_s, 2),
+    }
@@ -0,0 +1,183 @@
+"""
+Prompt compaction.
+
+PDF extraction leaves repeated page headers/footers, page numbers, words hyphenated
+across line breaks and long whitespace runs. compact() removes them before a document
+is put in a prompt and keeps an offset map, so any span in the compacted text maps
+back exactly to the original read_pdf output.
+"""
+import re
+from bisect import bisect_right
+
+try:
+    import config
+    import docstore
+    import segmenter
+except ImportError:
+    from . import config
+    from . import docstore
+    from . import segmenter
+
+# A short line repeated at least this many times is treated as a running header/footer
+BOILERPLATE_MIN_REPEATS = 3
+BOILERPLATE_MAX_CHARS = 60
+
+PAGE_NUMBER_PATTERN = re.compile(
+    r"^\s*(?:page\s*)?[-–]?\s*\d{1,4}\s*[-–]?\s*(?:(?:of|/)\s*\d{1,4})?\s*$",
+    re.IGNORECASE
+)
+
+# Hyphen at a line end joining two lowercase word halves, or any whitespace run
+JUNK_PATTERN = re.compile(r"(?P<hyphen>(?<=[a-z])-[ \t]*\n\s*(?=[a-z]))|(?P<space>\s+)")
+
+class CompactText:
+    """
+    Compacted text plus a breakpoint map back to the original.
+    The map stores one (compact_pos, original_pos) pair per copied run, so it stays
+    small: positions inside a run are mapped by offsetting from the run start.
+    """
+    def __init__(self, original, text, compact_starts, original_starts):
+        self.original = original
+        self.text = text
+        self._compact_starts = compact_starts
+        self._original_starts = original_starts
+
+    def to_original(self, pos):
+        """
+        Maps a position in the compacted text to the original text.
+        """
+        if pos >= len(self.text):
+            return len(self.original)
+        i = bisect_right(self._compact_starts, pos) - 1
+        if i < 0:
+            return 0
+        return self._original_starts[i] + (pos - self._compact_starts[i])
+
+    def to_compact(self, pos):
+        """
+        Maps a position in the original text to the compacted text (removed characters map
+        to the position where they were removed).
+        """
+        i = bisect_right(self._original_starts, pos) - 1
+        if i < 0:
+            return 0
+        run_end = self._compact_starts[i + 1] if i + 1 < len(self._compact_starts) else len(self.text)
+        return min(self._compact_starts[i] + (pos - self._original_starts[i]), run_end)
+
+    def span_to_original(self, start, end):
+        """
+        Maps a compacted [start, end) span to the original text, trimmed to the characters
+        actually covered (removed text at the edges is not included).
+        """
+        if end <= start:
+            orig = self.to_original(start)
+            return orig, orig
+        return self.to_original(start), self.to_original(end - 1) + 1
+
+    def restore(self, start, end):
+        """
+        Returns the original text for a compacted span.
+        """
+        orig_start, orig_end = self.span_to_original(start, end)
+        return self.original[orig_start:orig_end]
+
+    def stats(self):
+        return {
+            "original_chars": len(self.original),
+            "compact_chars": len(self.text),
+            "ratio": round(len(self.text) / len(self.original), 3) if self.original else 1.0,
+        }
+
+def _boilerplate_mask(text):
+    """
+    Returns text with running headers/footers and page-number lines blanked out
+    (replaced by spaces, so every offset stays valid).
+    Clause headings ("1.", "Section 1", "Article I") are never blanked: repeats are counted
+    on the raw line, so "Section 1" and "Section 2" are different lines, and a line that
+    opens a clause is kept even if the same heading recurs.
+    """
+    lines = []
+    counts = {}
+    start = 0
+    for line in text.split("\n"):
+        key = line.strip()
+        lines.append((start, start + len(line), key))
+        if key and len(key) <= BOILERPLATE_MAX_CHARS:
+            counts[key] = counts.get(key, 0) + 1
+        start += len(line) + 1
+
+    chars = None
+    for line_start, line_end, key in lines:
+        if not key or segmenter.HEADING_PATTERN.match(key):
+            continue
+        if counts.get(key, 0) >= BOILERPLATE_MIN_REPEATS or PAGE_NUMBER_PATTERN.match(key):
+            if chars is None:
+                chars = list(text)
+            chars[line_start:line_end] = " " * (line_end - line_start)
+    return text if chars is None else "".join(chars)
+
+def compact(text):
+    """
+    Compacts a document for prompting. Returns a CompactText.
+    """
+    masked = _boilerplate_mask(text)
+    out = []
+    compact_starts = []
+    original_starts = []
+    length = 0
+    pos = 0
+
+    def copy_run(orig_start, chunk):
+        nonlocal length
+        if not chunk:
+            return
+        compact_starts.append(length)
+        original_starts.append(orig_start)
+        out.append(chunk)
+        length += len(chunk)
+
+    for match in JUNK_PATTERN.finditer(masked):
+        replacement = ""
+        if match.group("space") is not None and 0 < match.start() and match.end() < len(masked):
+            # Collapse the run; keep a line break if there was one
+            replacement = "\n" if "\n" in match.group() else " "
+            if text[match.start():match.end()] == replacement:
+                # Already minimal: leave it inside the current run (no map entry needed)
+                continue
+        copy_run(pos, text[pos:match.start()])
+        copy_run(match.start(), replacement)
+        pos = match.end()
+    copy_run(pos, text[pos:])
+
+    return CompactText(text, "".join(out), compact_starts, original_starts)
+
+def get_compacted(text):
+    """
+    Cached compaction (per document hash, via the document store). With compaction
+    disabled in config, returns an identity CompactText.
+    """
+    if not config.PROMPT_COMPACTION:
+        return CompactText(text, text, [0], [0])
+    return docstore.artifact_for_text(text, "compacted", compact)
+
+def restore_clause(compacted, clause):
+    """
+    Maps clause text the model copied from the compacted document back to the exact
+    original text. Returns the clause unchanged if it cannot be located, or only
+    approximately, so verification still reports a misquote.
+    """
+    if not clause or clause == "N/A":
+        return clause
+    idx = compacted.text.find(clause)
+    if idx != -1:
+        return compacted.restore(idx, idx + len(clause))
+
+    # Tolerate whitespace differences introduced by the model, nothing else
+    try:
+        import verifier
+    except ImportError:
+        from . import verifier
+    result = verifier.verify_document([clause], compacted.text)[0]
+    if result["status"] == "normalized":
+        return compacted.restore(*result["span"])
+    return clause
@@ -7,3 +7,109 @@ if not OPENAI_API_KEY:
     # Fallback/Warning (optional)
     pass
 
+# Batch upload: files accepted per request and extraction worker processes
+# (0 = one per CPU).
+UPLOAD_BATCH_MAX_FILES = int(os.getenv("UPLOAD_BATCH_MAX_FILES", "50"))
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "0"))
+
+# Server-side document store (in memory, per process)
+DOCSTORE_MAX_DOCUMENTS = int(os.getenv("DOCSTORE_MAX_DOCUMENTS", "256"))
+DOCSTORE_MAX_ALIGNMENTS = int(os.getenv("DOCSTORE_MAX_ALIGNMENTS", "512"))
+
+# Persistent results store: every alignment/augmentation with clause spans, full-text
+# searchable (SQLite FTS5, see resultstore.py). Opt-in: set a database path to enable it.
+# Only the newest RESULTS_MAX_RESULTS results are kept (0 keeps everything).
+RESULTS_DB_PATH = os.getenv("RESULTS_DB_PATH", "")
+RESULTS_MAX_RESULTS = int(os.getenv("RESULTS_MAX_RESULTS", "10000"))
+# Upper bound for the limit parameter of the /results queries
+RESULTS_MAX_LIMIT = int(os.getenv("RESULTS_MAX_LIMIT", "200"))
+
+# Pre-extracted demo corpus (built by `python api/demo_corpus.py`)
+DEMO_NDA_DIR = os.getenv("DEMO_NDA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ndas"))
+DEMO_CORPUS_PATH = os.getenv("DEMO_CORPUS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "demo_corpus.bin"))
+
+# Strip repeated headers/footers, page numbers, hyphenation and whitespace runs from prompts
+PROMPT_COMPACTION = os.getenv("PROMPT_COMPACTION", "1") == "1"
+
+# LLM model and the figures used to predict cost/latency before a call
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4-turbo-preview")
+MODEL_CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", "128000"))
+MODEL_MAX_OUTPUT_TOKENS = int(os.getenv("MODEL_MAX_OUTPUT_TOKENS", "4096"))
+# USD per 1K (input, output) tokens
+MODEL_PRICES_PER_1K = {
+    "gpt-4-turbo-preview": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+}
+LLM_BASE_LATENCY_S = float(os.getenv("LLM_BASE_LATENCY_S", "1.0"))
+LLM_INPUT_TOKENS_PER_S = float(os.getenv("LLM_INPUT_TOKENS_PER_S", "5000"))
+LLM_OUTPUT_TOKENS_PER_S = float(os.getenv("LLM_OUTPUT_TOKENS_PER_S", "30"))
+
+# strategy="auto" thresholds
+AUTO_LOCAL_SIMILARITY = float(os.getenv("AUTO_LOCAL_SIMILARITY", "0.85"))
+AUTO_STANDARD_MAX_OUTPUT = int(os.getenv("AUTO_STANDARD_MAX_OUTPUT", "1500"))
+CHUNK_INPUT_TOKENS = int(os.getenv("CHUNK_INPUT_TOKENS", "12000"))
+# Minimum TF-IDF cosine for the local (no-LLM) aligner to pair two clauses
+LOCAL_MIN_SIMILARITY = float(os.getenv("LOCAL_MIN_SIMILARITY", "0.3"))
+
+# Shared OpenAI client: endpoint override (e.g. fake_llm_server.py), per-call timeout,
+# retries with exponential backoff, rate limits and adaptive concurrency bounds
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", "1.0"))
+LLM_BACKOFF_MAX_S = float(os.getenv("LLM_BACKOFF_MAX_S", "30"))
+LLM_RPM = int(os.getenv("LLM_RPM", "500"))
+LLM_TPM = int(os.getenv("LLM_TPM", "300000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+# Output tokens reserved against the TPM budget when a call sets no max_tokens
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "1000"))
+
+# Anchor strategy: re-query failed anchors with an excerpt around their fuzzy candidates
+ANCHOR_REPAIR = os.getenv("ANCHOR_REPAIR", "1") == "1"
+ANCHOR_REPAIR_WINDOW_CHARS = int(os.getenv("ANCHOR_REPAIR_WINDOW_CHARS", "1500"))
+
+# Canonical clause order for placing generated clauses (augmentation). Groups are
+# separated by ";", keywords within a group by "|"; keywords match at word starts.
+CANONICAL_TOPIC_ORDER = os.getenv(
+    "CANONICAL_TOPIC_ORDER",
+    "definition|interpretation;purpose|background|recital;confidential|non-disclosure|obligation|use of;"
+    "exclusion|exception;required by law|compelled|permitted disclosure;return|destruction;"
+    "ownership|intellectual property|no license|licen;warrant|disclaim;term|duration;terminat;"
+    "remed|injunct|damages;liabil|indemn;non-solicit|non-compet;assign;"
+    "governing law|jurisdiction|dispute|arbitrat;notice;"
+    "entire agreement|amendment|severab|waiver|counterpart|miscellaneous|general"
+).split(";")
+# Topic canonicalization (topics.py): a new topic name maps to the closest taxonomy or
+# previously seen name when their word/trigram overlap reaches TOPIC_MATCH_THRESHOLD.
+# TOPIC_TABLE_MAX bounds the lookup table and the number of learned names.
+TOPIC_MATCH_THRESHOLD = float(os.getenv("TOPIC_MATCH_THRESHOLD", "0.75"))
+TOPIC_TABLE_MAX = int(os.getenv("TOPIC_TABLE_MAX", "2000"))
+# Ask the LLM for the insertion point only when the local planner finds it ambiguous
+INSERTION_LLM_TIEBREAK = os.getenv("INSERTION_LLM_TIEBREAK", "1") == "1"
+
+# Style sample for generated clauses: the mod paragraphs most similar to the target clause
+STYLE_SAMPLE_PARAGRAPHS = int(os.getenv("STYLE_SAMPLE_PARAGRAPHS", "3"))
+STYLE_SAMPLE_CHARS = int(os.getenv("STYLE_SAMPLE_CHARS", "2400"))
+
+# Per-request deadline in seconds when the request sets none (X-Request-Deadline header or
+# deadline_s field); 0 disables
+REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_S", "0"))
+
+# Admission control for the LLM pipelines (/align, /align/multi, /augment, /realign):
+# at most ADMISSION_MAX_CONCURRENT run at once (0: no limit); up to ADMISSION_MAX_QUEUE
+# more wait, interactive before batch; beyond that requests get 429 with Retry-After
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "4"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+
+# On-demand sampling profiler (?profile=1 on any request, /admin/profile for a time window).
+# Off by default: when disabled nothing is registered and requests pay nothing.
+# Profiling also needs ADMIN_TOKEN (requests must send it as X-Admin-Token): without one
+# it stays disabled.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+# Finished profiles kept in memory for /admin/profiles
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
@@ -0,0 +1,114 @@
+"""
+Per-request deadlines and cooperative cancellation.
+
+Alignment and augmentation run in worker threads, which cannot be interrupted from the
+event loop. Instead each request carries a Deadline in a context variable (copied into
+the worker thread by asyncio.to_thread): the endpoint cancels it when the client
+disconnects, and long-running code checks it between steps. llm.chat_completion checks
+it before every attempt and clips its timeout and backoff to the time left, so a
+cancelled request stops spending quota after at most the call in progress.
+
+Cancelled derives from BaseException, like asyncio.CancelledError, so the broad
+`except Exception` handlers around LLM calls do not swallow it.
+"""
+import contextvars
+import threading
+import time
+
+class Cancelled(BaseException):
+    """
+    The request was cancelled (client disconnected).
+    """
+
+class DeadlineExceeded(Cancelled):
+    """
+    The request ran out of time.
+    """
+
+class Deadline:
+    def __init__(self, seconds=None):
+        self.expires = time.monotonic() + seconds if seconds else None
+        self._cancelled = threading.Event()
+        # Set by code that stopped early and returned what it had
+        self.partial = False
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def remaining(self):
+        """
+        Seconds left, or None without a time limit.
+        """
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return self.cancelled or self.remaining() == 0.0
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled("Request cancelled: client disconnected.")
+        if self.remaining() == 0.0:
+            raise DeadlineExceeded("Request deadline exceeded.")
+
+    def wait(self, seconds):
+        """
+        Sleeps up to `seconds`, waking early on cancellation; raises if the request is
+        cancelled or would pass its deadline while sleeping.
+        """
+        remaining = self.remaining()
+        if remaining is not None and seconds >= remaining:
+            self._cancelled.wait(remaining)
+            self.check()
+            raise DeadlineExceeded("Request deadline exceeded.")
+        self._cancelled.wait(seconds)
+        self.check()
+
+_current = contextvars.ContextVar("request_deadline", default=None)
+
+def start(seconds=None):
+    """
+    Installs a new Deadline for the current request (context) and returns it.
+    """
+    deadline = Deadline(seconds)
+    _current.set(deadline)
+    return deadline
+
+def current():
+    return _current.get()
+
+def check():
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check()
+
+def expired():
+    deadline = _current.get()
+    return deadline is not None and deadline.expired()
+
+def remaining(default=None):
+    """
+    Seconds left for the current request, capped at `default` (no cap if None).
+    """
+    deadline = _current.get()
+    left = deadline.remaining() if deadline is not None else None
+    if left is None:
+        return default
+    return left if default is None else min(left, default)
+
+def wait(seconds):
+    deadline = _current.get()
+    if deadline is None:
+        time.sleep(seconds)
+    else:
+        deadline.wait(seconds)
+
+def mark_partial():
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.partial = True
@@ -0,0 +1,181 @@
+"""
+Pre-extracted demo corpus.
+
+The bundled PDFs in ndas/ are extracted once (at build time, or on first use)
+into a single artifact that is memory-mapped when the server starts, so
+/demo-data never parses a PDF while serving.
+
+Artifact layout:
+    MAGIC (8 bytes) | header length (8 bytes, little endian) | JSON header | UTF-8 text blob
+
+The header lists, per document: filename, content hash, byte range in the blob,
+character length and page start offsets (the offset map back to PDF pages),
+plus a fingerprint of the source files used to detect a stale artifact.
+
+Usage:
+    python api/demo_corpus.py [nda_dir] [out_path]
+"""
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+
+try:
+    import config
+    import singleflight
+    import utils
+except ImportError:
+    from . import config
+    from . import singleflight
+    from . import utils
+
+MAGIC = b"LACORP1\n"
+
+_lock = threading.Lock()
+_corpus = None
+_loads = singleflight.Group()
+
+def list_sources(nda_dir):
+    """
+    Returns the bundled PDFs, skipping macOS resource forks and other "._" files.
+    """
+    files = glob.glob(os.path.join(nda_dir, "*.pdf"))
+    return sorted(f for f in files if not os.path.basename(f).startswith("._"))
+
+def source_fingerprint(files):
+    return [[os.path.basename(f), os.path.getsize(f), int(os.path.getmtime(f))] for f in files]
+
+def build_corpus(nda_dir, out_path):
+    """
+    Extracts every PDF in nda_dir and writes the corpus artifact to out_path.
+    Returns the number of documents written.
+    """
+    files = list_sources(nda_dir)
+    entries = []
+    blob = bytearray()
+
+    for path in files:
+        pages = utils.read_pdf_pages(path)
+        if not pages:
+            print(f"Skipping {os.path.basename(path)} (no text extracted)")
+            continue
+        # Same layout as utils.read_pdf: every page followed by a newline
+        page_offsets = []
+        text = ""
+        for page in pages:
+            page_offsets.append(len(text))
+            text += page + "\n"
+        if not text.strip():
+            continue
+
+        data = text.encode("utf-8")
+        entries.append({
+            "filename": os.path.basename(path),
+            "content_hash": utils.content_hash(text),
+            "offset": len(blob),
+            "length": len(data),
+            "chars": len(text),
+            "page_offsets": page_offsets,
+        })
+        blob += data
+
+    header = json.dumps({"sources": source_fingerprint(files), "documents": entries}).encode("utf-8")
+
+    # Write atomically so a concurrent reader never maps a half-written file
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    os.makedirs(out_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        f.write(blob)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, out_path)
+    return len(entries)
+
+def load_corpus(path):
+    """
+    Memory-maps a corpus artifact. Returns {"header", "blob_start", "mm"} or None if the
+    file is missing or not a corpus artifact.
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                print(f"Ignoring {path}: not a demo corpus artifact")
+                return None
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Could not load demo corpus {path}: {e}")
+        return None
+    return {"header": header, "blob_start": len(MAGIC) + 8 + header_len, "mm": mm}
+
+def is_stale(corpus, nda_dir):
+    return corpus["header"]["sources"] != source_fingerprint(list_sources(nda_dir))
+
+def _fallback_path():
+    # Build output for read-only deployments (Vercel only allows writes to /tmp)
+    return os.path.join(tempfile.gettempdir(), "legalalign_demo_corpus.bin")
+
+def _load_or_build(build_missing):
+    nda_dir = config.DEMO_NDA_DIR
+    for path in (config.DEMO_CORPUS_PATH, _fallback_path()):
+        corpus = load_corpus(path) if os.path.exists(path) else None
+        if corpus is not None and not (os.path.isdir(nda_dir) and is_stale(corpus, nda_dir)):
+            return corpus
+
+    if not build_missing or not os.path.isdir(nda_dir):
+        return None
+
+    for path in (config.DEMO_CORPUS_PATH, _fallback_path()):
+        try:
+            count = build_corpus(nda_dir, path)
+        except OSError as e:
+            print(f"Could not write demo corpus to {path}: {e}")
+            continue
+        print(f"Built demo corpus with {count} documents at {path}")
+        return load_corpus(path)
+    return None
+
+def get_corpus(build_missing=True):
+    """
+    Returns the loaded corpus, mapping the configured artifact on first use.
+    If it is missing or stale and build_missing is set, rebuilds it once
+    (at DEMO_CORPUS_PATH if writable, else in the temp directory).
+    Blocking (PDF extraction on a cold start): call it from a worker thread when serving.
+    Concurrent cold calls share one load; the lock only guards the pointer.
+    """
+    global _corpus
+    with _lock:
+        if _corpus is not None:
+            return _corpus
+
+    corpus, _ = _loads.do(build_missing, _load_or_build, build_missing)
+    if corpus is None:
+        return None
+    with _lock:
+        if _corpus is None:
+            _corpus = corpus
+        return _corpus
+
+def documents(corpus):
+    return corpus["header"]["documents"]
+
+def read_document(corpus, entry):
+    """
+    Returns the text of one corpus entry, decoded straight from the mapped file.
+    """
+    start = corpus["blob_start"] + entry["offset"]
+    return corpus["mm"][start:start + entry["length"]].decode("utf-8")
+
+if __name__ == "__main__":
+    nda_dir = sys.argv[1] if len(sys.argv) > 1 else config.DEMO_NDA_DIR
+    out_path = sys.argv[2] if len(sys.argv) > 2 else config.DEMO_CORPUS_PATH
+    count = build_corpus(nda_dir, out_path)
+    print(f"Wrote {count} documents to {out_path}")
@@ -0,0 +1,137 @@
+import json
+import threading
+from collections import OrderedDict
+
+try:
+    import config
+    import utils
+except ImportError:
+    from . import config
+    from . import utils
+
+# In-memory, per-process store. Documents are keyed by the SHA-256 of their text,
+# so the id doubles as a cache key for everything derived from that text.
+# Each worker process has its own store: callers must be ready to resend the text
+# when an id is unknown (evicted, or served by a different instance).
+
+_lock = threading.Lock()
+_documents = OrderedDict()   # doc_id -> {"text", "filename", "artifacts"}
+_extractions = {}            # file bytes hash -> doc_id
+_alignments = OrderedDict()  # alignment_id -> {"alignments", "target_id", "mod_id"}
+
+def _evict(store, limit):
+    while len(store) > limit:
+        store.popitem(last=False)
+
+def put_document(text, filename=None):
+    """
+    Stores a document and returns its id (content hash).
+    Storing the same text twice is a no-op that returns the same id.
+    """
+    doc_id = utils.content_hash(text)
+    with _lock:
+        entry = _documents.get(doc_id)
+        if entry is None:
+            _documents[doc_id] = {"text": text, "filename": filename, "artifacts": {}}
+            _evict(_documents, config.DOCSTORE_MAX_DOCUMENTS)
+        else:
+            _documents.move_to_end(doc_id)
+            if filename and not entry["filename"]:
+                entry["filename"] = filename
+    return doc_id
+
+def get_document(doc_id):
+    """
+    Returns the text for doc_id, or None if it is unknown.
+    """
+    with _lock:
+        entry = _documents.get(doc_id)
+        if entry is None:
+            return None
+        _documents.move_to_end(doc_id)
+        return entry["text"]
+
+def get_artifact(doc_id, name, factory, text=None):
+    """
+    Returns a derived artifact (segmentation, search index, ...) for a stored document,
+    building it with factory(text) on first use. Artifacts live as long as the document.
+    For an unknown (or evicted) id the artifact is built from `text` but not cached;
+    without `text` the result is None.
+    """
+    with _lock:
+        entry = _documents.get(doc_id)
+        if entry is not None and name in entry["artifacts"]:
+            return entry["artifacts"][name]
+        if entry is not None:
+            text = entry["text"]
+
+    if text is None:
+        return None
+    artifact = factory(text)
+    with _lock:
+        entry = _documents.get(doc_id)
+        if entry is not None:
+            artifact = entry["artifacts"].setdefault(name, artifact)
+    return artifact
+
+def artifact_for_text(text, name, factory):
+    """
+    Same as get_artifact, keyed by the text itself (the document is stored on the way).
+    Never None: if the document is evicted before the artifact is cached, it is still built.
+    """
+    return get_artifact(put_document(text), name, factory, text)
+
+def lookup_extraction(file_hash):
+    """
+    Returns the doc_id previously extracted from a file with these bytes, if still stored.
+    """
+    with _lock:
+        doc_id = _extractions.get(file_hash)
+        if doc_id is not None and doc_id in _documents:
+            return doc_id
+        return None
+
+def record_extraction(file_hash, doc_id):
+    with _lock:
+        _extractions[file_hash] = doc_id
+        if len(_extractions) > config.DOCSTORE_MAX_DOCUMENTS:
+            # Drop mappings whose documents were evicted
+            for key in [k for k, v in _extractions.items() if v not in _documents]:
+                del _extractions[key]
+
+def put_alignments(alignments, target_id, mod_id):
+    """
+    Stores an alignment result so later calls (e.g. /augment) can reference it by id.
+    """
+    payload = json.dumps([target_id, mod_id, alignments], sort_keys=True)
+    alignment_id = utils.content_hash(payload)
+    with _lock:
+        _alignments[alignment_id] = {"alignments": alignments, "target_id": target_id, "mod_id": mod_id}
+        _alignments.move_to_end(alignment_id)
+        _evict(_alignments, config.DOCSTORE_MAX_ALIGNMENTS)
+    return alignment_id
+
+def get_alignments(alignment_id):
+    """
+    Returns the stored alignment record ({"alignments", "target_id", "mod_id"}) or None.
+    """
+    with _lock:
+        return _alignments.get(alignment_id)
+
+def clear():
+    """
+    Drops every document, artifact, extraction and alignment (benchmarks use it to
+    measure cold runs).
+    """
+    with _lock:
+        _documents.clear()
+        _extractions.clear()
+        _alignments.clear()
+
+def stats():
+    with _lock:
+        return {
+            "documents": len(_documents),
+            "alignments": len(_alignments),
+            "extractions": len(_extractions),
+        }
@@ -0,0 +1,140 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint, for exercising llm.py's
+retry, rate-limit and concurrency handling without network access or cost.
+
+    python api/fake_llm_server.py --port 8089 --error-rate 0.3 --latency-ms 200
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake uvicorn index:app
+
+A fraction of requests (--error-rate) is answered with 429 and a Retry-After header;
+--max-concurrent makes any request beyond that many in flight fail with 429 as well,
+mimicking a provider-side concurrency limit. --script answers the first requests with
+the given statuses in order (e.g. 429,500,200) before falling back to the rules above.
+--error-latency-ms delays those error replies, so concurrent calls are still in flight
+when the first 429 arrives. Every successful reply contains --reply (or the contents
+of --reply-file).
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "Topic: Confidentiality | A: 1 | B: 1"
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, reply=DEFAULT_REPLY, error_rate=0.0, latency_ms=0, max_concurrent=0, retry_after_s=1,
+                 script=(), error_latency_ms=0):
+        super().__init__(address, _Handler)
+        self.reply = reply
+        self.error_rate = error_rate
+        self.latency_ms = latency_ms
+        self.max_concurrent = max_concurrent
+        self.retry_after_s = retry_after_s
+        self.script = list(script)
+        self.error_latency_ms = error_latency_ms
+        self.in_flight = 0
+        self.counts = {"requests": 0, "ok": 0, "rate_limited": 0, "server_errors": 0}
+        self.lock = threading.Lock()
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+
+        with server.lock:
+            server.counts["requests"] += 1
+            server.in_flight += 1
+            over_limit = server.max_concurrent and server.in_flight > server.max_concurrent
+            status = server.script.pop(0) if server.script else None
+        try:
+            if status is not None and status >= 500:
+                time.sleep(server.error_latency_ms / 1000)
+                with server.lock:
+                    server.counts["server_errors"] += 1
+                self._send(status, {"error": {"message": "Server error (fake server)", "type": "server_error"}})
+                return
+            if status == 429 or (status is None and (over_limit or random.random() < server.error_rate)):
+                time.sleep(server.error_latency_ms / 1000)
+                with server.lock:
+                    server.counts["rate_limited"] += 1
+                self._send(429, {"error": {"message": "Rate limit reached (fake server)", "type": "rate_limit_error",
+                                           "code": "rate_limit_exceeded"}},
+                           {"Retry-After": str(server.retry_after_s)})
+                return
+
+            time.sleep(server.latency_ms / 1000)
+            prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in request.get("messages", []))
+            completion_tokens = len(server.reply) // 4
+            with server.lock:
+                server.counts["ok"] += 1
+            self._send(200, {
+                "id": f"chatcmpl-fake-{server.counts['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": server.reply}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+def start(port=0, **options):
+    """
+    Starts a server on a background thread. Returns (server, base_url); stop it with
+    server.shutdown().
+    """
+    server = FakeLLMServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server.")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Delay before each successful reply")
+    parser.add_argument("--max-concurrent", type=int, default=0, help="Answer 429 above this many in-flight requests (0 = no limit)")
+    parser.add_argument("--error-latency-ms", type=int, default=0, help="Delay before each 429 or 5xx reply")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--script", default="", help="Comma-separated statuses for the first requests, e.g. 429,500,200")
+    parser.add_argument("--reply", default=DEFAULT_REPLY)
+    parser.add_argument("--reply-file")
+    args = parser.parse_args()
+
+    reply = args.reply
+    if args.reply_file:
+        with open(args.reply_file, encoding="utf-8") as f:
+            reply = f.read()
+
+    server = FakeLLMServer(("127.0.0.1", args.port), reply=reply, error_rate=args.error_rate,
+                           latency_ms=args.latency_ms, max_concurrent=args.max_concurrent,
+                           retry_after_s=args.retry_after,
+                           script=[int(code) for code in args.script.split(",") if code.strip()],
+                           error_latency_ms=args.error_latency_ms)
+    print(f"Fake LLM server on http://127.0.0.1:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
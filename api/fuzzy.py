@@ -0,0 +1,131 @@
+"""
+Approximate string matching (Myers' bit-parallel edit distance).
+
+Searches take [start, end) bounds and index the text in place, so searching the tail
+of a long document never copies it. find_best returns the match with the smallest
+edit distance in the window (earliest on ties), not just the first one within the
+limit, and recovers its start with a backward scan.
+
+With a distance limit k, the pattern is split into k + 1 pieces: any match within k
+edits contains one of them verbatim (pigeonhole), so str.find locates candidate
+regions at C speed and the bit-parallel scan only runs around them.
+"""
+from collections import namedtuple
+
+Match = namedtuple("Match", ["start", "end", "distance"])
+
+def _peq(pattern):
+    peq = {}
+    for i, ch in enumerate(pattern):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+    return peq
+
+def scan(pattern, text, start=0, end=None, global_mode=False, reverse=False):
+    """
+    Myers' bit-parallel edit distance of pattern against text[start:end], without slicing.
+    Semi-global (pattern may start anywhere) unless global_mode, in which case the
+    distance is against the whole window. With reverse, the text is read from end
+    towards start and pattern should be given reversed.
+    Returns (best_distance, position): the exclusive end of the best match, or with
+    reverse its (inclusive) start.
+    """
+    if end is None:
+        end = len(text)
+    m = len(pattern)
+    if m == 0:
+        return 0, end if reverse else start
+    full = (1 << m) - 1
+    high = 1 << (m - 1)
+    peq = _peq(pattern)
+    carry = 1 if global_mode else 0
+
+    pv, mv, score = full, 0, m
+    best, best_pos = score, end if reverse else start
+    for j in (range(end - 1, start - 1, -1) if reverse else range(start, end)):
+        eq = peq.get(text[j], 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & full) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | carry) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+        if not global_mode and score < best:
+            best, best_pos = score, j if reverse else j + 1
+    if global_mode:
+        return score, start if reverse else end
+    return best, best_pos
+
+def edit_distance(a, b):
+    """
+    Levenshtein distance between two strings (bit-parallel, O(len(b) * len(a) / wordsize)).
+    """
+    if not a:
+        return len(b)
+    if not b:
+        return len(a)
+    return scan(a, b, global_mode=True)[0]
+
+# Shortest piece worth filtering on; shorter ones match almost everywhere
+MIN_PIECE_CHARS = 3
+
+def candidate_windows(pattern, text, start, end, max_distance):
+    """
+    Regions of text[start:end] that can contain a match within max_distance edits,
+    as sorted, merged (start, end) pairs. Returns None when the filter would not help
+    (pattern too short for the limit, or candidates covering most of the range).
+    """
+    m = len(pattern)
+    pieces = max_distance + 1
+    size = m // pieces
+    if size < MIN_PIECE_CHARS:
+        return None
+
+    windows = []
+    for p in range(pieces):
+        offset = p * size
+        piece = pattern[offset:offset + size] if p < pieces - 1 else pattern[offset:]
+        pos = text.find(piece, start, end)
+        while pos != -1:
+            windows.append((max(start, pos - offset - max_distance), min(end, pos - offset + m + max_distance)))
+            pos = text.find(piece, pos + 1, end)
+
+    windows.sort()
+    merged = []
+    for low, high in windows:
+        if merged and low <= merged[-1][1]:
+            if high > merged[-1][1]:
+                merged[-1] = (merged[-1][0], high)
+        else:
+            merged.append((low, high))
+    if sum(high - low for low, high in merged) > (end - start) // 2:
+        return None
+    return merged
+
+def find_best(pattern, text, start=0, end=None, max_distance=None):
+    """
+    Finds the span of text[start:end] with the smallest edit distance to pattern.
+    Returns a Match(start, end, distance), or None if the best distance exceeds max_distance.
+    """
+    if end is None:
+        end = len(text)
+    windows = candidate_windows(pattern, text, start, end, max_distance) if max_distance is not None else None
+    if windows is None:
+        windows = [(start, end)]
+
+    distance, match_end = len(pattern) + 1, None
+    for low, high in windows:
+        window_distance, window_end = scan(pattern, text, low, high)
+        if window_distance < distance:
+            distance, match_end = window_distance, window_end
+    if match_end is None or (max_distance is not None and distance > max_distance):
+        return None
+    # Recover the start by matching the reversed pattern backwards from the end position
+    lower = max(start, match_end - len(pattern) - distance)
+    _, match_start = scan(pattern[::-1], text, lower, match_end, reverse=True)
+    return Match(match_start, match_end, distance)
@@ -0,0 +1,84 @@
+"""
+Import-time profiler for serverless cold starts.
+
+Imports a module (default: index, the API entry point) in a fresh interpreter with
+`python -X importtime` and reports the cumulative cost of each top-level package.
+
+Usage:
+    python api/importprofile.py [--module index] [--top 15] [--budget-ms 400]
+
+Exits with status 1 when the total import time exceeds --budget-ms, so it can gate CI.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+def profile_imports(module="index", cwd=None):
+    """
+    Returns (total_us, rows) where rows are (module, self_us, cumulative_us) for every
+    module imported while importing `module`, in import order.
+    """
+    cwd = cwd or os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        # Format: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            # Drop the separator space; the remaining indent (2 per level) is the nesting depth
+            rows.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+
+    # importtime lists children before their parent; keep only the profiled module's subtree
+    for i, (name, _, cumulative_us) in enumerate(rows):
+        if name == module:
+            start = i
+            while start > 0 and _depth(rows[start - 1][0]) > 0:
+                start -= 1
+            return cumulative_us, rows[start:i + 1]
+    return 0, []
+
+def _depth(name):
+    return (len(name) - len(name.lstrip())) // 2
+
+def top_level_costs(rows):
+    """
+    Aggregates cumulative cost per top-level package imported directly by the profiled
+    module (nested imports are already included in their parent's cumulative time).
+    """
+    costs = {}
+    for name, _, cumulative_us in rows:
+        if _depth(name) == 1:
+            package = name.strip().split(".")[0]
+            costs[package] = costs.get(package, 0) + cumulative_us
+    return sorted(costs.items(), key=lambda item: item[1], reverse=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="index")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    total_us, rows = profile_imports(args.module)
+    print(f"Import of '{args.module}': {total_us / 1000:.1f} ms")
+    print(f"{'package':<30} {'cumulative ms':>14}")
+    for package, cumulative_us in top_level_costs(rows)[:args.top]:
+        print(f"{package:<30} {cumulative_us / 1000:>14.1f}")
+
+    if args.budget_ms is not None and total_us / 1000 > args.budget_ms:
+        print(f"Over budget: {total_us / 1000:.1f} ms > {args.budget_ms:.1f} ms")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,52 @@
+import time
+_import_started = time.perf_counter()
+
 import sys
-import config
-from fastapi import FastAPI, UploadFile, File, HTTPException, APIRouter, Request
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
-import shutil
 import os
-import tempfile
 
 # Unconditionally add current directory to path
+# (before any local import, so api/config.py wins over the root config.py)
 current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
+import config
+from fastapi import FastAPI, UploadFile, File, HTTPException, APIRouter, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from fastapi.middleware.cors import CORSMiddleware
+import tempfile
+import asyncio
+import json
+import secrets
+from concurrent.futures import BrokenExecutor
+
 # Safe Boot: Try to import modules
 MODULES_LOADED = False
 IMPORT_ERROR = None
 VERSION = "1.0.2-Restored"
 
 try:
+    import admission
     import aligner
     import aligner_anchors
+    import aligner_clauses
+    import aligner_local
+    import autostrategy
     import augmenter
+    import deadlines
+    import demo_corpus
+    import docstore
+    import llm
+    import multialign
+    import profiler
+    import realign
+    import resultstore
+    import singleflight
+    import tokens
+    import topics
     import utils
+    import verifier
     import config
     MODULES_LOADED = True
 except Exception as e:
@@ -42,6 +65,80 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ADMISSION CONTROL
+# LLM pipelines run at most ADMISSION_MAX_CONCURRENT at a time; the rest queue by priority
+# (X-Priority: interactive | batch, default interactive) or get 429 when the queue is full.
+# Registered before the tunnel middleware so it sees the restored path.
+ADMITTED_PATHS = {prefix + path for prefix in ("", "/api") for path in ("/align", "/align/multi", "/augment", "/realign")}
+admission_controller = admission.AdmissionController(config.ADMISSION_MAX_CONCURRENT, config.ADMISSION_MAX_QUEUE) if MODULES_LOADED else None
+
+@app.middleware("http")
+async def admission_middleware(request: Request, call_next):
+    if admission_controller is None or request.method != "POST" or request.url.path not in ADMITTED_PATHS:
+        return await call_next(request)
+
+    priority = request.headers.get("x-priority", "interactive").lower()
+    if priority not in admission.PRIORITIES:
+        return JSONResponse(status_code=422, content={"detail": f"Unknown priority '{priority}' (use interactive or batch).", "type": "ValidationError"})
+    # Queueing counts against a header deadline (a deadline_s body field starts after admission)
+    try:
+        timeout = float(request.headers["x-request-deadline"])
+    except (KeyError, ValueError):
+        timeout = None
+    if timeout is not None and timeout <= 0:
+        # Invalid: rejected by the endpoint
+        timeout = None
+
+    try:
+        waited = await admission_controller.acquire(priority, timeout)
+    except admission.QueueFull as e:
+        return JSONResponse(status_code=429, content={"detail": str(e), "type": "QueueFull"},
+                            headers={"Retry-After": str(e.retry_after)})
+    except asyncio.TimeoutError:
+        return JSONResponse(status_code=504, content={"detail": "Request deadline exceeded while queued.", "type": "DeadlineExceeded"})
+    request.state.queue_wait_s = waited
+    started = time.monotonic()
+    try:
+        response = await call_next(request)
+    finally:
+        admission_controller.release(time.monotonic() - started)
+    response.headers["X-Queue-Wait"] = f"{waited:.3f}"
+    return response
+
+# ON-DEMAND PROFILING
+# ?profile=1 on any request samples it (see profiler.py); the response gets X-Profile-*
+# headers and the collapsed stacks are served from /admin/profiles/{id}.
+# Registered only with PROFILING_ENABLED and an ADMIN_TOKEN, so requests pay nothing otherwise.
+def profiling_available():
+    # No token, no profiling: the endpoints expose stacks and can tie up the process
+    return MODULES_LOADED and config.PROFILING_ENABLED and bool(config.ADMIN_TOKEN)
+
+def admin_allowed(request):
+    token = request.headers.get("x-admin-token", "")
+    return bool(config.ADMIN_TOKEN) and secrets.compare_digest(token.encode(), config.ADMIN_TOKEN.encode())
+
+async def profiling_middleware(request: Request, call_next):
+    if "profile" not in request.query_params:
+        return await call_next(request)
+    if not admin_allowed(request):
+        return JSONResponse(status_code=403, content={"detail": "Profiling requires a valid X-Admin-Token.", "type": "Forbidden"})
+
+    sampler = profiler.Sampler(memory=request.query_params.get("profile_memory", "1") != "0").start()
+    try:
+        response = await call_next(request)
+    finally:
+        profile = sampler.stop()
+    profile_id = profiler.store(profile, f"{request.method} {request.url.path}")
+    for name, value in profiler.headers(profiler.get(profile_id)).items():
+        if name.startswith("X-"):
+            response.headers[name] = value
+    return response
+
+if profiling_available():
+    app.middleware("http")(profiling_middleware)
+elif MODULES_LOADED and config.PROFILING_ENABLED:
+    print("WARNING: PROFILING_ENABLED is set without ADMIN_TOKEN. Profiling stays disabled.")
+
 # PATH TUNNELING MIDDLEWARE
 # Fixes Vercel path stripping by restoring path from ?_action= query param
 @app.middleware("http")
@@ -61,10 +158,16 @@ async def path_tunnel_middleware(request: Request, call_next):
 # Create a router
 router = APIRouter()
 
+def _package_version(name):
+    # Reads installed metadata without importing the package (keeps /health cheap)
+    from importlib import metadata
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
 @router.get("/health")
 async def health_check():
-    import openai, httpx, pydantic
-    
     api_key_status = False
     try:
         import config
@@ -79,33 +182,166 @@ async def health_check():
         "import_error": IMPORT_ERROR,
         "version": VERSION,
         "api_key_configured": api_key_status,
+        "startup_ms": STARTUP_MS,
+        # Heavy dependencies are imported on first use; report which ones are loaded so far
+        "lazy_loaded": {name: name in sys.modules for name in ("openai", "pypdf")},
+        "admission": admission_controller.stats() if admission_controller else None,
         "libs": {
-            "openai": openai.__version__,
-            "httpx": httpx.__version__,
-            "pydantic": pydantic.__version__
+            "openai": _package_version("openai"),
+            "httpx": _package_version("httpx"),
+            "pydantic": _package_version("pydantic")
         }
     }
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
+# Documents can be sent inline (*_text) or by the id returned from /upload (*_id).
 class AlignRequest(BaseModel):
-    target_text: str
-    mod_text: str
+    target_text: Optional[str] = None
+    mod_text: Optional[str] = None
+    target_id: Optional[str] = None
+    mod_id: Optional[str] = None
     strategy: str = "standard"
+    # Seconds; the X-Request-Deadline header takes precedence
+    deadline_s: Optional[float] = None
+
+# One pivot (e.g. the template) and its versions, each as inline text or a stored id
+class MultiAlignRequest(BaseModel):
+    pivot_text: Optional[str] = None
+    pivot_id: Optional[str] = None
+    version_texts: Optional[List[str]] = None
+    version_ids: Optional[List[str]] = None
+    strategy: str = "clauses"
+    deadline_s: Optional[float] = None
 
 class AugmentRequest(BaseModel):
-    target_text: str
-    mod_text: str
-    alignments: List[Dict[str, Any]]
+    target_text: Optional[str] = None
+    mod_text: Optional[str] = None
+    target_id: Optional[str] = None
+    mod_id: Optional[str] = None
+    alignments: Optional[List[Dict[str, Any]]] = None
+    alignment_id: Optional[str] = None
     strategy: str = "standard"
+    # "full": augmented_text in the response; "delta": only patches against mod_text
+    response_mode: str = "full"
+    deadline_s: Optional[float] = None
+
+# Edits are {"start", "end", "text"}: replace mod[start:end] (offsets in the base mod) with text
+class RealignRequest(BaseModel):
+    target_text: Optional[str] = None
+    mod_text: Optional[str] = None
+    target_id: Optional[str] = None
+    mod_id: Optional[str] = None
+    alignments: Optional[List[Dict[str, Any]]] = None
+    alignment_id: Optional[str] = None
+    edits: List[Dict[str, Any]]
+    # Content hash of the base mod the edits were made against (mod_id from /align)
+    base_checksum: Optional[str] = None
+    strategy: str = "clauses"
+    deadline_s: Optional[float] = None
+
+class VerifyRequest(BaseModel):
+    target_text: Optional[str] = None
+    mod_text: Optional[str] = None
+    target_id: Optional[str] = None
+    mod_id: Optional[str] = None
+    alignments: Optional[List[Dict[str, Any]]] = None
+    alignment_id: Optional[str] = None
+
+def resolve_document(text, doc_id, field):
+    """
+    Returns (text, doc_id) for a request given either inline text or a stored document id.
+    Inline text is stored on the way so follow-up calls can switch to ids.
+    """
+    if text is not None:
+        return text, docstore.put_document(text)
+    if doc_id:
+        stored = docstore.get_document(doc_id)
+        if stored is None:
+            raise HTTPException(status_code=404, detail=f"Unknown {field}_id '{doc_id}'. Re-upload the document or send {field}_text.")
+        return stored, doc_id
+    raise HTTPException(status_code=422, detail=f"Provide either {field}_text or {field}_id.")
+
+def resolve_alignments(alignments, alignment_id, target_id, mod_id):
+    """
+    Returns the request's alignments, inline or stored. A stored result must belong to the
+    request's documents: its spans are offsets into that target and mod.
+    """
+    if alignments is not None:
+        return alignments
+    if alignment_id:
+        record = docstore.get_alignments(alignment_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail=f"Unknown alignment_id '{alignment_id}'. Send alignments instead.")
+        if record["target_id"] != target_id or record["mod_id"] != mod_id:
+            raise HTTPException(status_code=422, detail=f"alignment_id '{alignment_id}' was computed for a different target or mod document.")
+        return record["alignments"]
+    raise HTTPException(status_code=422, detail="Provide either alignments or alignment_id.")
+
+def request_deadline_seconds(request, deadline_s):
+    """
+    Deadline for a request in seconds: the X-Request-Deadline header, else the body's
+    deadline_s, else REQUEST_DEADLINE_S. None means no deadline.
+    """
+    value = request.headers.get("x-request-deadline", deadline_s)
+    if value is None:
+        return config.REQUEST_DEADLINE_S or None
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        seconds = 0.0
+    if seconds <= 0:
+        raise HTTPException(status_code=422, detail=f"Invalid deadline '{value}': expected a positive number of seconds.")
+    # Time spent in the admission queue counts against the deadline
+    return max(0.001, seconds - getattr(request.state, "queue_wait_s", 0.0))
+
+async def watch_disconnect(request, deadline):
+    """
+    Cancels the request's deadline when the client goes away, so the worker thread
+    stops before its next LLM call. The body has been read by the time the endpoint runs,
+    so the next ASGI message is the disconnect. (Request.is_disconnected() cannot be used:
+    behind the http middleware it never reports one.)
+    """
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            print(f"Client disconnected, cancelling {request.url.path}")
+            deadline.cancel()
+            return
+
+def start_request(request, deadline_s):
+    """
+    Installs the request's deadline (inherited by the worker threads it starts) and
+    watches for a client disconnect. Returns (deadline, watcher); cancel the watcher when done.
+    """
+    deadline = deadlines.start(request_deadline_seconds(request, deadline_s))
+    watcher = asyncio.ensure_future(watch_disconnect(request, deadline))
+    return deadline, watcher
+
+async def store_result(record, *args):
+    # Results store writes (see resultstore.py) run off the event loop and never fail the request
+    if resultstore.enabled():
+        await asyncio.to_thread(record, *args)
+
+def cancelled_response():
+    # Nobody reads it: the client is gone
+    return JSONResponse(status_code=499, content={"detail": "Client disconnected.", "type": "Cancelled"})
 
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
     try:
+        data = file.file.read()
+        file_hash = utils.content_hash(data)
+
+        # Same bytes uploaded before: skip extraction
+        doc_id = docstore.lookup_extraction(file_hash)
+        if doc_id is not None:
+            return {"filename": file.filename, "content": docstore.get_document(doc_id), "doc_id": doc_id}
+
         suffix = os.path.splitext(file.filename)[1]
         # Explicitly use /tmp for Vercel
         with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir='/tmp') as tmp:
-            shutil.copyfileobj(file.file, tmp)
+            tmp.write(data)
             tmp_path = tmp.name
         
         content = utils.read_file(tmp_path)
@@ -113,79 +349,364 @@ async def upload_file(file: UploadFile = File(...)):
         
         if content is None:
             raise HTTPException(status_code=400, detail="Could not read file")
-        return {"filename": file.filename, "content": content}
+
+        doc_id = docstore.put_document(content, file.filename)
+        docstore.record_extraction(file_hash, doc_id)
+        return {"filename": file.filename, "content": content, "doc_id": doc_id}
     except Exception as e:
         import traceback
         return JSONResponse(status_code=500, content={"detail": f"{str(e)}\n{traceback.format_exc()}", "type": "UploadError"})
 
+_upload_pool = None
+
+def get_upload_pool():
+    """
+    Lazily creates the executor used for batch extraction.
+    Falls back to threads where process pools are unavailable (e.g. no /dev/shm on serverless).
+    """
+    global _upload_pool
+    if _upload_pool is None:
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        workers = config.UPLOAD_WORKERS or None
+        try:
+            _upload_pool = ProcessPoolExecutor(max_workers=workers)
+        except (OSError, NotImplementedError) as e:
+            print(f"Process pool unavailable ({e}), using threads for batch uploads.")
+            _upload_pool = ThreadPoolExecutor(max_workers=workers)
+    return _upload_pool
+
+def reset_upload_pool(pool):
+    """
+    Drops a broken pool (a worker died) so the next batch builds a new one.
+    Does nothing if another request already replaced it.
+    """
+    global _upload_pool
+    if _upload_pool is pool:
+        _upload_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+@app.post("/upload/batch")
+async def upload_batch(files: List[UploadFile] = File(...)):
+    """
+    Extracts many files concurrently and streams one NDJSON line per file as it completes.
+    Lines arrive in completion order; use "index" to match them to the submitted files.
+    """
+    if len(files) > config.UPLOAD_BATCH_MAX_FILES:
+        return JSONResponse(status_code=413, content={"detail": f"Too many files ({len(files)} > {config.UPLOAD_BATCH_MAX_FILES})", "type": "UploadError"})
+
+    # Spool every upload to /tmp first; the workers only receive paths.
+    # Files whose bytes were extracted before are answered from the document store.
+    jobs = []
+    cached = []
+    for i, file in enumerate(files):
+        data = file.file.read()
+        file_hash = utils.content_hash(data)
+        doc_id = docstore.lookup_extraction(file_hash)
+        if doc_id is not None:
+            cached.append({"index": i, "filename": file.filename, "content_hash": doc_id,
+                           "doc_id": doc_id, "content": docstore.get_document(doc_id)})
+            continue
+        suffix = os.path.splitext(file.filename)[1]
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir='/tmp') as tmp:
+            tmp.write(data)
+            jobs.append((tmp.name, file.filename, i, file_hash))
+
+    async def stream_results():
+        for result in cached:
+            yield json.dumps(result) + "\n"
+
+        loop = asyncio.get_running_loop()
+        file_hashes = {i: file_hash for _, _, i, file_hash in jobs}
+        pool = get_upload_pool()
+        try:
+            pending = [loop.run_in_executor(pool, utils.extract_upload, path, name, i) for path, name, i, _ in jobs]
+        except BrokenExecutor:
+            # Broken by an earlier batch that has not noticed yet: start over on a new pool
+            reset_upload_pool(pool)
+            pool = get_upload_pool()
+            pending = [loop.run_in_executor(pool, utils.extract_upload, path, name, i) for path, name, i, _ in jobs]
+        for next_done in asyncio.as_completed(pending):
+            try:
+                result = await next_done
+            except Exception as e:
+                # Worker crashed (e.g. BrokenProcessPool); report it instead of cutting the stream
+                if isinstance(e, BrokenExecutor):
+                    reset_upload_pool(pool)
+                result = {"index": None, "filename": None, "error": str(e)}
+            if "content" in result:
+                doc_id = docstore.put_document(result["content"], result["filename"])
+                docstore.record_extraction(file_hashes[result["index"]], doc_id)
+                result["doc_id"] = doc_id
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+# Concurrent identical /align requests share one computation (see singleflight.py)
+align_flights = singleflight.AsyncGroup() if MODULES_LOADED else None
+
+def run_alignment(strategy, target_text, mod_text):
+    """
+    Runs one alignment strategy. Returns the list of alignments, or an error string.
+    """
+    if strategy == "anchors":
+        print("Using Experimental Anchor Strategy")
+        # Anchor aligner already returns list of dicts or an error string
+        return aligner_anchors.align_documents_anchors(target_text, mod_text)
+
+    if strategy == "clauses":
+        # Clause-ID strategy: the model returns ids only, spans are exact by construction
+        return aligner_clauses.align_documents_clauses(target_text, mod_text)
+
+    if strategy == "chunked":
+        return aligner_clauses.align_documents_chunked(target_text, mod_text)
+
+    if strategy == "local":
+        # No LLM call: lexical clause pairing
+        return aligner_local.align_documents_local(target_text, mod_text)
+
+    # Standard Strategy
+    alignment_text = aligner.align_documents(target_text, mod_text)
+    
+    if not alignment_text or alignment_text.startswith("Error"):
+        return alignment_text or "Unknown Error"
+    
+    return aligner.restore_alignments(aligner.parse_alignments(alignment_text), target_text, mod_text)
+
 @app.post("/align")
-async def align_docs(req: AlignRequest):
-    try:
-        if req.strategy == "anchors":
-            print("Using Experimental Anchor Strategy")
-            result = aligner_anchors.align_documents_anchors(req.target_text, req.mod_text)
-            if isinstance(result, str) and result.startswith("Error"):
-                 return JSONResponse(status_code=500, content={"detail": result, "type": "AlignerError"})
-            
-            # Anchor aligner already returns list of dicts or raises
-            alignments = result
-            
-        else:
-            # Standard Strategy
-            alignment_text = aligner.align_documents(req.target_text, req.mod_text)
-            
-            if not alignment_text or alignment_text.startswith("Error"):
-                return JSONResponse(status_code=500, content={"detail": alignment_text or "Unknown Error", "type": "AlignerError"})
-            
-            alignments = aligner.parse_alignments(alignment_text)
-            
-        return {"alignments": alignments}
+async def align_docs(req: AlignRequest, request: Request):
+    target_text, target_id = resolve_document(req.target_text, req.target_id, "target")
+    mod_text, mod_id = resolve_document(req.mod_text, req.mod_id, "mod")
+    deadline, watcher = start_request(request, req.deadline_s)
+    try:
+        tokens.start_usage()
+        started = time.perf_counter()
+
+        # "auto" picks a strategy from local token counts and a similarity estimate
+        plan = None
+        strategy = req.strategy
+        if strategy == "auto":
+            plan = autostrategy.plan_alignment(target_text, mod_text)
+            strategy = plan["strategy"]
+            print(f"Auto strategy: {strategy} ({plan['reason']})")
+
+        # Runs in a worker thread so identical requests arriving meanwhile can join it
+        key = singleflight.make_key(strategy, config.LLM_MODEL, target_id, mod_id)
+        try:
+            result, coalesced = await align_flights.do(key, run_alignment, strategy, target_text, mod_text)
+        except deadlines.DeadlineExceeded:
+            # Out of time before the model answered: return the local (no LLM) alignment
+            print("Deadline exceeded, falling back to local alignment")
+            result, coalesced = await asyncio.to_thread(aligner_local.align_documents_local, target_text, mod_text), False
+            deadline.partial = True
+            strategy = "local"
+        if isinstance(result, str):
+            return JSONResponse(status_code=500, content={"detail": result, "type": "AlignerError"})
+        alignments = result
+
+        alignment_id = docstore.put_alignments(alignments, target_id, mod_id)
+        await store_result(resultstore.record_alignment, alignments, target_text, mod_text, alignment_id, strategy)
+        response = {"alignments": alignments, "alignment_id": alignment_id, "target_id": target_id, "mod_id": mod_id}
+        if coalesced:
+            response["coalesced"] = True
+        if deadline.partial:
+            response["partial"] = True
+        if plan is not None:
+            plan["actual"] = autostrategy.actual_usage(tokens.current_usage(), time.perf_counter() - started)
+            response["plan"] = plan
+        return response
+    except deadlines.Cancelled:
+        return cancelled_response()
     except Exception as e:
         import traceback
         return JSONResponse(status_code=500, content={"detail": f"{str(e)}\n{traceback.format_exc()}", "type": "AlignerError", "trace": traceback.format_exc()})
+    finally:
+        watcher.cancel()
+
+@app.post("/align/multi")
+async def align_multi(req: MultiAlignRequest, request: Request):
+    """
+    Aligns several versions against one pivot concurrently and returns a topic x document
+    matrix of clause spans (see multialign.py), plus the pairwise alignment ids.
+    """
+    pivot_text, pivot_id = resolve_document(req.pivot_text, req.pivot_id, "pivot")
+    if req.version_texts:
+        versions = [resolve_document(text, None, "version") for text in req.version_texts]
+    elif req.version_ids:
+        versions = [resolve_document(None, doc_id, "version") for doc_id in req.version_ids]
+    else:
+        raise HTTPException(status_code=422, detail="Provide either version_texts or version_ids.")
+    if req.strategy not in multialign.STRATEGIES:
+        raise HTTPException(status_code=422, detail=f"Unknown strategy '{req.strategy}' (use one of {', '.join(multialign.STRATEGIES)}).")
+    deadline, watcher = start_request(request, req.deadline_s)
+    try:
+        # Index the pivot once before the versions fan out
+        await asyncio.to_thread(multialign.pivot_index, pivot_text)
+
+        async def align_version(version_text, version_id):
+            key = singleflight.make_key("pivot", req.strategy, config.LLM_MODEL, pivot_id, version_id)
+            try:
+                result, _ = await align_flights.do(key, multialign.align_version, req.strategy, pivot_text, version_text)
+            except deadlines.DeadlineExceeded:
+                # Versions finished in time still make a (partial) matrix
+                deadline.partial = True
+                return "Request deadline exceeded."
+            return result
+
+        results = await asyncio.gather(*(align_version(text, doc_id) for text, doc_id in versions))
+
+        errors = {}
+        alignment_ids = []
+        for v, result in enumerate(results):
+            if isinstance(result, str):
+                errors[v] = result
+                alignment_ids.append(None)
+            else:
+                alignment_ids.append(docstore.put_alignments(result, pivot_id, versions[v][1]))
+                await store_result(resultstore.record_alignment, result, pivot_text, versions[v][0],
+                                   alignment_ids[-1], req.strategy)
+        if len(errors) == len(results):
+            return JSONResponse(status_code=500, content={"detail": "; ".join(errors.values()), "type": "AlignerError"})
+
+        texts = [text for text, _ in versions]
+        matrix = await asyncio.to_thread(
+            multialign.build_matrix, pivot_text, texts, [None if isinstance(r, str) else r for r in results])
+        response = {"pivot_id": pivot_id, "version_ids": [doc_id for _, doc_id in versions],
+                    "topics": matrix, "alignment_ids": alignment_ids}
+        if errors:
+            # Partial matrix: failed versions have no cells
+            response["errors"] = errors
+        if deadline.partial:
+            response["partial"] = True
+        return response
+    except deadlines.Cancelled:
+        return cancelled_response()
+    except Exception as e:
+        import traceback
+        return JSONResponse(status_code=500, content={"detail": f"{str(e)}\n{traceback.format_exc()}", "type": "AlignerError"})
+    finally:
+        watcher.cancel()
 
 @app.post("/augment")
-async def augment_docs(req: AugmentRequest):
+async def augment_docs(req: AugmentRequest, request: Request):
+    target_text, target_id = resolve_document(req.target_text, req.target_id, "target")
+    mod_text, mod_id = resolve_document(req.mod_text, req.mod_id, "mod")
+    alignments = resolve_alignments(req.alignments, req.alignment_id, target_id, mod_id)
+    if req.response_mode not in ("full", "delta"):
+        raise HTTPException(status_code=422, detail=f"Unknown response_mode '{req.response_mode}' (use 'full' or 'delta').")
+    deadline, watcher = start_request(request, req.deadline_s)
     try:
-        result = augmenter.augment_document(req.target_text, req.mod_text, req.alignments)
+        # Worker thread: keeps the event loop free and lets concurrent augmentations coalesce
+        result = await asyncio.to_thread(augmenter.augment_document, target_text, mod_text, alignments)
         # Result is now a dict: {"augmented_text": ..., "insertions": ...}
+        # Store the output so the next step can reference it by id
+        result["augmented_id"] = docstore.put_document(result["augmented_text"])
+        # The returned alignments are in augmented-text coordinates: store them against it
+        result["alignment_id"] = docstore.put_alignments(result["alignments"], target_id, result["augmented_id"])
+        await store_result(resultstore.record_augmentation, result, target_text, mod_text, req.strategy)
+        if deadline.partial:
+            # Deadline hit: the topics in skipped_topics were not generated
+            result["partial"] = True
+        if req.response_mode == "delta":
+            # The client already has mod_text: send the clause-sized patches, not the document.
+            # Offsets count Unicode code points; frontend/src/patches.js applies them.
+            return {
+                "base_checksum": mod_id,
+                "patches": result["patches"],
+                "augmented_checksum": result["augmented_id"],
+                "augmented_id": result["augmented_id"],
+                "alignment_id": result["alignment_id"],
+                # Clause text is in the patches; spans locate it in the patched text
+                "insertions": [{k: v for k, v in ins.items() if k != "text"} for ins in result["insertions"]],
+                "skipped_topics": result["skipped_topics"],
+                **({"partial": True} if deadline.partial else {}),
+            }
         return result
+    except deadlines.Cancelled:
+        return cancelled_response()
     except Exception as e:
         import traceback
         return JSONResponse(status_code=500, content={"detail": f"{str(e)}\n{traceback.format_exc()}", "type": "AugmentError"})
+    finally:
+        watcher.cancel()
+
+@app.post("/realign")
+async def realign_docs(req: RealignRequest, request: Request):
+    """
+    Applies edits to the mod document and re-aligns only the clauses they touched.
+    Returns the new mod_id and the merged alignments in edited-document coordinates.
+    At the deadline, returns what was re-aligned so far with "partial": true.
+    """
+    target_text, target_id = resolve_document(req.target_text, req.target_id, "target")
+    mod_text, mod_id = resolve_document(req.mod_text, req.mod_id, "mod")
+    alignments = resolve_alignments(req.alignments, req.alignment_id, target_id, mod_id)
+    if req.base_checksum is not None and req.base_checksum != mod_id:
+        raise HTTPException(status_code=422, detail="Edits were made against a different version of the mod document (checksum mismatch).")
+    if req.strategy not in ("clauses", "local"):
+        raise HTTPException(status_code=422, detail=f"Unknown strategy '{req.strategy}' (use 'clauses' or 'local').")
+    try:
+        edits = realign.normalize_edits(req.edits, len(mod_text))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid edits: {e}")
+    deadline, watcher = start_request(request, req.deadline_s)
+    try:
+        result = await asyncio.to_thread(realign.realign, target_text, mod_text, alignments, edits, req.strategy)
+    except deadlines.DeadlineExceeded as e:
+        return JSONResponse(status_code=504, content={"detail": str(e), "type": "DeadlineExceeded"})
+    except deadlines.Cancelled:
+        return cancelled_response()
+    except Exception as e:
+        import traceback
+        return JSONResponse(status_code=500, content={"detail": f"{str(e)}\n{traceback.format_exc()}", "type": "AlignerError"})
+    finally:
+        watcher.cancel()
+    try:
+        if isinstance(result, str):
+            return JSONResponse(status_code=500, content={"detail": result, "type": "AlignerError"})
+        new_mod, merged, stats = result
+        new_mod_id = docstore.put_document(new_mod)
+        alignment_id = docstore.put_alignments(merged, target_id, new_mod_id)
+        await store_result(resultstore.record_alignment, merged, target_text, new_mod, alignment_id, req.strategy)
+        return {"alignments": merged, "alignment_id": alignment_id, "target_id": target_id,
+                "mod_id": new_mod_id, "base_mod_id": mod_id, "stats": stats,
+                # Deadline hit: alignments marked "stale" were not re-aligned
+                **({"partial": True} if deadline.partial else {})}
+    except Exception as e:
+        import traceback
+        return JSONResponse(status_code=500, content={"detail": f"{str(e)}\n{traceback.format_exc()}", "type": "AlignerError"})
+
+@app.post("/verify")
+async def verify_docs(req: VerifyRequest):
+    """
+    Checks that every aligned clause occurs in its document (exact, then whitespace-normalized,
+    then closest approximate span) and returns per-clause spans and edit distances.
+    """
+    target_text, target_id = resolve_document(req.target_text, req.target_id, "target")
+    mod_text, mod_id = resolve_document(req.mod_text, req.mod_id, "mod")
+    alignments = resolve_alignments(req.alignments, req.alignment_id, target_id, mod_id)
+    try:
+        return verifier.verify_alignments(alignments, target_text, mod_text)
+    except Exception as e:
+        import traceback
+        return JSONResponse(status_code=500, content={"detail": f"{str(e)}\n{traceback.format_exc()}", "type": "VerifyError"})
 
 @app.get("/demo-data")
 async def get_demo_data():
     """
     Returns a random PDF from the ndas folder for testing.
+    Served from the pre-extracted corpus artifact (see demo_corpus.py), no PDF parsing.
     """
     import random
-    import glob
-    
-    # Path to ndas
-    nda_dir = os.path.join(current_dir, "../ndas")
     
     filename = "Standard NDA (Template)"
     content = "This is a fallback. No PDFs found in ndas folder."
     
-    if os.path.exists(nda_dir):
-        files = glob.glob(os.path.join(nda_dir, "*.pdf"))
-        # Filter out files that start with ._ or other system temp files
-        files = [f for f in files if not os.path.basename(f).startswith("._")]
-        
-        if files:
-            selected_file = random.choice(files)
-            fname = os.path.basename(selected_file)
-            print(f"Loading random demo file: {fname}")
-            
-            try:
-                # Read content using utils
-                text = utils.read_file(selected_file)
-                if text:
-                    filename = fname
-                    content = text
-            except Exception as e:
-                print(f"Error reading {fname}: {e}")
+    # A cold start may extract every PDF: keep that off the event loop
+    corpus = await asyncio.to_thread(demo_corpus.get_corpus)
+    if corpus and demo_corpus.documents(corpus):
+        entry = random.choice(demo_corpus.documents(corpus))
+        print(f"Loading random demo file: {entry['filename']}")
+        filename = entry["filename"]
+        content = demo_corpus.read_document(corpus, entry)
 
     # Return nested structure expected by App.jsx
     return {
@@ -193,38 +714,187 @@ async def get_demo_data():
         "mod": {"filename": f"{filename} (Copy)", "content": content}
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Process-local counters: LLM client retries, throttling and concurrency, docstore occupancy,
+    coalesced in-flight requests and the admission queue; plus the results store size and
+    the topic canonicalization table.
+    """
+    if not MODULES_LOADED:
+        return JSONResponse(status_code=500, content={"detail": f"Server Import Error: {IMPORT_ERROR}", "type": "ImportError"})
+    return {
+        "llm": llm.metrics(),
+        "docstore": docstore.stats(),
+        "coalescing": {"align": align_flights.stats(), "augment": augmenter.clause_flights.stats()},
+        "admission": admission_controller.stats(),
+        "results": resultstore.stats(),
+        "topics": topics.stats(),
+    }
+
+def results_guard(limit):
+    """
+    Raises the HTTPException to return when the results queries cannot run.
+    """
+    if not MODULES_LOADED:
+        raise HTTPException(status_code=500, detail=f"Server Import Error: {IMPORT_ERROR}")
+    if not resultstore.enabled():
+        raise HTTPException(status_code=404, detail="Results store is disabled (set RESULTS_DB_PATH).")
+    if not 1 <= limit <= config.RESULTS_MAX_LIMIT:
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {config.RESULTS_MAX_LIMIT}.")
+
+@app.get("/results/topics")
+async def search_result_topics(q: str, limit: int = 20):
+    """
+    Topic names seen in stored results that match q (every word, the last as a prefix),
+    with how many clauses, results and documents each has.
+    """
+    results_guard(limit)
+    return {"topics": await asyncio.to_thread(resultstore.search_topics, q, limit)}
+
+@app.get("/results/clauses")
+async def search_result_clauses(q: Optional[str] = None, topic: Optional[str] = None, side: Optional[str] = None,
+                                doc: Optional[str] = None, limit: int = 20, offset: int = 0, order: str = "recent"):
+    """
+    Stored clauses by full-text query (q) and/or topic name, optionally restricted to one
+    side (A, B or inserted) or one document hash, with spans and the result they came from.
+    order: "recent" (newest first) or "relevance".
+    """
+    results_guard(limit)
+    if side is not None and side not in resultstore.SIDES:
+        raise HTTPException(status_code=422, detail=f"Unknown side '{side}' (use one of {', '.join(resultstore.SIDES)}).")
+    if order not in resultstore.ORDERS:
+        raise HTTPException(status_code=422, detail=f"Unknown order '{order}' (use one of {', '.join(resultstore.ORDERS)}).")
+    clauses = await asyncio.to_thread(resultstore.search_clauses, q, topic, side, doc, limit, max(0, offset), order)
+    return {"clauses": clauses}
+
+def profiling_guard(request):
+    """
+    JSONResponse to return when the admin profiling endpoints are unavailable, else None.
+    """
+    if not profiling_available():
+        return JSONResponse(status_code=404, content={"detail": "Profiling is disabled (set PROFILING_ENABLED=1 and ADMIN_TOKEN).", "type": "NotFound"})
+    if not admin_allowed(request):
+        return JSONResponse(status_code=403, content={"detail": "Profiling requires a valid X-Admin-Token.", "type": "Forbidden"})
+    return None
+
+@app.post("/admin/profile")
+async def profile_window(request: Request, seconds: float = 10.0, all_threads: bool = False, memory: bool = True):
+    """
+    Samples the whole process for `seconds` (at most PROFILE_MAX_SECONDS) and returns the
+    collapsed stacks (flamegraph.pl / speedscope input). all_threads keeps stacks that
+    never enter project code (idle workers, the event loop).
+    """
+    denied = profiling_guard(request)
+    if denied:
+        return denied
+    if not 0 < seconds <= config.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=422, detail=f"seconds must be in (0, {config.PROFILE_MAX_SECONDS:g}].")
+    sampler = profiler.Sampler(all_threads=all_threads, memory=memory).start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profile = sampler.stop()
+    profile = profiler.get(profiler.store(profile, f"window {seconds:g}s"))
+    return PlainTextResponse(profile["collapsed"], headers=profiler.headers(profile))
+
+@app.get("/admin/profiles")
+async def list_profiles(request: Request):
+    denied = profiling_guard(request)
+    if denied:
+        return denied
+    return {"profiles": profiler.summaries()}
+
+@app.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request):
+    denied = profiling_guard(request)
+    if denied:
+        return denied
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Unknown profile '{profile_id}' (only the last {config.PROFILE_KEEP} are kept).")
+    return PlainTextResponse(profile["collapsed"], headers=profiler.headers(profile))
+
+@app.on_event("startup")
+async def map_demo_corpus():
+    # Map an existing artifact now; building a missing one is left to the first request
+    if MODULES_LOADED:
+        await asyncio.to_thread(demo_corpus.get_corpus, False)
+
 @app.post("/api/upload")
 async def upload_file_direct(file: UploadFile = File(...)):
     return await upload_file(file)
 
+@app.post("/api/upload/batch")
+async def upload_batch_direct(files: List[UploadFile] = File(...)):
+    return await upload_batch(files)
+
 @app.post("/api/align")
-async def align_docs_direct(req: AlignRequest):
-    return await align_docs(req)
+async def align_docs_direct(req: AlignRequest, request: Request):
+    return await align_docs(req, request)
+
+@app.post("/api/align/multi")
+async def align_multi_direct(req: MultiAlignRequest, request: Request):
+    return await align_multi(req, request)
 
 @app.post("/api/augment")
-async def augment_docs_direct(req: AugmentRequest):
-    return await augment_docs(req)
+async def augment_docs_direct(req: AugmentRequest, request: Request):
+    return await augment_docs(req, request)
+
+@app.post("/api/realign")
+async def realign_docs_direct(req: RealignRequest, request: Request):
+    return await realign_docs(req, request)
+
+@app.post("/api/verify")
+async def verify_docs_direct(req: VerifyRequest):
+    return await verify_docs(req)
 
 @app.get("/api/demo-data")
 async def get_demo_data_direct():
     return await get_demo_data()
 
+@app.get("/api/metrics")
+async def get_metrics_direct():
+    return await get_metrics()
+
+@app.get("/api/results/topics")
+async def search_result_topics_direct(q: str, limit: int = 20):
+    return await search_result_topics(q, limit)
+
+@app.get("/api/results/clauses")
+async def search_result_clauses_direct(q: Optional[str] = None, topic: Optional[str] = None, side: Optional[str] = None,
+                                       doc: Optional[str] = None, limit: int = 20, offset: int = 0, order: str = "recent"):
+    return await search_result_clauses(q, topic, side, doc, limit, offset, order)
+
+@app.post("/api/admin/profile")
+async def profile_window_direct(request: Request, seconds: float = 10.0, all_threads: bool = False, memory: bool = True):
+    return await profile_window(request, seconds, all_threads, memory)
+
+@app.get("/api/admin/profiles")
+async def list_profiles_direct(request: Request):
+    return await list_profiles(request)
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def get_profile_direct(profile_id: str, request: Request):
+    return await get_profile(profile_id, request)
+
 # Keep the health check which works
 @app.get("/api/health")
 async def health_check_direct():
     return await health_check()
 
-from fastapi.staticfiles import StaticFiles
-
-# ... (Keep existing API routes)
-
 # Mount the React Frontend (must be last)
 # Check if build directory exists (it will on Render after build)
 frontend_dist = os.path.join(current_dir, "../frontend/dist")
 if os.path.exists(frontend_dist):
+    from fastapi.staticfiles import StaticFiles
     app.mount("/", StaticFiles(directory=frontend_dist, html=True), name="static")
 else:
     print(f"WARNING: Frontend dist not found at {frontend_dist}. API only mode.")
 
+# Time spent importing this module (cold start); see importprofile.py for a per-module breakdown
+STARTUP_MS = round((time.perf_counter() - _import_started) * 1000, 1)
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8000)))
@@ -0,0 +1,143 @@
+"""
+Local insertion-point planning for augmentation.
+
+Chooses where each generated clause goes in the mod document without an LLM call:
+
+1. Target order: right after the mod clause aligned with the nearest preceding topic of
+   the target document that the mod document has (or right before the one aligned with
+   the nearest following topic).
+2. Canonical order: otherwise after the last mod clause whose topic comes at or before
+   the new one in CANONICAL_TOPIC_ORDER (definitions first, general provisions last).
+3. Otherwise at the end of the document.
+
+Offsets are always clause boundaries from the segmenter. Placements the signals do not
+settle (neighbours in conflicting order, or nothing to go on) are flagged as ambiguous
+so the caller can ask the LLM to break the tie.
+"""
+import re
+
+try:
+    import aligner_local
+    import config
+    import segmenter
+    import topics
+except ImportError:
+    from . import aligner_local
+    from . import config
+    from . import segmenter
+    from . import topics
+
+_rank_patterns = None
+
+def _patterns():
+    global _rank_patterns
+    if _rank_patterns is None:
+        _rank_patterns = [
+            (rank, len(keyword), re.compile(r"\b" + re.escape(keyword)))
+            for rank, group in enumerate(config.CANONICAL_TOPIC_ORDER)
+            for keyword in group.split("|") if keyword
+        ]
+    return _rank_patterns
+
+def canonical_rank(topic):
+    """
+    Position of a topic in the canonical clause order, or None if no group matches.
+    The longest matching keyword wins ("termination" ranks as terminat, not term).
+    """
+    text = topic.lower()
+    best = None
+    for rank, length, pattern in _patterns():
+        if (best is None or length > best[1]) and pattern.search(text):
+            best = (rank, length)
+    return best[0] if best else None
+
+def _mod_span(alignment, mod_text):
+    """
+    (start, end) of an alignment's clause in the mod document, or None if it has none.
+    """
+    if alignment.get("spans_b"):
+        return min(s[0] for s in alignment["spans_b"]), max(s[1] for s in alignment["spans_b"])
+    text = alignment.get("doc_b", "N/A")
+    if text == "N/A" or not text.strip() or text.startswith("[Error:"):
+        return None
+    index = mod_text.find(text)
+    return (index, index + len(text)) if index != -1 else None
+
+def _boundary_after(segments, offset):
+    index = segmenter.find_segment(segments, max(0, offset - 1))
+    return max(segments[index]["end"], offset) if index != -1 else offset
+
+def _boundary_before(segments, offset):
+    index = segmenter.find_segment(segments, offset)
+    return min(segments[index]["start"], offset) if index != -1 else offset
+
+def _canonical_offset(segments, rank):
+    """
+    Offset after the last mod clause ranked at or before `rank`, or before the first
+    clause ranked after it. None if no mod clause has a canonical rank.
+    """
+    after, before = None, None
+    for segment in segments:
+        segment_rank = canonical_rank(aligner_local.topic_from_heading(segment["heading"]))
+        if segment_rank is None:
+            continue
+        if segment_rank <= rank:
+            after = segment["end"]
+        elif before is None:
+            before = segment["start"]
+    if after is not None:
+        return after
+    return before
+
+def plan_insertions(mod_text, alignments):
+    """
+    Plans an insertion point in mod_text for every topic missing from it.
+    Returns one dict per missing topic, in alignment order:
+    {"index", "topic", "target_content", "offset", "method", "ambiguous"} where method is
+    "target_order", "canonical_order" or "end".
+    """
+    segments = segmenter.get_segments(mod_text)
+    spans = [_mod_span(a, mod_text) for a in alignments]
+    covered = topics.covered_in_mod(alignments)
+
+    plans = []
+    for i, alignment in enumerate(alignments):
+        # Same rule as augmenter.identify_missing_topics
+        doc_a, doc_b = alignment["doc_a"], alignment["doc_b"]
+        if (doc_b != "N/A" and doc_b.strip()) or doc_a == "N/A" or not doc_a.strip():
+            continue
+        if topics.model_name(alignment) in covered:
+            # Found in the mod by another alignment of the same name
+            continue
+        topic = alignment["topic"]
+
+        previous = next((spans[j] for j in range(i - 1, -1, -1) if spans[j] is not None), None)
+        following = next((spans[j] for j in range(i + 1, len(alignments)) if spans[j] is not None), None)
+        after = _boundary_after(segments, previous[1]) if previous else None
+        before = _boundary_before(segments, following[0]) if following else None
+
+        ambiguous = False
+        if after is not None and before is not None:
+            method = "target_order"
+            # The mod document orders these neighbours differently from the target
+            ambiguous = after > before
+            offset = after
+        elif after is not None or before is not None:
+            method = "target_order"
+            offset = after if after is not None else before
+        else:
+            rank = canonical_rank(alignment["topic"])
+            offset = _canonical_offset(segments, rank) if rank is not None else None
+            method = "canonical_order"
+            if offset is None:
+                method, offset, ambiguous = "end", len(mod_text), True
+
+        plans.append({
+            "index": i,
+            "topic": topic,
+            "target_content": doc_a,
+            "offset": offset,
+            "method": method,
+            "ambiguous": ambiguous,
+        })
+    return plans
@@ -0,0 +1,98 @@
+"""
+Lexical similarity helpers (no LLM, no third-party dependencies).
+"""
+import math
+import re
+
+try:
+    import docstore
+except ImportError:
+    from . import docstore
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and any are as at be by for from has have in is it its of on or such that the their
+this to under which will with shall may not no other all been being each if into only than
+""".split())
+
+def words(text):
+    """
+    Lowercased word tokens without stopwords.
+    """
+    return [w for w in _TOKEN_PATTERN.findall(text.lower()) if w not in STOPWORDS]
+
+def shingles(text, size=3):
+    """
+    Set of hashed word n-grams, used for quick document-level similarity.
+    """
+    tokens = words(text)
+    if len(tokens) < size:
+        return {hash(tuple(tokens))} if tokens else set()
+    return {hash(tuple(tokens[i:i + size])) for i in range(len(tokens) - size + 1)}
+
+def document_shingles(text):
+    return docstore.artifact_for_text(text, "shingles", shingles)
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def document_similarity(text_a, text_b):
+    """
+    Quick 0..1 estimate of how much two documents share (word 3-gram Jaccard).
+    """
+    return jaccard(document_shingles(text_a), document_shingles(text_b))
+
+def _bag(text):
+    bag = {}
+    for w in words(text):
+        bag[w] = bag.get(w, 0) + 1
+    return bag
+
+def _weigh(bag, idf, default_idf=0.0):
+    vec = {w: (1 + math.log(c)) * idf.get(w, default_idf) for w, c in bag.items()}
+    norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+    return {w: v / norm for w, v in vec.items() if v}
+
+def tfidf_index(texts):
+    """
+    Returns (vectors, idf): one L2-normalized {term: weight} vector per text, and the idf
+    table so later queries (tfidf_query) are weighted against the same collection.
+    """
+    bags = [_bag(text) for text in texts]
+    df = {}
+    for bag in bags:
+        for w in bag:
+            df[w] = df.get(w, 0) + 1
+
+    n = len(texts)
+    idf = {w: math.log(1 + n / d) for w, d in df.items()}
+    return [_weigh(bag, idf) for bag in bags], idf
+
+def tfidf_vectors(texts):
+    """
+    Returns one {term: weight} vector per text, L2-normalized, with idf computed over texts.
+    """
+    return tfidf_index(texts)[0]
+
+def tfidf_query(text, idf):
+    """
+    Vector for a query against an index's idf table (terms unknown to the collection are dropped).
+    """
+    return _weigh(_bag(text), idf)
+
+def top_matches(query_vector, vectors, k):
+    """
+    Indices of the k vectors most similar to query_vector, best first (zero scores excluded).
+    """
+    scored = [(cosine(query_vector, v), i) for i, v in enumerate(vectors)]
+    scored = [s for s in scored if s[0] > 0]
+    scored.sort(key=lambda s: (-s[0], s[1]))
+    return [i for _, i in scored[:k]]
+
+def cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(w, 0.0) for w, v in a.items())
@@ -0,0 +1,308 @@
+"""
+Shared OpenAI client layer.
+
+Every chat completion in the API goes through chat_completion(), which adds:
+
+- token-bucket rate limiting for requests and tokens per minute (LLM_RPM / LLM_TPM)
+- AIMD adaptive concurrency: the in-flight limit halves on a 429 (at most once per burst:
+  calls started before the last decrease do not decrease it again) and grows back by
+  about one slot per limit's worth of successful calls
+- retries with exponential backoff and full jitter on 429s, timeouts, connection errors
+  and 5xx responses (honouring Retry-After)
+- a per-call timeout, clipped to the request deadline (see deadlines.py), which is
+  checked before every attempt
+- per-call prompt-prefix accounting: the share of input tokens the provider served from
+  its prompt cache, next to the share the caller laid out as a reusable prefix
+
+metrics() exposes counters for /metrics. Point OPENAI_BASE_URL at fake_llm_server.py to
+exercise the retry and throttling paths locally.
+"""
+import random
+import threading
+import time
+from collections import deque
+
+try:
+    import config
+    import deadlines
+    import tokens
+except ImportError:
+    from . import config
+    from . import deadlines
+    from . import tokens
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `per_minute` units per minute.
+    """
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount):
+        """
+        Blocks until `amount` units are available and takes them. Returns the seconds waited.
+        Requests larger than the bucket only wait for a full bucket.
+        Raises deadlines.Cancelled (taking nothing) if the request is cancelled or would
+        run out of time while waiting.
+        """
+        amount = min(float(amount), self.capacity)
+        started = time.monotonic()
+        while True:
+            deadlines.check()
+            with self.lock:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return time.monotonic() - started
+                delay = (amount - self.level) / self.rate
+            deadlines.wait(delay)
+
+    def adjust(self, amount):
+        """
+        Debits (positive) or credits (negative) units after the fact, e.g. once the actual
+        token usage of a call is known. The level may go negative.
+        """
+        with self.lock:
+            self._refill()
+            self.level = min(self.capacity, self.level - amount)
+
+class AdaptiveLimiter:
+    """
+    Additive-increase / multiplicative-decrease cap on concurrent calls.
+    Each decrease starts a new epoch; a throttled call only decreases the limit if it
+    started in the current epoch, so one burst of 429s from calls already in flight
+    halves the limit once instead of once per call.
+    """
+    # Longest single wait for a slot before the request deadline is checked again
+    WAIT_STEP_S = 0.1
+
+    def __init__(self, initial, minimum, maximum):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.epoch = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Blocks until a slot is free and takes it. Returns the current epoch, to be passed
+        back to release(). Raises deadlines.Cancelled (taking nothing) if the request is
+        cancelled or runs out of time while waiting.
+        """
+        with self.condition:
+            while self.in_flight >= max(self.minimum, int(self.limit)):
+                deadlines.check()
+                self.condition.wait(deadlines.remaining(self.WAIT_STEP_S))
+            self.in_flight += 1
+            return self.epoch
+
+    def release(self, epoch, throttled=False, success=False):
+        with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                if epoch == self.epoch:
+                    self.limit = max(float(self.minimum), self.limit / 2)
+                    self.epoch += 1
+            elif success:
+                self.limit = min(float(self.maximum), self.limit + 1.0 / max(self.limit, 1.0))
+            self.condition.notify_all()
+
+_lock = threading.Lock()
+_client = None
+_request_bucket = None
+_token_bucket = None
+_limiter = None
+_metrics = {
+    "requests": 0,
+    "successes": 0,
+    "failures": 0,
+    "retries": 0,
+    "rate_limited": 0,
+    "timeouts": 0,
+    "server_errors": 0,
+    "input_tokens": 0,
+    "output_tokens": 0,
+    "cached_tokens": 0,
+    "rate_limit_wait_s": 0.0,
+    "latency_s_total": 0.0,
+}
+# Prefix accounting of the most recent successful calls
+_recent_calls = deque(maxlen=50)
+
+def get_client():
+    """
+    Returns the shared OpenAI client, or None if no API key is configured.
+    Retries are disabled in the SDK because chat_completion handles them.
+    """
+    global _client
+    if _client is None:
+        api_key = config.OPENAI_API_KEY
+        if not api_key:
+            print("Warning: OPENAI_API_KEY is not set.")
+            return None
+        # Imported on first use: the openai package dominates cold-start import time
+        from openai import OpenAI
+        with _lock:
+            if _client is None:
+                _client = OpenAI(api_key=api_key, base_url=config.OPENAI_BASE_URL or None,
+                                 max_retries=0, timeout=config.LLM_TIMEOUT_S)
+    return _client
+
+def _controls():
+    global _request_bucket, _token_bucket, _limiter
+    if _limiter is None:
+        with _lock:
+            if _limiter is None:
+                _request_bucket = TokenBucket(config.LLM_RPM)
+                _token_bucket = TokenBucket(config.LLM_TPM)
+                _limiter = AdaptiveLimiter(config.LLM_MAX_CONCURRENCY, config.LLM_MIN_CONCURRENCY, config.LLM_MAX_CONCURRENCY)
+    return _request_bucket, _token_bucket, _limiter
+
+def _count(name, amount=1):
+    with _lock:
+        _metrics[name] += amount
+
+def _backoff(attempt, retry_after=None):
+    if retry_after is not None:
+        return min(retry_after, config.LLM_BACKOFF_MAX_S)
+    # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(config.LLM_BACKOFF_MAX_S, config.LLM_BACKOFF_BASE_S * (2 ** attempt)))
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def _record_prefix(usage, estimated_input, prefix_tokens):
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) or 0
+    _count("cached_tokens", cached)
+    call = {
+        "input_tokens": prompt_tokens or estimated_input,
+        "cached_tokens": cached,
+        "cached_prefix_ratio": round(cached / prompt_tokens, 3) if prompt_tokens else 0.0,
+    }
+    if prefix_tokens is not None:
+        call["prefix_tokens"] = prefix_tokens
+        call["prefix_ratio"] = round(min(1.0, prefix_tokens / estimated_input), 3) if estimated_input else 0.0
+    with _lock:
+        _recent_calls.append(call)
+    print(f"LLM call: {call['input_tokens']} input tokens, cached prefix ratio {call['cached_prefix_ratio']}")
+
+def chat_completion(messages, model=None, timeout=None, max_tokens=None, prefix_tokens=None):
+    """
+    Sends a chat completion through the shared client with rate limiting, adaptive
+    concurrency and retries. Returns the response, or raises the last error once
+    retries are exhausted. Raises RuntimeError if no API key is configured, and
+    deadlines.Cancelled once the request is cancelled or out of time.
+    prefix_tokens: estimated size of the prompt prefix shared with other calls (see
+    prompts.py), reported next to the provider's cached token count.
+    """
+    client = get_client()
+    if client is None:
+        raise RuntimeError("OPENAI_API_KEY not configured.")
+
+    import openai
+    request_bucket, token_bucket, limiter = _controls()
+    estimated_input = sum(tokens.estimate_tokens(m["content"]) for m in messages)
+    estimated = estimated_input + (max_tokens or config.LLM_EXPECTED_OUTPUT_TOKENS)
+    kwargs = {"model": model or config.LLM_MODEL, "messages": messages}
+    if max_tokens:
+        kwargs["max_tokens"] = max_tokens
+
+    attempt = 0
+    while True:
+        waited = request_bucket.acquire(1)
+        try:
+            waited += token_bucket.acquire(estimated)
+        except deadlines.Cancelled:
+            request_bucket.adjust(-1)
+            raise
+        _count("rate_limit_wait_s", waited)
+        deadlines.check()
+        kwargs["timeout"] = deadlines.remaining(timeout or config.LLM_TIMEOUT_S)
+        try:
+            epoch = limiter.acquire()
+        except deadlines.Cancelled:
+            request_bucket.adjust(-1)
+            token_bucket.adjust(-estimated)
+            raise
+        _count("requests")
+        started = time.monotonic()
+        throttled = False
+        success = False
+        retry_after = None
+        try:
+            response = client.chat.completions.create(**kwargs)
+            success = True
+        except openai.RateLimitError as e:
+            throttled = True
+            retry_after = _retry_after(e)
+            _count("rate_limited")
+            error = e
+        except openai.APITimeoutError as e:
+            _count("timeouts")
+            error = e
+        except openai.APIConnectionError as e:
+            error = e
+        except openai.InternalServerError as e:
+            _count("server_errors")
+            error = e
+        finally:
+            limiter.release(epoch, throttled=throttled, success=success)
+            _count("latency_s_total", time.monotonic() - started)
+
+        if success:
+            _count("successes")
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                used_in = getattr(usage, "prompt_tokens", 0) or 0
+                used_out = getattr(usage, "completion_tokens", 0) or 0
+                _count("input_tokens", used_in)
+                _count("output_tokens", used_out)
+                token_bucket.adjust(used_in + used_out - estimated)
+            _record_prefix(usage, estimated_input, prefix_tokens)
+            tokens.record_usage(response, prefix_tokens)
+            return response
+
+        if attempt >= config.LLM_MAX_RETRIES:
+            _count("failures")
+            # A timeout clipped by the deadline is the deadline's failure
+            deadlines.check()
+            raise error
+        delay = _backoff(attempt, retry_after)
+        print(f"LLM call failed ({type(error).__name__}), retry {attempt + 1}/{config.LLM_MAX_RETRIES} in {delay:.1f}s")
+        _count("retries")
+        attempt += 1
+        deadlines.wait(delay)
+
+def metrics():
+    """
+    Snapshot of client counters plus the current adaptive concurrency state.
+    """
+    with _lock:
+        snapshot = dict(_metrics)
+    snapshot["avg_latency_s"] = round(snapshot["latency_s_total"] / snapshot["requests"], 3) if snapshot["requests"] else 0.0
+    snapshot["rate_limit_wait_s"] = round(snapshot["rate_limit_wait_s"], 3)
+    snapshot["latency_s_total"] = round(snapshot["latency_s_total"], 3)
+    snapshot["cached_prefix_ratio"] = round(snapshot["cached_tokens"] / snapshot["input_tokens"], 3) if snapshot["input_tokens"] else 0.0
+    with _lock:
+        snapshot["recent_calls"] = list(_recent_calls)
+    if _limiter is not None:
+        snapshot["concurrency_limit"] = round(_limiter.limit, 2)
+        snapshot["in_flight"] = _limiter.in_flight
+    return snapshot
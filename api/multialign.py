@@ -0,0 +1,135 @@
+"""
+N-way alignment: several versions of a document against one pivot (e.g. a template).
+
+The pivot is segmented and indexed once (cached per pivot text) and every version is
+aligned to the same pivot clause set, so the per-version results share clause ids and
+can be merged into one topic x document matrix:
+
+- a row is a group of pivot clauses that the versions' alignments put under one topic
+  (pivot clauses grouped together by any version end up in the same row);
+- a cell holds the clause ids and spans of one document for that row, or None when the
+  version has no counterpart.
+
+Only the clause-id strategies ("clauses", "chunked", "local") return the pivot clause ids
+the merge is keyed on.
+"""
+try:
+    import aligner_clauses
+    import aligner_local
+    import config
+    import docstore
+    import lexical
+    import segmenter
+except ImportError:
+    from . import aligner_clauses
+    from . import aligner_local
+    from . import config
+    from . import docstore
+    from . import lexical
+    from . import segmenter
+
+STRATEGIES = ("clauses", "chunked", "local")
+
+def _build_pivot_index(text):
+    segments = segmenter.get_segments(text)
+    vectors, idf = lexical.tfidf_index([segmenter.segment_text(text, s) for s in segments])
+    return {"segments": segments, "vectors": vectors, "idf": idf}
+
+def pivot_index(pivot_text):
+    """
+    Pivot segmentation and TF-IDF index, built once per pivot text.
+    """
+    return docstore.artifact_for_text(pivot_text, "pivot_index", _build_pivot_index)
+
+def _align_local(pivot_text, index, version_text):
+    """
+    Local pairing against the pivot index: version clauses are weighted with the pivot's
+    idf, so only the version side is vectorized per call.
+    """
+    segments_b = segmenter.get_segments(version_text)
+    vectors_b = [lexical.tfidf_query(segmenter.segment_text(version_text, s), index["idf"]) for s in segments_b]
+
+    alignments = []
+    for seg_a, vec_a in zip(index["segments"], index["vectors"]):
+        best_score, best = 0.0, None
+        for seg_b, vec_b in zip(segments_b, vectors_b):
+            score = lexical.cosine(vec_a, vec_b)
+            if score > best_score:
+                best_score, best = score, seg_b
+
+        matched = best is not None and best_score >= config.LOCAL_MIN_SIMILARITY
+        alignments.append({
+            "topic": aligner_local.topic_from_heading(seg_a["heading"]),
+            "doc_a": segmenter.segment_text(pivot_text, seg_a),
+            "doc_b": segmenter.segment_text(version_text, best) if matched else "N/A",
+            "a_ids": [seg_a["id"]],
+            "b_ids": [best["id"]] if matched else [],
+            "spans_a": [[seg_a["start"], seg_a["end"]]],
+            "spans_b": [[best["start"], best["end"]]] if matched else [],
+            "score": round(best_score, 3),
+            "strategy": "local"
+        })
+    return alignments
+
+def align_version(strategy, pivot_text, version_text):
+    """
+    Aligns one version to the pivot. Returns the list of alignments, or an error string.
+    """
+    index = pivot_index(pivot_text)
+    if strategy == "local":
+        return _align_local(pivot_text, index, version_text)
+    if strategy == "chunked":
+        return aligner_clauses.align_documents_chunked(pivot_text, version_text)
+    # Same numbered pivot clauses in every prompt
+    return aligner_clauses.align_documents_clauses(pivot_text, version_text, index["segments"])
+
+def _cell(ids, segments_by_id):
+    ids = sorted(ids)
+    return {"ids": ids, "spans": aligner_clauses.ids_to_spans(ids, segments_by_id)} if ids else None
+
+def build_matrix(pivot_text, version_texts, results):
+    """
+    Merges per-version alignments (lists, or None for versions that failed) into rows:
+    [{"topic", "pivot": cell, "versions": [cell or None per version]}], in pivot order.
+    """
+    segments_by_id = {s["id"]: s for s in pivot_index(pivot_text)["segments"]}
+
+    # Union-find over pivot clause ids that share a topic in any version
+    parent = {}
+    def find(i):
+        while parent.setdefault(i, i) != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for alignments in results:
+        for alignment in alignments or []:
+            ids = [i for i in alignment.get("a_ids", []) if i in segments_by_id]
+            for i in ids[1:]:
+                parent[find(i)] = find(ids[0])
+
+    rows = {}
+    versions_by_id = []
+    for v, alignments in enumerate(results):
+        version_segments = segmenter.get_segments(version_texts[v]) if alignments else []
+        version_by_id = {s["id"]: s for s in version_segments}
+        versions_by_id.append(version_by_id)
+        for alignment in alignments or []:
+            ids = [i for i in alignment.get("a_ids", []) if i in segments_by_id]
+            if not ids:
+                continue
+            row = rows.setdefault(find(ids[0]), {"pivot_ids": set(), "topics": {}, "versions": [set() for _ in results]})
+            row["pivot_ids"].update(ids)
+            # The most frequent label across versions names the row
+            row["topics"][alignment["topic"]] = row["topics"].get(alignment["topic"], 0) + 1
+            row["versions"][v].update(i for i in alignment.get("b_ids", []) if i in version_by_id)
+
+    matrix = []
+    for row in sorted(rows.values(), key=lambda r: min(r["pivot_ids"])):
+        topic = max(row["topics"], key=lambda t: (row["topics"][t], -len(t)))
+        matrix.append({
+            "topic": topic,
+            "pivot": _cell(row["pivot_ids"], segments_by_id),
+            "versions": [_cell(ids, versions_by_id[v]) for v, ids in enumerate(row["versions"])],
+        })
+    return matrix
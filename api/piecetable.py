@@ -0,0 +1,143 @@
+"""
+Piece table for documents being edited (augmentation).
+
+The original text is never copied or modified: the document is a list of pieces, each
+pointing into the original text or into one inserted string. Inserting splits at most
+one piece, and locating an offset is a bisect over piece start offsets, so the cost of
+an edit depends on the number of pieces (a few per inserted clause), not on document
+length. The text is materialized once, at the end.
+
+Because original pieces keep their original offsets, any offset of the original text
+(e.g. an alignment span) can be mapped to the edited text with to_current().
+"""
+from bisect import bisect_right
+
+try:
+    import utils
+except ImportError:
+    from . import utils
+
+ORIGINAL = -1
+
+class PieceTable:
+    def __init__(self, text):
+        self.original = text
+        self.added = []
+        # Pieces: (source, start, length); source is ORIGINAL or an index into self.added
+        self.pieces = [(ORIGINAL, 0, len(text))] if text else []
+        self._starts = None
+
+    def __len__(self):
+        return sum(p[2] for p in self.pieces)
+
+    def _index(self):
+        """
+        (starts, originals, original_keys): current start offset of every piece, positions
+        of the pieces that point into the original text, and their original start offsets.
+        Rebuilt lazily after an edit.
+        """
+        if self._starts is None:
+            starts = []
+            originals = []
+            position = 0
+            for i, piece in enumerate(self.pieces):
+                starts.append(position)
+                if piece[0] == ORIGINAL:
+                    originals.append(i)
+                position += piece[2]
+            self._starts = (starts, originals, [self.pieces[i][1] for i in originals])
+        return self._starts
+
+    def insert(self, offset, text):
+        """
+        Inserts text at an offset of the current document. Returns its (start, end) span.
+        """
+        if not text:
+            return offset, offset
+        starts = self._index()[0]
+        index = bisect_right(starts, offset) - 1
+        self.added.append(text)
+        new_piece = (len(self.added) - 1, 0, len(text))
+
+        if index < 0 or offset == starts[index]:
+            # At a piece boundary (or the very start): no split needed
+            self.pieces.insert(max(index, 0), new_piece)
+        elif offset >= starts[index] + self.pieces[index][2]:
+            self.pieces.insert(index + 1, new_piece)
+        else:
+            source, start, length = self.pieces[index]
+            cut = offset - starts[index]
+            self.pieces[index:index + 1] = [(source, start, cut), new_piece, (source, start + cut, length - cut)]
+        self._starts = None
+        return offset, offset + len(text)
+
+    def to_current(self, offset, before_insertions=False):
+        """
+        Maps an offset of the original text to the current text. An offset where text was
+        inserted maps after the insertion by default (right for span starts), or before it
+        with before_insertions (right for span ends).
+        """
+        starts, originals, keys = self._index()
+        # Original pieces appear in original order: only the one starting at or before the
+        # offset and its predecessor (which may end exactly there) can contain it
+        at = max(0, bisect_right(keys, offset) - 1)
+        for index in originals[max(0, at - 1):at + 1]:
+            source, start, length = self.pieces[index]
+            if not start <= offset <= start + length:
+                continue
+            if offset == start and before_insertions:
+                # Step back over text inserted right before this piece
+                while index > 0 and self.pieces[index - 1][0] != ORIGINAL:
+                    index -= 1
+                return starts[index]
+            if offset == start + length and not before_insertions:
+                # Step forward over text inserted right after this piece
+                index += 1
+                while index < len(self.pieces) and self.pieces[index][0] != ORIGINAL:
+                    index += 1
+                return starts[index] if index < len(self.pieces) else len(self)
+            return starts[index] + offset - start
+        # Empty original text: everything is inserted
+        return 0 if before_insertions else len(self)
+
+    def remap_span(self, start, end):
+        """
+        Maps an original (start, end) span to the current text.
+        """
+        return self.to_current(start), max(self.to_current(start), self.to_current(end, before_insertions=True))
+
+    def text(self):
+        parts = []
+        for source, start, length in self.pieces:
+            buffer = self.original if source == ORIGINAL else self.added[source]
+            parts.append(buffer[start:start + length])
+        return "".join(parts)
+
+def shift_offset(offset_map, offset, before_insertions=False):
+    """
+    Maps an original offset through an offset map ([[original offset, inserted length], ...]
+    in offset order, as returned by augment_document) without the piece table.
+    Same tie rule as PieceTable.to_current.
+    """
+    shift = 0
+    for at, length in offset_map:
+        if at > offset or (at == offset and before_insertions):
+            break
+        shift += length
+    return offset + shift
+
+def apply_patches(base_text, patches, base_checksum=None):
+    """
+    Applies [[offset, inserted text], ...] patches (offsets into base_text, in order;
+    patches at the same offset are applied in list order) and returns the new text.
+    With base_checksum, raises ValueError unless it is the content hash of base_text.
+    frontend/src/patches.js implements the same for the browser.
+    """
+    if base_checksum is not None and utils.content_hash(base_text) != base_checksum:
+        raise ValueError("Patches were made for a different base text (checksum mismatch).")
+    table = PieceTable(base_text)
+    for offset, text in patches:
+        if not 0 <= offset <= len(base_text):
+            raise ValueError(f"Patch offset {offset} is outside the base text.")
+        table.insert(table.to_current(offset), text)
+    return table.text()
@@ -0,0 +1,152 @@
+"""
+On-demand sampling profiler.
+
+A Sampler thread wakes every PROFILE_INTERVAL_MS, walks the stack of every other thread
+(sys._current_frames) and counts identical stacks. The result is written in the
+collapsed-stack format ("thread;outer;...;inner count" per line) read by flamegraph.pl,
+speedscope and inferno. Time spent waiting on the LLM shows up as stacks ending in
+socket reads under llm.chat_completion, next to CPU work such as fuzzy scans or PDF
+extraction.
+
+By default only stacks that pass through project code are kept, so idle pool workers and
+the idle event loop do not drown the profile. With memory=True, tracemalloc runs for the
+duration and the peak of traced memory is reported (tracemalloc slows allocation-heavy
+code noticeably, so it only runs while a profile is being taken).
+
+Nothing here runs unless a profile is requested (see PROFILING_ENABLED).
+"""
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+
+try:
+    import config
+except ImportError:
+    from . import config
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_lock = threading.Lock()
+_tracemalloc_users = 0
+_profiles = OrderedDict()
+_ids = itertools.count(1)
+
+def _is_project_file(filename):
+    return filename.startswith(PROJECT_DIR) and "site-packages" not in filename
+
+def _thread_label(name):
+    # Pool workers ("asyncio_3", "ThreadPoolExecutor-0_1") merge into one root per pool
+    return re.sub(r"[-_]\d+(_\d+)?$", "", name)
+
+def _start_tracemalloc():
+    global _tracemalloc_users
+    with _lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracemalloc_users += 1
+        # Peak since this profile started (shared with any profile already running)
+        tracemalloc.reset_peak()
+
+def _stop_tracemalloc():
+    global _tracemalloc_users
+    with _lock:
+        peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+    return peak
+
+class Sampler:
+    def __init__(self, interval_ms=None, all_threads=False, memory=True):
+        self.interval = (interval_ms or config.PROFILE_INTERVAL_MS) / 1000.0
+        self.all_threads = all_threads
+        self.memory = memory
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+
+    def start(self):
+        if self.memory:
+            _start_tracemalloc()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops sampling and returns the profile: {"collapsed", "samples", "duration_s",
+        "interval_ms", "peak_memory_bytes"}.
+        """
+        self._stop.set()
+        self._thread.join()
+        duration = time.perf_counter() - self._started
+        peak = _stop_tracemalloc() if self.memory else None
+        return {
+            "collapsed": "\n".join(f"{stack} {count}" for stack, count in self.counts.most_common()) + "\n",
+            "samples": self.samples,
+            "duration_s": round(duration, 3),
+            "interval_ms": self.interval * 1000,
+            "peak_memory_bytes": peak,
+        }
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                in_project = self.all_threads
+                while frame is not None:
+                    code = frame.f_code
+                    in_project = in_project or _is_project_file(code.co_filename)
+                    stack.append(f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}")
+                    frame = frame.f_back
+                if not in_project:
+                    continue
+                stack.append(_thread_label(names.get(ident, "thread")))
+                # Spaces would break the "stack count" line format
+                self.counts[";".join(reversed(stack)).replace(" ", "_")] += 1
+            self.samples += 1
+
+def store(profile, label):
+    """
+    Keeps a finished profile for later download and returns its id.
+    """
+    with _lock:
+        profile_id = f"{next(_ids)}-{int(time.time())}"
+        _profiles[profile_id] = dict(profile, id=profile_id, label=label, created=time.time())
+        while len(_profiles) > config.PROFILE_KEEP:
+            _profiles.popitem(last=False)
+    return profile_id
+
+def get(profile_id):
+    with _lock:
+        return _profiles.get(profile_id)
+
+def summaries():
+    with _lock:
+        return [{k: v for k, v in p.items() if k != "collapsed"} for p in reversed(_profiles.values())]
+
+def headers(profile):
+    """
+    Response headers describing a profile (the body is the collapsed stacks).
+    """
+    values = {
+        "X-Profile-Id": profile["id"],
+        "X-Profile-Samples": str(profile["samples"]),
+        "X-Profile-Duration": str(profile["duration_s"]),
+        "Content-Disposition": f'attachment; filename="profile-{profile["id"]}.folded"',
+    }
+    if profile["peak_memory_bytes"] is not None:
+        values["X-Profile-Peak-Memory"] = str(profile["peak_memory_bytes"])
+    return values
@@ -0,0 +1,46 @@
+"""
+Prompt layout for prefix reuse.
+
+Alignment prompts are laid out as
+
+    system: the strategy's instructions (constant)
+    user:   the target document block, then the mod document block
+
+so every call against the same target starts with the same text. Provider-side prompt
+caching matches on exact prefixes, so one-template-against-many workloads only pay full
+price for the mod side. The rendered target block and its token count are cached per
+target hash, next to the compaction and segmentation they are built from.
+"""
+try:
+    import docstore
+    import tokens
+except ImportError:
+    from . import docstore
+    from . import tokens
+
+_instruction_tokens = {}
+
+def _measured(block):
+    return block, tokens.estimate_tokens(block)
+
+def target_block(text, name, render):
+    """
+    (block, token_count) for the target side of a prompt, built with render(text) once
+    per target hash. `name` identifies the prompt kind (each renders the target differently).
+    """
+    return docstore.artifact_for_text(text, "prompt_target:" + name, lambda t: _measured(render(t)))
+
+def build(instructions, target, mod_block):
+    """
+    Returns (messages, prefix_tokens): the chat messages, and the estimated token count of
+    the part shared by every call with these instructions and this target. `target` is a
+    (block, token_count) pair from target_block.
+    """
+    if instructions not in _instruction_tokens:
+        _instruction_tokens[instructions] = tokens.estimate_tokens(instructions)
+    block, block_tokens = target
+    messages = [
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": block + "\n\n" + mod_block},
+    ]
+    return messages, _instruction_tokens[instructions] + block_tokens
@@ -0,0 +1,275 @@
+"""
+Incremental re-alignment after edits to the mod document.
+
+Given the previous alignment of (target, mod) and the edits made to mod, only the
+clauses the edits touched are aligned again:
+
+1. Alignments whose mod-side span does not overlap an edit keep their text; their spans
+   (and clause ids) are shifted into the edited document.
+2. The edited document's clauses that overlap an edit form the mod side of a small
+   re-query; the target side is the clauses of the affected alignments plus the target
+   clauses that had no counterpart (an edit may have added one).
+3. The re-query results replace the affected alignments.
+
+The cost of the re-query depends on the size of the edit, not of the documents. Large
+edit sets are re-queried in batches (see _batches); if the request deadline passes, the
+batches already aligned are kept and the rest of the affected alignments come back
+marked "stale", with no mod side.
+"""
+from bisect import bisect_right
+
+try:
+    import aligner_clauses
+    import aligner_local
+    import config
+    import deadlines
+    import segmenter
+    import tokens
+except ImportError:
+    from . import aligner_clauses
+    from . import aligner_local
+    from . import config
+    from . import deadlines
+    from . import segmenter
+    from . import tokens
+
+def normalize_edits(edits, base_length):
+    """
+    Validates edits ({"start", "end", "text"}: replace base[start:end] with text, all
+    offsets in the base document) and returns them sorted as (start, end, text) tuples.
+    Raises ValueError for malformed, out-of-range or overlapping edits.
+    """
+    normalized = []
+    for e in edits:
+        if not isinstance(e, dict) or not isinstance(e.get("text", ""), str):
+            raise ValueError(f"Edit {e!r} must be an object with start, end and text.")
+        try:
+            normalized.append((int(e["start"]), int(e["end"]), e.get("text", "")))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Edit {e!r} needs integer start and end offsets.")
+    normalized.sort(key=lambda e: (e[0], e[1]))
+    previous_end = 0
+    for start, end, _ in normalized:
+        if not 0 <= start <= end <= base_length:
+            raise ValueError(f"Edit [{start}, {end}) is outside the document (length {base_length}).")
+        if start < previous_end:
+            raise ValueError(f"Edit at {start} overlaps the previous edit.")
+        previous_end = end
+    return normalized
+
+def apply_edits(base_text, edits):
+    pieces = []
+    last = 0
+    for start, end, text in edits:
+        pieces.append(base_text[last:start])
+        pieces.append(text)
+        last = end
+    pieces.append(base_text[last:])
+    return "".join(pieces)
+
+class OffsetShift:
+    """
+    Maps offsets of the base document that lie outside every edit into the edited one.
+    """
+    def __init__(self, edits):
+        self.ends = []
+        self.deltas = []
+        delta = 0
+        for start, end, text in edits:
+            delta += len(text) - (end - start)
+            self.ends.append(end)
+            self.deltas.append(delta)
+
+    def __call__(self, offset):
+        index = bisect_right(self.ends, offset) - 1
+        return offset + (self.deltas[index] if index >= 0 else 0)
+
+def _overlaps(start, end, edits):
+    # Half-open ranges: an insertion exactly at a clause boundary does not touch the clause
+    return any(s < end and start < e for s, e, _ in edits)
+
+def _mod_spans(alignment, base_mod):
+    if alignment.get("spans_b"):
+        return [list(s) for s in alignment["spans_b"]]
+    text = alignment.get("doc_b", "N/A")
+    if text == "N/A" or not text.strip() or text.startswith("[Error:"):
+        return []
+    index = base_mod.find(text)
+    return [[index, index + len(text)]] if index != -1 else None
+
+def _ids_in(spans, segments):
+    return [s["id"] for s in segments if any(start <= s["start"] and s["end"] <= end for start, end in spans)]
+
+def _target_start(alignment, target_text):
+    if alignment.get("spans_a"):
+        return alignment["spans_a"][0][0]
+    text = alignment.get("doc_a", "N/A")
+    index = target_text.find(text) if text != "N/A" and text.strip() else -1
+    return index if index != -1 else None
+
+def _target_segments(alignment, target_text, segments):
+    if alignment.get("a_ids"):
+        wanted = set(alignment["a_ids"])
+        return [s for s in segments if s["id"] in wanted]
+    spans = alignment.get("spans_a")
+    if not spans:
+        start = _target_start(alignment, target_text)
+        spans = [[start, start + len(alignment["doc_a"])]] if start is not None else []
+    return [s for s in segments if any(s["start"] < end and start < s["end"] for start, end in spans)]
+
+def _document_order(previous, requeried, target_text):
+    """
+    Merges the previous alignments ((original index, alignment), in original order) with
+    the re-queried ones, in target document order. An alignment whose target text cannot
+    be located stays right after the one that preceded it.
+    """
+    keyed = []
+    position = -1
+    for rank, (_, alignment) in enumerate(previous + [(None, a) for a in requeried]):
+        start = _target_start(alignment, target_text)
+        if start is not None:
+            position = start
+        keyed.append((position, rank, alignment))
+    keyed.sort(key=lambda entry: entry[:2])
+    return [alignment for _, _, alignment in keyed]
+
+def _batches(groups, target_ids, new_segments, target_segments, target_text, new_mod):
+    """
+    Turns the per-edit groups into re-query batches ({"ids_a", "ids_b", "affected"}):
+    groups sharing a mod clause are merged, then neighbouring groups are packed together
+    up to CHUNK_INPUT_TOKENS, so a large edit set is aligned in several calls.
+    """
+    merged = []
+    for group in groups:
+        ids_b = {seg["id"] for seg in new_segments
+                 if any(seg["start"] <= high and low <= seg["end"] for low, high in group["regions"])}
+        ids_a = set()
+        for i in group["affected"]:
+            ids_a |= target_ids[i]
+        if merged and (ids_b & merged[-1]["ids_b"] or not ids_b):
+            merged[-1]["ids_a"] |= ids_a
+            merged[-1]["ids_b"] |= ids_b
+            merged[-1]["affected"] += group["affected"]
+        else:
+            merged.append({"ids_a": ids_a, "ids_b": ids_b, "affected": list(group["affected"])})
+
+    texts_a = {seg["id"]: segmenter.segment_text(target_text, seg) for seg in target_segments}
+    texts_b = {seg["id"]: segmenter.segment_text(new_mod, seg) for seg in new_segments}
+
+    def cost(batch):
+        return (sum(tokens.estimate_tokens(texts_a[k]) for k in batch["ids_a"])
+                + sum(tokens.estimate_tokens(texts_b[k]) for k in batch["ids_b"]))
+
+    batches = []
+    for group in merged:
+        if batches and cost(batches[-1]) + cost(group) <= config.CHUNK_INPUT_TOKENS:
+            batches[-1]["ids_a"] |= group["ids_a"]
+            batches[-1]["ids_b"] |= group["ids_b"]
+            batches[-1]["affected"] += group["affected"]
+        else:
+            batches.append(group)
+    return batches
+
+def realign(target_text, base_mod, alignments, edits, strategy="clauses"):
+    """
+    Re-aligns after `edits` to base_mod. edits are as returned by normalize_edits.
+    Returns (new_mod_text, alignments, stats), or an error string if the re-query failed.
+    strategy is "clauses" (LLM) or "local". Stops at the request deadline with the
+    batches done so far (deadlines.mark_partial).
+    """
+    new_mod = apply_edits(base_mod, edits)
+    shift = OffsetShift(edits)
+    new_segments = segmenter.get_segments(new_mod)
+
+    kept, affected = [], []
+    for i, alignment in enumerate(alignments):
+        spans = _mod_spans(alignment, base_mod)
+        if spans is None or any(_overlaps(start, end, edits) for start, end in spans):
+            # Unlocatable text is treated as touched: it cannot be shifted safely
+            affected.append(i)
+            continue
+        alignment = dict(alignment)
+        if spans:
+            spans = [[shift(start), shift(end)] for start, end in spans]
+            if alignment.get("spans_b"):
+                alignment["spans_b"] = spans
+            if alignment.get("b_ids"):
+                # Clause ids are positional: re-derive them in the edited document
+                alignment["b_ids"] = _ids_in(spans, new_segments)
+        kept.append((i, alignment))
+
+    # Re-query groups, one per edit: its new text plus where the affected alignments it
+    # touched now sit (mod side), and those alignments' clauses (target side)
+    groups = [{"regions": [], "affected": []} for _ in edits] or [{"regions": [], "affected": []}]
+    delta = 0
+    for k, (start, end, text) in enumerate(edits):
+        groups[k]["regions"].append((start + delta, start + delta + len(text)))
+        delta += len(text) - (end - start)
+    for i in affected:
+        spans = _mod_spans(alignments[i], base_mod) or []
+        k = next((k for k, (s, e, _) in enumerate(edits)
+                  if any(s < end and start < e for start, end in spans)), 0)
+        groups[k]["affected"].append(i)
+        groups[k]["regions"].extend((shift(start), shift(end)) for start, end in spans)
+
+    target_segments = segmenter.get_segments(target_text)
+    target_ids = {}
+    missing_ids = set()
+    for i, alignment in enumerate(alignments):
+        missing = alignment.get("doc_b", "N/A") == "N/A" or not alignment.get("doc_b", "").strip()
+        if i in affected or missing:
+            target_ids[i] = {seg["id"] for seg in _target_segments(alignment, target_text, target_segments)}
+            if missing and i not in affected:
+                # A target clause without counterpart may match text an edit added
+                missing_ids |= target_ids[i]
+
+    batches = _batches(groups, target_ids, new_segments, target_segments, target_text, new_mod)
+    stats = {
+        "edits": len(edits),
+        "kept": len(kept),
+        "affected": len(affected),
+        "batches": len(batches),
+        "requeried_target_clauses": 0,
+        "requeried_mod_clauses": 0,
+        "stale": 0,
+    }
+
+    # One re-query per batch. Out of time, the batches not run leave their affected
+    # alignments stale and the result is marked partial
+    requeried = []
+    covered = set()
+    stale = set()
+    segments_a_by_id = {seg["id"]: seg for seg in target_segments}
+    for n, batch in enumerate(batches):
+        segments_a = [segments_a_by_id[k] for k in sorted(batch["ids_a"] | (missing_ids - covered))]
+        segments_b = [seg for seg in new_segments if seg["id"] in batch["ids_b"]]
+        if not segments_a or not segments_b:
+            continue
+        try:
+            deadlines.check()
+            if strategy == "local":
+                result = aligner_local.align_documents_local(target_text, new_mod, segments_a, segments_b)
+            else:
+                result = aligner_clauses.align_documents_clauses(target_text, new_mod, segments_a, segments_b)
+        except deadlines.DeadlineExceeded:
+            deadlines.mark_partial()
+            stale = {i for later in batches[n:] for i in later["affected"]}
+            break
+        if isinstance(result, str):
+            return result
+        requeried.extend(result)
+        covered |= {a_id for a in result for a_id in a.get("a_ids", [])}
+        stats["requeried_target_clauses"] += len(segments_a)
+        stats["requeried_mod_clauses"] += len(segments_b)
+    stats["stale"] = len(stale)
+
+    # Re-queried target clauses supersede the missing-topic alignments that held them;
+    # affected alignments the re-query did not cover lost their mod-side counterpart
+    previous = [(i, a) for i, a in kept if not (i in target_ids and target_ids[i] & covered)]
+    for i in affected:
+        if i in stale:
+            previous.append((i, dict(alignments[i], doc_b="N/A", b_ids=[], spans_b=[], stale=True)))
+        elif not target_ids[i] & covered:
+            previous.append((i, dict(alignments[i], doc_b="N/A", b_ids=[], spans_b=[])))
+    previous.sort(key=lambda entry: entry[0])
+    return new_mod, _document_order(previous, requeried, target_text), stats
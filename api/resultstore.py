@@ -0,0 +1,279 @@
+"""
+Persistent results store.
+
+docstore keeps results only as long as the process (and only a bounded number of them).
+This module records the alignments and augmentations served in a local SQLite database:
+one row per result with the content hashes of its documents, and one row per clause with
+its topic, text, text hash and exact [start, end) span in its document. An FTS5 index over
+topic and clause text answers questions such as "every governing law clause we have seen"
+without calling the LLM again.
+
+The store is off unless RESULTS_DB_PATH is set, and keeps the newest RESULTS_MAX_RESULTS
+results. Recording never fails a request: if the database cannot be opened (e.g. a
+read-only filesystem), the store disables itself and says so once.
+"""
+import re
+import sqlite3
+import threading
+import time
+
+try:
+    import config
+    import utils
+except ImportError:
+    from . import config
+    from . import utils
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,              -- "alignment" | "augmentation"
+    alignment_id TEXT NOT NULL,
+    strategy TEXT,
+    target_hash TEXT NOT NULL,
+    mod_hash TEXT NOT NULL,
+    output_hash TEXT,                -- augmented document
+    created REAL NOT NULL,
+    UNIQUE (kind, alignment_id)
+);
+CREATE TABLE IF NOT EXISTS clauses (
+    id INTEGER PRIMARY KEY,
+    result_id INTEGER NOT NULL REFERENCES results(id),
+    topic TEXT NOT NULL,
+    side TEXT NOT NULL,              -- "A" (target) | "B" (mod) | "inserted" (augmented document)
+    doc_hash TEXT NOT NULL,
+    start INTEGER,                   -- NULL when the clause was not found in its document
+    end INTEGER,
+    text_hash TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clauses_result ON clauses(result_id);
+CREATE INDEX IF NOT EXISTS clauses_doc ON clauses(doc_hash);
+CREATE INDEX IF NOT EXISTS results_target ON results(target_hash);
+CREATE INDEX IF NOT EXISTS results_mod ON results(mod_hash);
+-- side and doc_hash are indexed too, so filters on them stay inside the FTS scan
+CREATE VIRTUAL TABLE IF NOT EXISTS clause_index USING fts5(
+    topic, text, side, doc_hash, content='clauses', content_rowid='id', tokenize='porter unicode61'
+);
+"""
+
+SIDES = ("A", "B", "inserted")
+ORDERS = ("recent", "relevance")
+
+_lock = threading.Lock()
+_conn = None
+_disabled = False
+
+def _connection():
+    """
+    The shared connection, opened on first use. Returns None when the store is disabled.
+    """
+    global _conn, _disabled
+    if _conn is not None or _disabled:
+        return _conn
+    if not config.RESULTS_DB_PATH:
+        _disabled = True
+        return None
+    try:
+        conn = sqlite3.connect(config.RESULTS_DB_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _conn = conn
+    except sqlite3.Error as e:
+        print(f"Results store disabled ({config.RESULTS_DB_PATH}): {e}")
+        _disabled = True
+    return _conn
+
+def enabled():
+    with _lock:
+        return _connection() is not None
+
+def _locate(doc, text, hint=0):
+    """
+    [start, end) of text in doc, searching from hint first (clauses mostly come in order).
+    """
+    start = doc.find(text, hint)
+    if start == -1 and hint:
+        start = doc.find(text)
+    return (start, start + len(text)) if start != -1 else (None, None)
+
+def _clause_rows(alignments, target_text, mod_text, target_hash, mod_hash):
+    rows = []
+    hints = {"A": 0, "B": 0}
+    for align in alignments:
+        topic = align.get("topic") or ""
+        for key, side, doc, doc_hash, spans_key in (("doc_a", "A", target_text, target_hash, "spans_a"),
+                                                    ("doc_b", "B", mod_text, mod_hash, "spans_b")):
+            text = align.get(key) or ""
+            if not text.strip() or text == "N/A" or text.startswith("[Error:"):
+                continue
+            spans = align.get(spans_key)
+            if spans:
+                # Clause-id strategies: the text runs from the first span to the last
+                start, end = spans[0][0], spans[-1][1]
+            else:
+                start, end = _locate(doc, text, hints[side])
+            if end is not None:
+                hints[side] = end
+            rows.append((topic, side, doc_hash, start, end, utils.content_hash(text), text))
+    return rows
+
+def _prune(conn):
+    """
+    Deletes the oldest results (with their clauses and index entries) beyond RESULTS_MAX_RESULTS.
+    """
+    limit = config.RESULTS_MAX_RESULTS
+    if limit <= 0:
+        return
+    old = [row[0] for row in conn.execute("SELECT id FROM results ORDER BY id DESC LIMIT -1 OFFSET ?", (limit,))]
+    if not old:
+        return
+    marks = ", ".join("?" * len(old))
+    # External-content FTS5 rows are removed by replaying their values with the 'delete' command
+    conn.execute(
+        "INSERT INTO clause_index (clause_index, rowid, topic, text, side, doc_hash) "
+        f"SELECT 'delete', id, topic, text, side, doc_hash FROM clauses WHERE result_id IN ({marks})", old)
+    conn.execute(f"DELETE FROM clauses WHERE result_id IN ({marks})", old)
+    conn.execute(f"DELETE FROM results WHERE id IN ({marks})", old)
+
+def _insert(kind, alignment_id, strategy, target_hash, mod_hash, output_hash, rows):
+    with _lock:
+        conn = _connection()
+        if conn is None:
+            return None
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO results (kind, alignment_id, strategy, target_hash, mod_hash, output_hash, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (kind, alignment_id, strategy, target_hash, mod_hash, output_hash, time.time()))
+                if not cursor.rowcount:
+                    # Already recorded (repeated or coalesced request)
+                    return conn.execute("SELECT id FROM results WHERE kind = ? AND alignment_id = ?",
+                                        (kind, alignment_id)).fetchone()[0]
+                result_id = cursor.lastrowid
+                for row in rows:
+                    clause_id = conn.execute(
+                        "INSERT INTO clauses (result_id, topic, side, doc_hash, start, end, text_hash, text) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (result_id,) + row).lastrowid
+                    conn.execute("INSERT INTO clause_index (rowid, topic, text, side, doc_hash) VALUES (?, ?, ?, ?, ?)",
+                                 (clause_id, row[0], row[-1], row[1], row[2]))
+                _prune(conn)
+            return result_id
+        except sqlite3.Error as e:
+            print(f"Results store: could not record {kind} {alignment_id}: {e}")
+            return None
+
+def record_alignment(alignments, target_text, mod_text, alignment_id, strategy=None):
+    """
+    Records an alignment result (as stored in docstore under alignment_id).
+    Returns the result row id, or None if the store is disabled or the write failed.
+    """
+    target_hash = utils.content_hash(target_text)
+    mod_hash = utils.content_hash(mod_text)
+    rows = _clause_rows(alignments, target_text, mod_text, target_hash, mod_hash)
+    return _insert("alignment", alignment_id, strategy, target_hash, mod_hash, None, rows)
+
+def record_augmentation(result, target_text, mod_text, strategy=None):
+    """
+    Records an augment_document result (with its "augmented_text" and "alignment_id"):
+    the generated clauses with their spans in the augmented document, and the returned
+    alignments, whose mod side is in augmented-document coordinates.
+    """
+    target_hash = utils.content_hash(target_text)
+    augmented_text = result["augmented_text"]
+    output_hash = utils.content_hash(augmented_text)
+    rows = _clause_rows(result["alignments"], target_text, augmented_text, target_hash, output_hash)
+    for ins in result["insertions"]:
+        start, end = ins["span"]
+        rows.append((ins["topic"], "inserted", output_hash, start, end, utils.content_hash(ins["text"]), ins["text"]))
+    return _insert("augmentation", result["alignment_id"], strategy, target_hash,
+                   utils.content_hash(mod_text), output_hash, rows)
+
+def _match_expression(query, column=None):
+    """
+    FTS5 query for free text: every word must match (the last one as a prefix, for
+    search-as-you-type). Quoting each word keeps FTS5 operators in user input inert.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*']
+    expression = " ".join(terms)
+    return f"{column} : ({expression})" if column else expression
+
+def search_topics(query, limit=20):
+    """
+    Topics whose name matches query, most frequent first:
+    [{"topic", "clauses", "results", "documents", "last_seen"}].
+    """
+    expression = _match_expression(query, "topic")
+    if expression is None:
+        return []
+    with _lock:
+        conn = _connection()
+        if conn is None:
+            return []
+        rows = conn.execute(
+            "SELECT c.topic, COUNT(*), COUNT(DISTINCT c.result_id), COUNT(DISTINCT c.doc_hash), MAX(r.created) "
+            "FROM clause_index JOIN clauses c ON c.id = clause_index.rowid JOIN results r ON r.id = c.result_id "
+            "WHERE clause_index MATCH ? GROUP BY c.topic ORDER BY COUNT(*) DESC, c.topic LIMIT ?",
+            (expression, limit)).fetchall()
+    return [{"topic": topic, "clauses": clauses, "results": results, "documents": documents, "last_seen": last_seen}
+            for topic, clauses, results, documents, last_seen in rows]
+
+def search_clauses(query=None, topic=None, side=None, doc_hash=None, limit=20, offset=0, order="recent"):
+    """
+    Stored clauses matching the full-text query (topic or text) and/or topic name, and the
+    side and document filters. order="recent" (newest first) stops at the first `limit`
+    matches; "relevance" (bm25) has to score every match, so it slows down with broad
+    queries over a large store.
+    Each item: {"clause_id", "topic", "side", "doc_hash", "span", "text_hash", "text",
+    "snippet", "result": {"kind", "alignment_id", "strategy", "target_hash", "mod_hash",
+    "output_hash", "created"}}.
+    """
+    if (side and side not in SIDES) or (doc_hash and not doc_hash.isalnum()):
+        return []
+    # Every filter is an FTS term, so the whole selection is one index scan
+    terms = [
+        _match_expression(query or "", "{topic text}"),
+        _match_expression(topic or "", "topic"),
+        f'side : "{side}"' if side else None,
+        f'doc_hash : "{doc_hash}"' if doc_hash else None,
+    ]
+    terms = [t for t in terms if t]
+    with _lock:
+        conn = _connection()
+        if conn is None:
+            return []
+        if terms:
+            hits = conn.execute(
+                "SELECT rowid, snippet(clause_index, 1, '[', ']', '…', 16) FROM clause_index WHERE clause_index MATCH ? "
+                f"ORDER BY {'rank' if order == 'relevance' else 'rowid DESC'} LIMIT ? OFFSET ?",
+                (" AND ".join(f"({t})" for t in terms), limit, offset)).fetchall()
+        else:
+            hits = conn.execute("SELECT id, NULL FROM clauses ORDER BY id DESC LIMIT ? OFFSET ?", (limit, offset)).fetchall()
+        snippets = dict(hits)
+        rows = conn.execute(
+            "SELECT c.id, c.topic, c.side, c.doc_hash, c.start, c.end, c.text_hash, c.text, "
+            "r.kind, r.alignment_id, r.strategy, r.target_hash, r.mod_hash, r.output_hash, r.created "
+            f"FROM clauses c JOIN results r ON r.id = c.result_id WHERE c.id IN ({', '.join('?' * len(snippets))})",
+            list(snippets)).fetchall() if snippets else []
+    by_id = {row[0]: row for row in rows}
+    return [{
+        "clause_id": row[0], "topic": row[1], "side": row[2], "doc_hash": row[3],
+        "span": [row[4], row[5]] if row[4] is not None else None,
+        "text_hash": row[6], "text": row[7], "snippet": snippets[row[0]],
+        "result": {"kind": row[8], "alignment_id": row[9], "strategy": row[10], "target_hash": row[11],
+                   "mod_hash": row[12], "output_hash": row[13], "created": row[14]},
+    } for row in (by_id[clause_id] for clause_id in snippets if clause_id in by_id)]
+
+def stats():
+    with _lock:
+        conn = _connection()
+        if conn is None:
+            return {"enabled": False}
+        results = dict(conn.execute("SELECT kind, COUNT(*) FROM results GROUP BY kind").fetchall())
+        clauses = conn.execute("SELECT COUNT(*) FROM clauses").fetchone()[0]
+    return {"enabled": True, "path": config.RESULTS_DB_PATH, "results": results, "clauses": clauses}
@@ -0,0 +1,146 @@
+import re
+
+try:
+    import docstore
+except ImportError:
+    from . import docstore
+
+# Lines that open a new clause: "1.", "2.3", "(a)", "(iv)", "A.", "Section 4", "ARTICLE II", recitals
+HEADING_PATTERN = re.compile(
+    r"^\s*(?:"
+    r"\d+(?:\.\d+)*\.?(?=\s)"
+    r"|\((?:[a-z]{1,2}|[ivxlc]+|\d+)\)"
+    r"|[A-Z]\.(?=\s)"
+    r"|(?:Section|SECTION|Article|ARTICLE|Clause|CLAUSE)\s+[\dIVXLC]+"
+    r"|WHEREAS\b|NOW,?\s*THEREFORE\b|IN WITNESS WHEREOF\b"
+    r")"
+)
+
+# Segments shorter than this (bare headings like "A. Definitions") are merged into the next one
+MIN_SEGMENT_CHARS = 60
+# Segments longer than this are split at the last sentence-ending line break before the limit
+MAX_SEGMENT_CHARS = 2000
+
+def _lines(text):
+    """
+    Yields (start, end) of every line, end excluding the newline.
+    """
+    start = 0
+    for match in re.finditer(r"\n", text):
+        yield start, match.start()
+        start = match.end()
+    if start < len(text):
+        yield start, len(text)
+
+def _is_caps_heading(line):
+    letters = [c for c in line if c.isalpha()]
+    return 3 <= len(letters) and len(line.strip()) <= 80 and all(c.isupper() for c in letters)
+
+def _trim(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def _split_long(text, start, end):
+    """
+    Splits an over-long span at sentence-ending line breaks so no piece exceeds MAX_SEGMENT_CHARS
+    (a single unbreakable run is left as is).
+    """
+    pieces = []
+    while end - start > MAX_SEGMENT_CHARS:
+        cut = -1
+        for match in re.finditer(r"[.;:]\s*\n", text[start:start + MAX_SEGMENT_CHARS]):
+            cut = start + match.end()
+        if cut <= start:
+            break
+        pieces.append(_trim(text, start, cut))
+        start = _trim(text, cut, end)[0]
+    pieces.append((start, end))
+    return pieces
+
+def segment_document(text):
+    """
+    Splits a document into clauses using numbering, recitals, all-caps headings and
+    paragraph breaks. Segments are exact, whitespace-trimmed spans of the input.
+    Returns a list of dicts: [{'id': 1, 'start': ..., 'end': ..., 'heading': ...}]
+    """
+    # 1. Find clause starts
+    starts = []
+    prev_blank = True
+    last_content = ""
+    for start, end in _lines(text):
+        line = text[start:end]
+        if not line.strip():
+            prev_blank = True
+            continue
+        stripped = line.strip()
+        # A blank line only ends a clause if the text before it looks finished;
+        # page breaks in the middle of a sentence also produce blank lines.
+        paragraph_break = prev_blank and (
+            not last_content
+            or last_content[-1] in '.:;)"”'
+            or len(last_content) < MIN_SEGMENT_CHARS
+        ) and not stripped[0].islower()
+        if not starts or HEADING_PATTERN.match(line) or _is_caps_heading(line) or paragraph_break:
+            starts.append(start)
+        prev_blank = False
+        last_content = stripped
+
+    # 2. Turn starts into trimmed spans
+    spans = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(text)
+        span = _trim(text, start, end)
+        if span[1] > span[0]:
+            spans.append(span)
+
+    # 3. Merge bare headings into the clause that follows them
+    merged = []
+    carry = None
+    for start, end in spans:
+        if carry is not None:
+            start = carry
+            carry = None
+        if end - start < MIN_SEGMENT_CHARS and (start, end) != spans[-1]:
+            carry = start
+            continue
+        merged.append((start, end))
+    if carry is not None:
+        merged.append((carry, spans[-1][1]))
+
+    # 4. Split anything too long for a single clause
+    segments = []
+    for start, end in merged:
+        for piece_start, piece_end in _split_long(text, start, end):
+            first_line = text[piece_start:piece_end].split("\n", 1)[0].strip()
+            segments.append({
+                "id": len(segments) + 1,
+                "start": piece_start,
+                "end": piece_end,
+                "heading": first_line[:80],
+            })
+    return segments
+
+def get_segments(text):
+    """
+    Cached segmentation, shared across requests through the document store.
+    """
+    return docstore.artifact_for_text(text, "segments", segment_document)
+
+def segment_text(text, segment):
+    return text[segment["start"]:segment["end"]]
+
+def find_segment(segments, offset):
+    """
+    Returns the index of the segment containing offset (or the last one starting before it), or -1.
+    """
+    lo, hi = 0, len(segments)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if segments[mid]["start"] <= offset:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo - 1
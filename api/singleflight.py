@@ -0,0 +1,112 @@
+"""
+In-flight request coalescing ("single flight").
+
+Concurrent calls with the same key share one execution: the first caller runs the
+function, later callers wait for it and receive the same result (or exception).
+Nothing is kept once the call finishes, so this is independent of any caching.
+
+The shared call runs under the leader's request deadline. If the leader's request is
+cancelled (client gone, deadline hit), waiters whose own request is still live run the
+call again instead of failing with someone else's cancellation.
+"""
+import asyncio
+import threading
+
+try:
+    import deadlines
+    import utils
+except ImportError:
+    from . import deadlines
+    from . import utils
+
+def make_key(*parts):
+    """
+    Hashes the parts (strings, or anything with a stable repr) into a compact key.
+    """
+    return utils.content_hash("\x1f".join(p if isinstance(p, str) else repr(p) for p in parts))
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class Group:
+    """
+    Single flight for blocking functions called from threads.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) unless a call with this key is already running, in which
+        case waits for that call. Returns (result, shared) where shared is True for waiters.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                if isinstance(call.error, deadlines.Cancelled) and not deadlines.expired():
+                    return self.do(key, fn, *args, **kwargs)
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        with self.lock:
+            return {"in_flight": len(self.calls), "coalesced": self.coalesced}
+
+class AsyncGroup:
+    """
+    Single flight for blocking functions awaited from the event loop. The function runs
+    in a worker thread (with the leader's context variables) and waiters await the same
+    future, so they hold no thread while waiting.
+    """
+    def __init__(self):
+        self.calls = {}
+        self.coalesced = 0
+
+    async def do(self, key, fn, *args):
+        """
+        Same contract as Group.do: returns (result, shared).
+        """
+        future = self.calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            try:
+                # shield: a waiter going away must not cancel the shared call
+                return await asyncio.shield(future), True
+            except deadlines.Cancelled:
+                if deadlines.expired():
+                    raise
+                return await self.do(key, fn, *args)
+
+        future = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+        self.calls[key] = future
+        future.add_done_callback(lambda _: self.calls.pop(key, None))
+        return await asyncio.shield(future), False
+
+    def stats(self):
+        return {"in_flight": len(self.calls), "coalesced": self.coalesced}
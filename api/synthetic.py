@@ -0,0 +1,253 @@
+"""
+Synthetic contracts for scaling benchmarks.
+
+generate_pair() builds a target/mod pair of NDA-like contracts with a chosen number of
+clauses, laid out like read_pdf output: lines wrapped at a fixed width, words hyphenated
+across line breaks, words broken by stray spaces ("discussi ons"), and a running header
+and page number every PAGE_LINES lines, so page breaks land in the middle of clauses.
+The mod rewords every clause and leaves some topics out. The ground truth (exact spans of
+every clause in both documents) is kept, and mock_outputs() turns it into the replies
+each aligner would get from a perfect model.
+
+Generated text never contains ";" or ":" so the standard "Topic: doc A: ..., doc B: ...;"
+format stays parseable at any size.
+"""
+import random
+
+try:
+    import compactor
+    import segmenter
+except ImportError:
+    from . import compactor
+    from . import segmenter
+
+LINE_WIDTH = 80
+PAGE_LINES = 48
+TITLE = "MUTUAL NON-DISCLOSURE AGREEMENT"
+
+BASE_TOPICS = [
+    "Definitions", "Purpose", "Confidential Information", "Confidentiality Obligations",
+    "Exclusions", "Permitted Disclosure", "Compelled Disclosure", "Return of Materials",
+    "Destruction of Materials", "Ownership", "No License", "Intellectual Property",
+    "Warranties", "Disclaimer", "Term", "Termination", "Survival", "Remedies",
+    "Injunctive Relief", "Limitation of Liability", "Indemnification", "Non-Solicitation",
+    "Non-Competition", "Assignment", "Governing Law", "Jurisdiction", "Dispute Resolution",
+    "Arbitration", "Notices", "Entire Agreement", "Amendment", "Severability", "Waiver",
+    "Counterparts", "Export Control", "Data Protection", "Publicity", "Insurance",
+    "Audit Rights", "Force Majeure",
+]
+QUALIFIERS = ["", "of Affiliates", "for Contractors", "for Personal Data", "in Schedules", "after Closing"]
+
+PARTIES = {
+    "target": ("the Recipient", "the Discloser", "this Agreement"),
+    "mod": ("the Receiving Party", "the Disclosing Party", "these Terms"),
+}
+SUBJECTS = [
+    "all {info} received in connection with the {purpose}",
+    "any {info} disclosed before or after the Effective Date",
+    "copies, notes and summaries of {info}",
+    "{info} held by its employees, advisers and agents",
+    "records relating to the {purpose}",
+]
+VERBS = [
+    "shall hold in strict confidence", "shall not disclose to any third party",
+    "shall use only for the {purpose}", "shall protect with reasonable care",
+    "shall promptly return or destroy", "shall not copy or reverse engineer",
+    "may disclose to its professional advisers", "shall notify {other} in writing of any loss of",
+]
+CONDITIONS = [
+    "unless {other} gives prior written consent",
+    "for the duration of the discussions between the parties",
+    "except as required by applicable law or regulation",
+    "within thirty days after a written request by {other}",
+    "to the same standard it applies to its own information",
+    "provided that such disclosure is limited to those with a need to know",
+    "and such obligation survives termination of {agreement}",
+]
+INFO = ["Confidential Information", "proprietary information", "technical data", "business information"]
+PURPOSES = ["Purpose", "proposed transaction", "evaluation of the business opportunity", "discussions"]
+
+def topic_names(n):
+    """
+    n distinct topic names: the base topics first, then qualified variants.
+    """
+    names = []
+    for qualifier in QUALIFIERS:
+        for base in BASE_TOPICS:
+            names.append(f"{base} {qualifier}".strip())
+            if len(names) == n:
+                return names
+    # More clauses than names: number the rest
+    round_ = 2
+    while len(names) < n:
+        names.extend(f"{name} Part {round_}" for name in names[:n - len(names)])
+        round_ += 1
+    return names[:n]
+
+def _sentence(rng, side):
+    party, other, agreement = PARTIES[side]
+    fill = {"info": rng.choice(INFO), "purpose": rng.choice(PURPOSES), "other": other, "agreement": agreement}
+    subject = rng.choice(SUBJECTS).format(**fill)
+    verb = rng.choice(VERBS).format(**fill)
+    condition = rng.choice(CONDITIONS).format(**fill)
+    return f"{party[0].upper()}{party[1:]} {verb} {subject} {condition}."
+
+def clause_body(topic, side, words, seed):
+    """
+    A clause of roughly `words` words about `topic`. The same (topic, seed) gives the
+    same clause; the mod side uses different party names and sentence choices.
+    """
+    rng = random.Random(f"{seed}:{side}:{topic}")
+    sentences = []
+    count = 0
+    while count < words:
+        sentence = _sentence(rng, side)
+        sentences.append(sentence)
+        count += len(sentence.split())
+    return " ".join(sentences)
+
+def _add_noise(text, rng, broken_word_rate):
+    # Stray spaces inside long words, as left by PDF text extraction
+    out = []
+    for word in text.split(" "):
+        if len(word) > 6 and word.isalpha() and rng.random() < broken_word_rate:
+            cut = rng.randrange(3, len(word) - 2)
+            word = f"{word[:cut]} {word[cut:]}"
+        out.append(word)
+    return " ".join(out)
+
+def _wrap(text, rng, hyphen_rate):
+    """
+    Wraps text at LINE_WIDTH, sometimes splitting the word at the break with a hyphen.
+    """
+    lines = []
+    line = ""
+    for word in text.split(" "):
+        if line and len(line) + 1 + len(word) > LINE_WIDTH:
+            if len(word) > 7 and word.isalpha() and word.islower() and rng.random() < hyphen_rate:
+                cut = rng.randrange(3, len(word) - 3)
+                lines.append(f"{line} {word[:cut]}-")
+                line = word[cut:]
+                continue
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+def render(clauses, rng, broken_word_rate=0.01, hyphen_rate=0.3):
+    """
+    Lays out [(heading, body), ...] as extracted PDF text.
+    Returns (text, spans): spans[i] is the [start, end] of clause i, running headers
+    included when a page break falls inside it.
+    """
+    # (line, clause index or None)
+    lines = [(TITLE, None), ("", None)]
+    for i, (heading, body) in enumerate(clauses):
+        for line in _wrap(f"{heading} {_add_noise(body, rng, broken_word_rate)}", rng, hyphen_rate):
+            lines.append((line, i))
+        lines.append(("", None))
+
+    pages = (len(lines) + PAGE_LINES - 1) // PAGE_LINES
+    parts = []
+    spans = [None] * len(clauses)
+    pos = 0
+
+    def emit(line, index=None):
+        nonlocal pos
+        if index is not None:
+            if spans[index] is None:
+                spans[index] = [pos, pos + len(line)]
+            else:
+                spans[index][1] = pos + len(line)
+        parts.append(line)
+        pos += len(line) + 1
+
+    for n, (line, index) in enumerate(lines):
+        if n and n % PAGE_LINES == 0:
+            emit(f"Page {n // PAGE_LINES} of {pages}")
+            emit(TITLE)
+        emit(line, index)
+    return "\n".join(parts), spans
+
+def generate_pair(n_clauses, seed=0, words=120, missing=3, broken_word_rate=0.01, hyphen_rate=0.3):
+    """
+    Builds a target/mod contract pair with n_clauses topics in the target.
+    `missing` topics (never the first) are left out of the mod; a fixed count rather than
+    a share, so augmentation work per topic can be compared across sizes.
+    Returns {"target", "mod", "truth"}: truth has one entry per target clause,
+    {"topic", "target_span", "mod_span"} with mod_span None for missing topics.
+    """
+    rng = random.Random(seed)
+    topics = topic_names(n_clauses)
+    missing = set(rng.sample(range(1, n_clauses), min(missing, n_clauses - 1)))
+
+    target_clauses = [(f"{i + 1}. {topic}.", clause_body(topic, "target", words, seed)) for i, topic in enumerate(topics)]
+    mod_topics = [(i, topic) for i, topic in enumerate(topics) if i not in missing]
+    mod_clauses = [(f"{n + 1}. {topic}.", clause_body(topic, "mod", words, seed)) for n, (_, topic) in enumerate(mod_topics)]
+
+    target, target_spans = render(target_clauses, rng, broken_word_rate, hyphen_rate)
+    mod, mod_spans = render(mod_clauses, rng, broken_word_rate, hyphen_rate)
+    mod_span_by_topic = {i: span for (i, _), span in zip(mod_topics, mod_spans)}
+    truth = [
+        {"topic": topic, "target_span": target_spans[i], "mod_span": mod_span_by_topic.get(i)}
+        for i, topic in enumerate(topics)
+    ]
+    return {"target": target, "mod": mod, "truth": truth}
+
+def alignments(pair):
+    """
+    The ground truth as alignments (exact slices, "N/A" for missing topics).
+    """
+    result = []
+    for item in pair["truth"]:
+        start, end = item["target_span"]
+        mod_span = item["mod_span"]
+        result.append({
+            "topic": item["topic"],
+            "doc_a": pair["target"][start:end],
+            "doc_b": pair["mod"][mod_span[0]:mod_span[1]] if mod_span else "N/A",
+        })
+    return result
+
+def _compacted_clause(text, span):
+    compacted = compactor.get_compacted(text)
+    return compacted.text[compacted.to_compact(span[0]):compacted.to_compact(span[1])].strip()
+
+def _segment_ids(segments, span):
+    ids = [seg["id"] for seg in segments if seg["start"] < span[1] and seg["end"] > span[0]]
+    return ", ".join(str(i) for i in ids)
+
+def mock_outputs(pair):
+    """
+    Replies a perfect model would give for this pair, copied from the compacted text it
+    is prompted with: {"standard", "anchors", "clauses"} for aligner.parse_alignments,
+    aligner_anchors.parse_and_reconstruct and aligner_clauses.parse_clause_ids.
+    """
+    target, mod = pair["target"], pair["mod"]
+    segments_a = segmenter.get_segments(target)
+    segments_b = segmenter.get_segments(mod)
+    standard, anchors, clauses = [], [], []
+    for item in pair["truth"]:
+        text_a = _compacted_clause(target, item["target_span"])
+        text_b = _compacted_clause(mod, item["mod_span"]) if item["mod_span"] else "N/A"
+        words_a = text_a.split()
+        words_b = text_b.split()
+        standard.append(f"{item['topic']}: doc A: {text_a}, doc B: {text_b};")
+        anchors.append(
+            f"Topic: {item['topic']};\n"
+            f"DocA_Start: {' '.join(words_a[:2])}, DocA_End: {' '.join(words_a[-2:])};\n"
+            + (f"DocB_Start: {' '.join(words_b[:2])}, DocB_End: {' '.join(words_b[-2:])};" if item["mod_span"]
+               else "DocB_Start: N/A, DocB_End: N/A;")
+        )
+        ids_b = _segment_ids(segments_b, item["mod_span"]) if item["mod_span"] else "N/A"
+        clauses.append(f"Topic: {item['topic']} | A: {_segment_ids(segments_a, item['target_span'])} | B: {ids_b}")
+    return {"standard": "\n".join(standard), "anchors": "\n".join(anchors), "clauses": "\n".join(clauses)}
+
+def generated_clause(topic, words=80, seed=0):
+    """
+    Stand-in for the clause the model writes for a missing topic (in the mod's voice).
+    """
+    return f"{topic}. {clause_body(topic, 'mod', words, f'{seed}:generated')}"
@@ -0,0 +1,95 @@
+"""
+Local token estimation and LLM usage accounting.
+
+Token counts use tiktoken when it is installed and a fast regex estimate otherwise.
+Per-document counts are cached by content hash (on the compacted text, which is what
+prompts actually contain). Usage reported by the provider is accumulated per request
+through a context variable, so callers can compare predicted and actual cost.
+"""
+import contextvars
+import math
+import re
+
+try:
+    import config
+    import compactor
+    import docstore
+except ImportError:
+    from . import config
+    from . import compactor
+    from . import docstore
+
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+_encoding = None
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    return _encoding
+
+def estimate_tokens(text):
+    """
+    Estimates the number of tokens in text.
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    # BPE vocabularies cover common words in one token and split long ones roughly every 4 chars
+    return sum(max(1, math.ceil(len(piece) / 4)) if piece[0].isalnum() else 1 for piece in _WORD_PATTERN.findall(text))
+
+def document_tokens(text):
+    """
+    Token count of a document as it appears in prompts, cached per document hash.
+    """
+    return docstore.artifact_for_text(text, "tokens", lambda t: estimate_tokens(compactor.get_compacted(t).text))
+
+def estimate_cost(input_tokens, output_tokens, model=None):
+    """
+    Returns (cost_usd, latency_s) predicted for one call.
+    """
+    model = model or config.LLM_MODEL
+    price_in, price_out = config.MODEL_PRICES_PER_1K.get(model, (0.0, 0.0))
+    cost = input_tokens / 1000 * price_in + output_tokens / 1000 * price_out
+    latency = (config.LLM_BASE_LATENCY_S
+               + input_tokens / config.LLM_INPUT_TOKENS_PER_S
+               + output_tokens / config.LLM_OUTPUT_TOKENS_PER_S)
+    return round(cost, 5), round(latency, 2)
+
+# --- Usage accounting ---
+
+_usage = contextvars.ContextVar("llm_usage", default=None)
+
+def start_usage():
+    """
+    Starts accumulating provider-reported usage for the current request and returns the
+    accumulator dict.
+    """
+    usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "prefix_tokens": 0}
+    _usage.set(usage)
+    return usage
+
+def record_usage(response, prefix_tokens=None):
+    """
+    Adds the usage of one chat completion response to the current accumulator (if any).
+    prefix_tokens is the caller's estimate of the reusable prompt prefix (see prompts.py).
+    """
+    usage = _usage.get()
+    reported = getattr(response, "usage", None)
+    if usage is None or reported is None:
+        return
+    usage["calls"] += 1
+    usage["input_tokens"] += getattr(reported, "prompt_tokens", 0) or 0
+    usage["output_tokens"] += getattr(reported, "completion_tokens", 0) or 0
+    details = getattr(reported, "prompt_tokens_details", None)
+    usage["cached_tokens"] += getattr(details, "cached_tokens", 0) or 0
+    usage["prefix_tokens"] += prefix_tokens or 0
+
+def current_usage():
+    return _usage.get()
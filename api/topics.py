@@ -0,0 +1,217 @@
+"""
+Topic canonicalization.
+
+The model names topics freely, and differently on every run ("Governing Law", "Choice of
+Law", "**Governing Law**", "12. Governing Laws"). canonical() maps such names to one name
+from TAXONOMY, so topic-keyed caches and statistics see the same topic under the same
+name. Parsers keep the model's own name in "model_topic".
+
+A name is normalized first (markup, numbering, punctuation, case, stopwords other than
+negations, and plurals removed) and looked up in a table of names seen before, so repeated names cost one dict
+lookup. A new name is compared with the taxonomy's names and aliases, and with the names
+learned so far, by word and character-trigram overlap. Without a close enough match it
+becomes a canonical name itself: later variants of it then map to it too.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+try:
+    import config
+    import lexical
+except ImportError:
+    from . import config
+    from . import lexical
+
+# Canonical name -> aliases. The canonical name itself always matches (and wins over an
+# alias that normalizes to the same key). Aliases are unambiguous multi-word names only:
+# a bare "License", "Liability" or "Obligations" heading may be about something else, so
+# such names are left to the fuzzy match or learned as topics of their own.
+TAXONOMY = {
+    "Parties": ["identification of parties", "the parties"],
+    "Definitions": ["defined terms", "definitions and interpretation"],
+    "Purpose": ["permitted purpose", "business purpose"],
+    "Confidential Information": ["definition of confidential information", "proprietary information"],
+    "Confidentiality Obligations": [
+        "obligations of confidentiality", "duty of confidentiality", "obligations of the recipient",
+        "receiving party obligations", "use of confidential information", "restrictions on use",
+        "protection of confidential information",
+    ],
+    "Exclusions": ["exclusions from confidential information", "excluded information", "exceptions to confidentiality"],
+    "Permitted Disclosure": ["disclosure to representatives", "disclosure to employees", "authorized disclosure"],
+    "Compelled Disclosure": ["required disclosure", "legally required disclosure", "disclosure required by law",
+                             "compelled by law"],
+    "Return or Destruction": ["return of materials", "return of information", "destruction of materials",
+                              "return and destruction", "return or destruction of confidential information"],
+    "Ownership": ["ownership of information"],
+    "No License": ["no rights granted", "no grant of rights"],
+    "Intellectual Property": ["intellectual property rights"],
+    "No Warranty": ["disclaimer of warranties", "no representations or warranties"],
+    "No Obligation to Proceed": ["no commitment", "no further obligation"],
+    "Term": ["term of agreement"],
+    "Termination": ["termination of agreement"],
+    "Survival": ["survival of obligations"],
+    "Remedies": ["equitable relief", "injunctive relief", "specific performance"],
+    "Limitation of Liability": ["limitation on liability", "exclusion of liability"],
+    "Indemnification": [],
+    "Non-Solicitation": ["no solicitation", "non-solicitation of employees"],
+    "Non-Competition": [],
+    "Standstill": ["standstill agreement"],
+    "Assignment": ["no assignment", "assignment and transfer", "successors and assigns"],
+    "Governing Law": ["choice of law", "applicable law"],
+    "Jurisdiction": ["submission to jurisdiction"],
+    "Dispute Resolution": [],
+    "Notices": [],
+    "Entire Agreement": ["whole agreement"],
+    "Amendment": ["changes to agreement"],
+    "Severability": ["partial invalidity"],
+    "Waiver": ["no waiver"],
+    "Counterparts": ["execution in counterparts"],
+    "Export Control": ["export regulations"],
+    "Data Protection": ["protection of personal data"],
+    "Publicity": ["no publicity", "press releases"],
+    "Relationship of the Parties": ["independent contractors", "no partnership", "no agency"],
+    "Third Party Rights": ["third party beneficiaries", "no third party beneficiaries"],
+    "Costs": ["costs and expenses"],
+    "Force Majeure": ["act of god"],
+    "Miscellaneous": ["general provisions"],
+}
+
+# Words that only say "this is a clause"
+_GENERIC = frozenset("clause clauses section sections provision provisions article articles".split())
+# Negations are kept: "No License" is not "License", nor "No Waiver" "Waiver"
+_STOPWORDS = lexical.STOPWORDS - {"no", "not"}
+_SPELLING = {"licence": "license", "authorisation": "authorization", "organisation": "organization"}
+# Leading numbering: "1.", "2.3", "(a)", "iv)", "Section 4 -", "Article II:"
+_NUMBERING = re.compile(r"^\s*(?:(?:section|article|clause)\s+[\divxlc]+\b|\(?[\divxlc]{1,4}(?:\.\d+)*[.)]|\(?[a-z][.)])\s*[-–:.]?\s*",
+                        re.IGNORECASE)
+
+_lock = threading.Lock()
+_table = OrderedDict()     # normalized name -> canonical name
+_candidates = {}           # normalized name -> (canonical name, word set, trigram set)
+_counts = {"hits": 0, "misses": 0, "matched": 0, "learned": 0}
+
+def _stem(word):
+    word = _SPELLING.get(word, word)
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def clean(name):
+    """
+    Display form of a topic name: markup, numbering and surrounding punctuation removed.
+    """
+    text = re.sub(r"[*_#`>]+", " ", name or "")
+    text = _NUMBERING.sub("", text.strip())
+    return " ".join(text.split()).strip(" .,:;-–\"'“”")
+
+def normalize(name):
+    """
+    Lookup key for a topic name: "**12. Governing Laws:**" -> "governing law".
+    """
+    text = clean(name).lower().replace("&", " and ").replace("-", "")
+    # "non solicitation", "non-solicitation" and "nonsolicitation" are one word
+    text = re.sub(r"\bnon\s+", "non", text)
+    tokens = [_stem(w) for w in re.findall(r"[a-z0-9]+", text) if w not in _STOPWORDS and w not in _GENERIC]
+    return " ".join(tokens)
+
+def _trigrams(key):
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _add_candidate(key, canonical):
+    if key and key not in _candidates:
+        _candidates[key] = (canonical, set(key.split()), _trigrams(key))
+
+for _name in TAXONOMY:
+    _add_candidate(normalize(_name), _name)
+for _name, _aliases in TAXONOMY.items():
+    for _alias in _aliases:
+        _add_candidate(normalize(_alias), _name)
+_TAXONOMY_CANDIDATES = len(_candidates)
+
+def _best_match(key):
+    words = set(key.split())
+    grams = _trigrams(key)
+    best, best_score = None, 0.0
+    for canonical, candidate_words, candidate_grams in _candidates.values():
+        score = lexical.jaccard(words, candidate_words)
+        if len(candidate_words) == len(words):
+            # Spelling variants only: a name with a word more or less ("Confidentiality",
+            # "Duty of Confidentiality") is a broader or narrower topic
+            score = max(score, lexical.jaccard(grams, candidate_grams))
+        if score > best_score:
+            best, best_score = canonical, score
+    return best if best_score >= config.TOPIC_MATCH_THRESHOLD else None
+
+def canonical(name):
+    """
+    Canonical name for a topic name. Names with no close match become canonical names.
+    """
+    key = normalize(name)
+    if not key:
+        return clean(name) or name
+    with _lock:
+        found = _table.get(key)
+        if found is not None:
+            _table.move_to_end(key)
+            _counts["hits"] += 1
+            return found
+
+        _counts["misses"] += 1
+        found = _candidates[key][0] if key in _candidates else _best_match(key)
+        if found is not None:
+            _counts["matched"] += 1
+        else:
+            found = clean(name)
+            _counts["learned"] += 1
+            # Learned names are matched like aliases (at most TOPIC_TABLE_MAX of them)
+            if len(_candidates) - _TAXONOMY_CANDIDATES < config.TOPIC_TABLE_MAX:
+                _add_candidate(key, found)
+        _table[key] = found
+        while len(_table) > config.TOPIC_TABLE_MAX:
+            _table.popitem(last=False)
+        return found
+
+def canonicalize(alignments):
+    """
+    Replaces every alignment's topic with its canonical name, in place, keeping the
+    original in "model_topic". Returns alignments.
+    """
+    for align in alignments:
+        if align.get("topic"):
+            align.setdefault("model_topic", clean(align["topic"]))
+            align["topic"] = canonical(align["topic"])
+    return alignments
+
+def model_name(alignment):
+    """
+    The topic name the model gave an alignment (cleaned, case-folded), for exact comparison.
+    """
+    return clean(alignment.get("model_topic") or alignment.get("topic") or "").casefold()
+
+def covered_in_mod(alignments):
+    """
+    Topic names (model_name) that some alignment finds in Doc B (the mod). A missing topic
+    is only taken as covered when the model named it exactly the same: canonical names
+    group related topics, which is too loose to skip generating a clause.
+    """
+    return {model_name(a) for a in alignments
+            if a.get("topic") and a.get("doc_b") and a["doc_b"] != "N/A" and a["doc_b"].strip()}
+
+def reset():
+    """
+    Forgets every learned name and lookup (benchmarks and tests start from the taxonomy).
+    """
+    with _lock:
+        _table.clear()
+        for key in list(_candidates)[_TAXONOMY_CANDIDATES:]:
+            del _candidates[key]
+        for name in _counts:
+            _counts[name] = 0
+
+def stats():
+    with _lock:
+        return dict(_counts, table=len(_table), candidates=len(_candidates))
@@ -1,19 +1,37 @@
-from pypdf import PdfReader
+import hashlib
+import os
 
-def read_pdf(file_path):
+def content_hash(data):
     """
-    Reads a PDF file and returns its text content.
+    Returns the SHA-256 hex digest of a document's text (or raw bytes).
+    Used as the stable identifier for caching and de-duplication.
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+def read_pdf_pages(file_path):
+    """
+    Reads a PDF file and returns the extracted text of each page.
     """
     try:
+        # Imported on first use to keep serverless cold starts fast
+        from pypdf import PdfReader
         reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        return [page.extract_text() for page in reader.pages]
     except Exception as e:
         print(f"Error reading {file_path}: {e}")
         return None
 
+def read_pdf(file_path):
+    """
+    Reads a PDF file and returns its text content.
+    """
+    pages = read_pdf_pages(file_path)
+    if pages is None:
+        return None
+    return "".join(page + "\n" for page in pages)
+
 def read_file(file_path):
     """
     Reads a file (PDF or text) and returns its content.
@@ -27,3 +45,26 @@ def read_file(file_path):
         except Exception as e:
             print(f"Error reading {file_path}: {e}")
             return None
+
+def extract_upload(file_path, filename, index=0):
+    """
+    Extracts one uploaded file and reports the result as a plain dict.
+    Runs inside a worker process for batch uploads, so it must stay picklable
+    and never raise: failures are returned in the "error" field.
+    """
+    result = {"index": index, "filename": filename}
+    try:
+        content = read_file(file_path)
+        if content is None:
+            result["error"] = "Could not read file"
+        else:
+            result["content_hash"] = content_hash(content)
+            result["content"] = content
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        try:
+            os.unlink(file_path)
+        except OSError:
+            pass
+    return result
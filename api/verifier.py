@@ -0,0 +1,125 @@
+"""
+Alignment verification.
+
+Checks that every extracted clause really occurs in its source document:
+
+- exact:      the clause is a verbatim substring of the document (str.find)
+- normalized: equal after collapsing whitespace runs (PDF line breaks vs spaces)
+
+Only clauses that miss the exact check pay for the whitespace-normalized copy of the
+document, and only those found by neither are located approximately (bit-parallel edit
+distance) so the report still points at the closest span and says how far off it is.
+"""
+import re
+
+try:
+    import fuzzy
+except ImportError:
+    from . import fuzzy
+
+SIDES = (("doc_a", "A"), ("doc_b", "B"))
+
+# A clause whose best approximate match is within this fraction of its length is
+# reported as "approximate" rather than "missing"
+APPROXIMATE_MAX_RATIO = 0.2
+
+_WORD = re.compile(r"\S+")
+
+def normalize_with_map(text):
+    """
+    Collapses every whitespace run to a single space and strips the ends.
+    Returns (normalized, offsets) where offsets[i] is the index in `text` of normalized[i],
+    with one extra trailing entry for the end position.
+    """
+    words = []
+    offsets = []
+    end = 0
+    for match in _WORD.finditer(text):
+        if words:
+            # The separating space maps to the start of the whitespace run
+            offsets.append(end)
+        words.append(match.group())
+        offsets.extend(range(match.start(), match.end()))
+        end = match.end()
+    offsets.append(end)
+    return " ".join(words), offsets
+
+def normalize_text(text):
+    """
+    Normalizes text for comparison (removes extra whitespace).
+    """
+    return " ".join(text.split())
+
+def find_all_first(patterns, text):
+    """
+    Returns, for each pattern, the (start, end) of its first occurrence in text or None.
+    """
+    found = []
+    for pattern in patterns:
+        start = text.find(pattern) if pattern else -1
+        found.append(None if start == -1 else (start, start + len(pattern)))
+    return found
+
+def verify_document(clauses, doc):
+    """
+    Verifies a list of clauses against one document.
+    Returns one result dict per clause: {"status", "span", "edit_distance"}.
+    """
+    # Pass 1: exact, one str.find per clause
+    results = []
+    pending = []
+    for i, clause in enumerate(clauses):
+        if not clause or clause == "N/A" or clause.isspace():
+            results.append({"status": "skipped", "span": None, "edit_distance": None})
+            continue
+        start = doc.find(clause)
+        if start == -1:
+            results.append(None)
+            pending.append(i)
+        else:
+            results.append({"status": "exact", "span": [start, start + len(clause)], "edit_distance": 0})
+
+    # Pass 2: whitespace-normalized
+    if pending:
+        norm_doc, offsets = normalize_with_map(doc)
+        norm_hits = find_all_first([normalize_text(clauses[i]) for i in pending], norm_doc)
+        still_pending = []
+        for i, span in zip(pending, norm_hits):
+            if span is not None and span[1] > span[0]:
+                start, end = offsets[span[0]], offsets[span[1] - 1] + 1
+                results[i] = {"status": "normalized", "span": [start, end],
+                              "edit_distance": fuzzy.edit_distance(clauses[i], doc[start:end])}
+            else:
+                still_pending.append(i)
+        pending = still_pending
+
+    # Pass 3: closest approximate span
+    for i in pending:
+        start, end, distance = fuzzy.find_best(clauses[i], doc)
+        status = "approximate" if distance <= APPROXIMATE_MAX_RATIO * len(clauses[i]) else "missing"
+        results[i] = {"status": status, "span": [start, end], "edit_distance": distance}
+    return results
+
+def verify_alignments(alignments, doc_a_content, doc_b_content):
+    """
+    Verifies every aligned clause against its document.
+    Returns {"valid", "valid_normalized", "results", "summary"}: valid means every clause
+    is an exact substring, valid_normalized allows whitespace differences.
+    """
+    results = []
+    for key, label in SIDES:
+        doc = doc_a_content if key == "doc_a" else doc_b_content
+        clauses = [align.get(key) or "" for align in alignments]
+        for align, result in zip(alignments, verify_document(clauses, doc)):
+            result.update({"topic": align.get("topic"), "side": label, "length": len(align.get(key) or "")})
+            results.append(result)
+
+    summary = {status: 0 for status in ("exact", "normalized", "approximate", "missing", "skipped")}
+    for result in results:
+        summary[result["status"]] += 1
+    return {
+        "valid": summary["normalized"] + summary["approximate"] + summary["missing"] == 0,
+        "valid_normalized": summary["approximate"] + summary["missing"] == 0,
+        "results": results,
+        "summary": summary,
+    }
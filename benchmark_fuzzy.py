@@ -0,0 +1,105 @@
+import glob
+import os
+import random
+import sys
+import time
+
+from api import fuzzy
+from api.utils import read_pdf
+
+# Benchmark the in-project matcher (api/fuzzy.py) against fuzzysearch on the ndas/ corpus.
+# Queries are anchors (2-3 words) and insertion snippets (20-50 chars) sampled from each
+# document with a few random edits, searched the way the aligners do: over the whole
+# document (start anchors, snippets) and over the tail after a position (end anchors).
+
+MAX_DISTANCE = 2
+QUERIES_PER_DOC = 40
+
+def corrupt(text, edits, rng):
+    chars = list(text)
+    for _ in range(edits):
+        i = rng.randrange(len(chars))
+        op = rng.choice("sid")
+        if op == "s":
+            chars[i] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+        elif op == "i":
+            chars.insert(i, rng.choice("abcdefghijklmnopqrstuvwxyz"))
+        elif len(chars) > 1:
+            del chars[i]
+    return "".join(chars)
+
+def sample_queries(text, rng):
+    queries = []
+    words = [(m_start, m_start + len(w)) for m_start, w in _word_spans(text)]
+    for _ in range(QUERIES_PER_DOC):
+        if rng.random() < 0.5:
+            i = rng.randrange(len(words) - 3)
+            start, end = words[i][0], words[i + rng.choice((1, 2))][1]
+        else:
+            start = rng.randrange(len(text) - 60)
+            end = start + rng.randrange(20, 50)
+        original = text[start:end]
+        tail_from = max(0, start - rng.randrange(0, 5000))
+        queries.append((corrupt(original, rng.randrange(0, MAX_DISTANCE + 1), rng), start, tail_from))
+    return queries
+
+def _word_spans(text):
+    position = 0
+    for w in text.split():
+        position = text.index(w, position)
+        yield position, w
+        position += len(w)
+
+def run_fuzzy(query, text, tail_from):
+    whole = fuzzy.find_best(query, text, max_distance=MAX_DISTANCE)
+    tail = fuzzy.find_best(query, text, start=tail_from, max_distance=MAX_DISTANCE)
+    return (whole.start if whole else -1), (tail.start if tail else -1)
+
+def run_fuzzysearch(query, text, tail_from):
+    from fuzzysearch import find_near_matches
+    whole = find_near_matches(query, text, max_l_dist=MAX_DISTANCE)
+    tail = find_near_matches(query, text[tail_from:], max_l_dist=MAX_DISTANCE)
+    return (whole[0].start if whole else -1), (tail_from + tail[0].start if tail else -1)
+
+def run_benchmark(seed=0):
+    pdf_files = sorted(glob.glob("ndas/*.pdf"))
+    if not pdf_files:
+        print("No PDFs in ndas/ to run benchmark.")
+        return
+
+    try:
+        import fuzzysearch  # noqa: F401
+        runners = {"api.fuzzy": run_fuzzy, "fuzzysearch": run_fuzzysearch}
+    except ImportError:
+        print("fuzzysearch not installed; timing api.fuzzy only.")
+        runners = {"api.fuzzy": run_fuzzy}
+
+    rng = random.Random(seed)
+    totals = {name: {"time": 0.0, "found": 0, "near": 0} for name in runners}
+    count = 0
+
+    for path in pdf_files:
+        text = read_pdf(path)
+        queries = sample_queries(text, rng)
+        count += len(queries)
+        print(f"{os.path.basename(path)}: {len(text)} chars, {len(queries)} queries")
+        for name, runner in runners.items():
+            started = time.perf_counter()
+            results = [runner(query, text, tail_from) for query, _, tail_from in queries]
+            totals[name]["time"] += time.perf_counter() - started
+            for (query, true_start, _), (whole, _) in zip(queries, results):
+                if whole != -1:
+                    totals[name]["found"] += 1
+                    # Within a few chars of where the query was sampled
+                    if abs(whole - true_start) <= MAX_DISTANCE + 1:
+                        totals[name]["near"] += 1
+
+    print("\n" + "=" * 30)
+    print("FUZZY MATCH BENCHMARK")
+    print("=" * 30)
+    for name, t in totals.items():
+        print(f"{name:12s} {t['time'] * 1000 / count:8.2f} ms/query  found {t['found']}/{count}  at sampled position {t['near']}/{count}")
+    print("=" * 30)
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
@@ -0,0 +1,236 @@
+import argparse
+import contextlib
+import io
+import math
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+# The root directory has its own aligner/config/utils modules: import the api ones the way
+# the server does, from api/ itself
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+import aligner  # noqa: E402
+import aligner_anchors  # noqa: E402
+import augmenter  # noqa: E402
+import config  # noqa: E402
+import docstore  # noqa: E402
+import llm  # noqa: E402
+import synthetic  # noqa: E402
+import topics  # noqa: E402
+import verifier  # noqa: E402
+
+# Scaling suite for the document-size-dependent stages. Synthetic contract pairs
+# (api/synthetic.py) of growing size are run through each stage with the replies a perfect
+# model would give, so only local work is timed. Each stage gets one untimed warmup run,
+# then every run starts with an empty docstore (no cached compaction, segmentation or
+# indexes) and no learned topic names, as for a newly uploaded document.
+# Time is the best of --repeat runs; peak memory (tracemalloc) is measured in a separate
+# run because tracing slows allocation-heavy code.
+#
+# The least-squares slope of log(time) against log(size) estimates each stage's growth
+# exponent: ~1 is linear. With --max-exponent the script exits 1 when a stage grows
+# faster, so it can guard CI against accidental quadratic behaviour.
+#
+#     python benchmark_scaling.py --sizes 25,50,100,200,400 --svg scaling.svg --max-exponent 1.4
+#
+# verify_baseline is the plain `clause in doc` check the verifier replaced; with
+# --max-verify-ratio the script also exits 1 when verify_alignment is slower than that.
+
+DEFAULT_SIZES = "25,50,100,200,400"
+STAGES = ["parse_alignments", "reconstruct_text", "verify_alignment", "verify_baseline", "augment_document"]
+
+class _FakeCompletions:
+    """
+    Answers every generation prompt with a synthetic clause, instantly.
+    """
+    def create(self, **kwargs):
+        topic = kwargs["messages"][-1]["content"][:40]
+        content = synthetic.generated_clause(topic, words=60)
+        usage = SimpleNamespace(prompt_tokens=0, completion_tokens=0, prompt_tokens_details=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+def install_fake_llm():
+    llm._client = SimpleNamespace(chat=SimpleNamespace(completions=_FakeCompletions()))
+    # No rate limiting or LLM tie-breaks: only local work is measured
+    config.LLM_RPM = 10 ** 9
+    config.LLM_TPM = 10 ** 12
+    config.INSERTION_LLM_TIEBREAK = False
+
+def baseline_verify(alignments, doc_a_content, doc_b_content):
+    """
+    The substring check verify_alignment used before api/verifier.py, without the printing.
+    """
+    valid = True
+    for align in alignments:
+        if align["doc_a"] != "N/A" and align["doc_a"] not in doc_a_content:
+            valid = False
+        if align["doc_b"] != "N/A" and align["doc_b"] not in doc_b_content:
+            valid = False
+    return valid
+
+def stage_runners(pair, outputs, truth):
+    target, mod = pair["target"], pair["mod"]
+    return {
+        "parse_alignments": lambda: aligner.restore_alignments(aligner.parse_alignments(outputs["standard"]), target, mod),
+        "reconstruct_text": lambda: aligner_anchors.parse_and_reconstruct(outputs["anchors"], target, mod),
+        "verify_alignment": lambda: verifier.verify_alignments(truth, target, mod),
+        "verify_baseline": lambda: baseline_verify(truth, target, mod),
+        "augment_document": lambda: augmenter.augment_document(target, mod, truth),
+    }
+
+def reset_state():
+    # Nothing cached from the previous run: no compaction, segmentation or indexes, and no
+    # learned topic names
+    docstore.clear()
+    topics.reset()
+
+def measure(run, repeat, memory):
+    # Untimed warmup: first-call costs (imports, regex compilation) are not the stage's
+    reset_state()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run()
+
+    best = None
+    for _ in range(repeat):
+        reset_state()
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    peak = None
+    if memory:
+        reset_state()
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+def growth_exponent(rows, stage):
+    """
+    Least-squares slope of log(time) against log(document size).
+    """
+    points = [(math.log(row["chars"]), math.log(row[stage]["time_s"])) for row in rows if row[stage]["time_s"] > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread if spread else None
+
+def write_svg(rows, path):
+    """
+    Two log-log panels (time and peak memory against target size), one line per stage.
+    Plain SVG, so plotting needs no extra dependency.
+    """
+    colors = ["#1f77b4", "#d62728", "#2ca02c", "#ff7f0e", "#9467bd"]
+    width, height, margin = 420, 300, 50
+    panels = [("time_s", "time (s)"), ("peak_bytes", "peak memory (bytes)")]
+    xs = [row["chars"] for row in rows]
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width * 2}" height="{height + 30}" font-family="sans-serif" font-size="11">']
+    for p, (key, label) in enumerate(panels):
+        values = [row[stage][key] for row in rows for stage in STAGES if row[stage][key]]
+        if not values:
+            continue
+        x_lo, x_hi = math.log10(min(xs)), math.log10(max(xs))
+        y_lo, y_hi = math.log10(min(values)), math.log10(max(values))
+
+        def point(x, y):
+            px = p * width + margin + (math.log10(x) - x_lo) / ((x_hi - x_lo) or 1) * (width - 2 * margin)
+            py = height - margin + 20 - (math.log10(y) - y_lo) / ((y_hi - y_lo) or 1) * (height - 2 * margin)
+            return f"{px:.1f},{py:.1f}"
+
+        left = p * width + margin
+        parts.append(f'<rect x="{left}" y="{margin - 30}" width="{width - 2 * margin}" height="{height - 2 * margin + 50}" fill="none" stroke="#999"/>')
+        parts.append(f'<text x="{left}" y="{margin - 36}">{label} vs target size (chars), log-log</text>')
+        parts.append(f'<text x="{left}" y="{height + 22}">{min(xs)}</text>')
+        parts.append(f'<text x="{p * width + width - margin}" y="{height + 22}" text-anchor="end">{max(xs)}</text>')
+        parts.append(f'<text x="{left + 4}" y="{margin - 16}">{10 ** y_hi:.3g}</text>')
+        parts.append(f'<text x="{left + 4}" y="{height + 6}">{10 ** y_lo:.3g}</text>')
+        for stage, color in zip(STAGES, colors):
+            line = [point(row["chars"], row[stage][key]) for row in rows if row[stage][key]]
+            parts.append(f'<polyline points="{" ".join(line)}" fill="none" stroke="{color}" stroke-width="2"/>')
+    for i, (stage, color) in enumerate(zip(STAGES, colors)):
+        parts.append(f'<text x="{margin + 8 + i * 160}" y="12" fill="{color}">{stage}</text>')
+    parts.append("</svg>")
+    with open(path, "w") as f:
+        f.write("\n".join(parts))
+
+def run_benchmark(sizes, repeat=3, memory=True, seed=0, csv_path=None, svg_path=None, max_exponent=None,
+                  max_verify_ratio=None):
+    install_fake_llm()
+    rows = []
+    print(f"{'clauses':>8} {'chars':>9} {'pages':>6}  " + "  ".join(f"{s:>22}" for s in STAGES))
+    for n in sizes:
+        pair = synthetic.generate_pair(n, seed=seed)
+        outputs = synthetic.mock_outputs(pair)
+        truth = synthetic.alignments(pair)
+        row = {"clauses": n, "chars": len(pair["target"]), "pages": pair["target"].count("\nPage ") + 1}
+        for stage, run in stage_runners(pair, outputs, truth).items():
+            best, peak = measure(run, repeat, memory)
+            row[stage] = {"time_s": best, "peak_bytes": peak}
+        rows.append(row)
+        cells = []
+        for stage in STAGES:
+            peak = row[stage]["peak_bytes"]
+            cells.append(f"{row[stage]['time_s'] * 1000:9.1f} ms " + (f"{peak / 2 ** 20:7.1f} MB" if peak is not None else " " * 10))
+        print(f"{n:>8} {row['chars']:>9} {row['pages']:>6}  " + "  ".join(f"{c:>22}" for c in cells))
+
+    print("\nGrowth exponent (log-log slope; 1.0 = linear):")
+    failed = []
+    for stage in STAGES:
+        exponent = growth_exponent(rows, stage)
+        if exponent is None:
+            continue
+        flag = ""
+        if max_exponent is not None and exponent > max_exponent:
+            flag = f"  > {max_exponent} (regression)"
+            failed.append(stage)
+        print(f"  {stage:18s} {exponent:5.2f}{flag}")
+
+    print("\nverify_alignment / verify_baseline time:")
+    for row in rows:
+        baseline = row["verify_baseline"]["time_s"]
+        ratio = row["verify_alignment"]["time_s"] / baseline if baseline else float("inf")
+        flag = ""
+        if max_verify_ratio is not None and ratio > max_verify_ratio:
+            flag = f"  > {max_verify_ratio} (regression)"
+            failed.append(f"verify_alignment@{row['clauses']}")
+        print(f"  {row['clauses']:>5} clauses {ratio:7.2f}{flag}")
+
+    if csv_path:
+        with open(csv_path, "w") as f:
+            f.write("clauses,chars,pages,stage,time_s,peak_bytes\n")
+            for row in rows:
+                for stage in STAGES:
+                    peak = row[stage]["peak_bytes"]
+                    f.write(f"{row['clauses']},{row['chars']},{row['pages']},{stage},{row[stage]['time_s']:.6f},{'' if peak is None else peak}\n")
+        print(f"Wrote {csv_path}")
+    if svg_path:
+        write_svg(rows, svg_path)
+        print(f"Wrote {svg_path}")
+    return not failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and memory of the pipeline stages against document size.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated clause counts")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--csv", help="write the measurements to this CSV file")
+    parser.add_argument("--svg", help="plot time and memory against size to this SVG file")
+    parser.add_argument("--max-exponent", type=float, help="exit 1 if a stage grows faster than size ** this")
+    parser.add_argument("--max-verify-ratio", type=float,
+                        help="exit 1 if verify_alignment takes more than this times verify_baseline")
+    args = parser.parse_args()
+    ok = run_benchmark([int(s) for s in args.sizes.split(",")], repeat=args.repeat, memory=not args.no_memory,
+                       seed=args.seed, csv_path=args.csv, svg_path=args.svg, max_exponent=args.max_exponent,
+                       max_verify_ratio=args.max_verify_ratio)
+    sys.exit(0 if ok else 1)
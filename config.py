@@ -10,3 +10,5 @@ if not OPENAI_API_KEY:
     # Fallback/Warning (optional, or just let it fail later if not present)
     pass
 
+# Tunables shared with the API server
+from api.config import *  # noqa: E402,F401,F403
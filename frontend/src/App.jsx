@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import DocumentViewer from './DocumentViewer';
+import { augmentResponseMode, augmentedTextFrom, sliceCodePoints } from './patches';
 
 const API_URL = "/api";
 
@@ -128,14 +129,18 @@ function App() {
       const data = await fetchWithCheck(`${API_URL}/augment`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ target_text: targetText, mod_text: modText, alignments: alignments, strategy: useAnchors ? "anchors" : "standard" })
+        body: JSON.stringify({ target_text: targetText, mod_text: modText, alignments: alignments, strategy: useAnchors ? "anchors" : "standard", response_mode: augmentResponseMode() })
       });
-      setModText(data.augmented_text);
+      // Delta response: patches against the mod text we sent, not the whole document
+      // (full text instead where the checksum cannot be verified)
+      const augmentedText = await augmentedTextFrom(modText, data);
+      setModText(augmentedText);
 
       // Handle Augmentation Highlights
       if (data.insertions) {
         const newHighlights = data.insertions.map(ins => ({
-          text: ins.text,
+          text: sliceCodePoints(augmentedText, ins.span[0], ins.span[1]),
+          span: ins.span,
           style: { bg: "bg-green-100", border: "border-green-500" },
           topic: "Augmented: " + ins.topic
         }));
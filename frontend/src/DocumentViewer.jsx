@@ -35,10 +35,18 @@ function DocumentViewer({ title, text, highlights = [], onTextChange }) {
         highlights.forEach(h => {
             if (!h.text || h.text === "N/A") return;
 
+            // 0. Exact span from the backend (e.g. augmentation insertions), if still valid
+            let idx = -1;
+            let length = h.text.length;
+            if (h.span && text.slice(h.span[0], h.span[1]) === h.text) {
+                idx = h.span[0];
+            }
+
             // Robust Token-Based Matching Strategy
             // 1. Exact match attempt first (fastest)
-            let idx = text.indexOf(h.text);
-            let length = h.text.length;
+            if (idx === -1) {
+                idx = text.indexOf(h.text);
+            }
 
             if (idx === -1) {
                 // 2. Tokenize both text and snippet to find word sequence
@@ -0,0 +1,64 @@
+// Client-side counterpart of api/piecetable.py apply_patches, for /augment delta responses.
+// Patch offsets count Unicode code points (Python string indices), not UTF-16 units.
+
+// crypto.subtle only exists in secure contexts (HTTPS or localhost)
+export function canVerifyDelta() {
+  return typeof crypto !== "undefined" && crypto.subtle !== undefined;
+}
+
+export async function sha256Hex(text) {
+  const digest = await crypto.subtle.digest("SHA-256", new TextEncoder().encode(text));
+  return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, "0")).join("");
+}
+
+// Maps code point offsets to UTF-16 indices (identity unless the text has astral characters)
+function codePointIndexer(text) {
+  if (!/[\uD800-\uDFFF]/.test(text)) return (offset) => offset;
+  const units = [];
+  let unit = 0;
+  for (const ch of text) {
+    units.push(unit);
+    unit += ch.length;
+  }
+  units.push(unit);
+  return (offset) => units[offset];
+}
+
+// Applies [[offset, insertedText], ...] (offsets into baseText, in order) and returns the new text.
+export function applyPatches(baseText, patches) {
+  const toIndex = codePointIndexer(baseText);
+  const parts = [];
+  let last = 0;
+  for (const [offset, inserted] of patches) {
+    const index = toIndex(offset);
+    if (index === undefined || index < last) throw new Error(`Invalid patch offset ${offset}`);
+    parts.push(baseText.slice(last, index), inserted);
+    last = index;
+  }
+  parts.push(baseText.slice(last));
+  return parts.join("");
+}
+
+// text.slice for code point offsets (e.g. insertion spans)
+export function sliceCodePoints(text, start, end) {
+  const toIndex = codePointIndexer(text);
+  return text.slice(toIndex(start), toIndex(end));
+}
+
+// /augment response_mode to request: deltas need a checksum we can verify, else the full text
+export function augmentResponseMode() {
+  return canVerifyDelta() ? "delta" : "full";
+}
+
+// Verifies the base checksum of a delta response, then applies its patches.
+export async function applyDelta(baseText, delta) {
+  if ((await sha256Hex(baseText)) !== delta.base_checksum) {
+    throw new Error("Augmentation was computed for a different version of the document.");
+  }
+  return applyPatches(baseText, delta.patches);
+}
+
+// The augmented text from an /augment response in either response mode.
+export async function augmentedTextFrom(baseText, data) {
+  return data.augmented_text !== undefined ? data.augmented_text : applyDelta(baseText, data);
+}
@@ -1,50 +1,30 @@
 import os
 import utils
 import aligner
-
-def normalize_text(text):
-    """
-    Normalizes text for comparison (removes extra whitespace).
-    """
-    return " ".join(text.split())
+from api import verifier
 
 def verify_alignment(alignments, doc_a_content, doc_b_content):
     """
     Verifies that the aligned text exists in the original documents.
+    Prints one line per clause and returns True only if every clause is an exact match.
     """
-    valid = True
-    
-    # Normalize original docs for easier matching (optional, but PDF extraction can be messy)
-    # However, the user asked for EXACT match. 
-    # If the LLM output is slightly different due to PDF extraction artifacts, we might need to be careful.
-    # Let's try strict check first.
-    
-    for align in alignments:
-        topic = align['topic']
-        text_a = align['doc_a']
-        text_b = align['doc_b']
-        
-        # Check A
-        if text_a != "N/A":
-            if text_a not in doc_a_content:
-                print(f"❌ Mismatch in Doc A for topic '{topic}'")
-                print(f"   Expected: ...{text_a[:50]}...")
-                print(f"   Status: Not found in document.")
-                valid = False
-            else:
-                print(f"✅ Doc A match for '{topic}'")
+    report = verifier.verify_alignments(alignments, doc_a_content, doc_b_content)
+    print_verification(report)
+    return report["valid"]
 
-        # Check B
-        if text_b != "N/A":
-            if text_b not in doc_b_content:
-                print(f"❌ Mismatch in Doc B for topic '{topic}'")
-                print(f"   Expected: ...{text_b[:50]}...")
-                print(f"   Status: Not found in document.")
-                valid = False
-            else:
-                print(f"✅ Doc B match for '{topic}'")
-                
-    return valid
+def print_verification(report):
+    for result in report["results"]:
+        status = result["status"]
+        if status == "skipped":
+            continue
+        label = f"Doc {result['side']} for topic '{result['topic']}'"
+        if status == "exact":
+            print(f"✅ {label}: exact match at {result['span']}")
+        elif status == "normalized":
+            print(f"⚠️ {label}: matches only after whitespace normalization at {result['span']} (edit distance {result['edit_distance']})")
+        else:
+            print(f"❌ Mismatch in {label}: {status}, closest span {result['span']} (edit distance {result['edit_distance']} over {result['length']} chars)")
+    print(f"Summary: {report['summary']}")
 
 def main():
     # Define test files
@@ -6,6 +6,9 @@ echo "--- Installing Python Dependencies ---"
 pip install --upgrade pip
 pip install -r requirements.txt
 
+echo "--- Pre-extracting Demo Corpus ---"
+python api/demo_corpus.py
+
 echo "--- Building Frontend ---"
 cd frontend
 npm install
@@ -1,5 +1,6 @@
 import utils
 import aligner
+import main
 import os
 
 def run_test(file_a, file_b):
@@ -25,29 +26,7 @@ def run_test(file_a, file_b):
     print(f"Parsed {len(alignments)} alignments.")
     
     print("Verifying alignments...")
-    # We use the verify_alignment function from main.py logic, but let's reimplement/copy it here or import it if we refactored.
-    # Since main.py has it, let's just copy the logic for simplicity or import main if possible.
-    # I'll just copy the logic to be safe and independent.
-    
-    valid = True
-    for align in alignments:
-        topic = align['topic']
-        text_a = align['doc_a']
-        text_b = align['doc_b']
-        
-        # Check A
-        if text_a != "N/A":
-            if text_a not in content_a:
-                print(f"❌ Mismatch in Doc A for topic '{topic}'")
-                print(f"   Expected: ...{text_a[:50]}...")
-                valid = False
-
-        # Check B
-        if text_b != "N/A":
-            if text_b not in content_b:
-                print(f"❌ Mismatch in Doc B for topic '{topic}'")
-                print(f"   Expected: ...{text_b[:50]}...")
-                valid = False
+    valid = main.verify_alignment(alignments, content_a, content_b)
                 
     if valid:
         print("✅ Alignment Verified Successfully!")
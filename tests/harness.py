@@ -0,0 +1,31 @@
+import os
+import sys
+import traceback
+
+# The root directory has its own, older aligner/config/utils modules: test the api ones,
+# imported from api/ itself the way the server does
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+def run(namespace):
+    """
+    Runs every test_* function in namespace (a module's globals()) and prints a summary.
+    The same files run under pytest.
+    """
+    results = []
+    for name, test in namespace.items():
+        if not name.startswith("test_") or not callable(test):
+            continue
+        try:
+            test()
+            results.append((name, True))
+        except Exception:
+            traceback.print_exc()
+            results.append((name, False))
+
+    print("\n\n================ SUMMARY ================")
+    for name, success in results:
+        status = "PASS" if success else "FAIL"
+        print(f"[{status}] {name}")
+    sys.exit(0 if all(success for _, success in results) else 1)
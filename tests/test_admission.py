@@ -0,0 +1,90 @@
+import asyncio
+
+import harness  # noqa: F401  (puts api/ on sys.path)
+
+import admission
+
+async def waiter(controller, priority, order, timeout=None):
+    await controller.acquire(priority, timeout)
+    order.append(priority)
+
+def test_priority_then_arrival_order():
+    async def main():
+        controller = admission.AdmissionController(limit=1, max_queue=10)
+        assert await controller.acquire() == 0.0
+        order = []
+        tasks = []
+        for priority in ("batch", "interactive", "batch", "interactive"):
+            tasks.append(asyncio.create_task(waiter(controller, priority, order)))
+            await asyncio.sleep(0)
+        assert controller.stats()["queued_by_priority"] == {"interactive": 2, "batch": 2}
+        for _ in tasks:
+            controller.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        assert order == ["interactive", "interactive", "batch", "batch"]
+        assert controller.active == 1 and controller.queued() == 0
+        controller.release()
+        assert controller.active == 0
+    asyncio.run(main())
+
+def test_limit_and_queue_full():
+    async def main():
+        controller = admission.AdmissionController(limit=2, max_queue=1)
+        await controller.acquire()
+        await controller.acquire()
+        queued = asyncio.create_task(controller.acquire("batch"))
+        await asyncio.sleep(0)
+        try:
+            await controller.acquire()
+            assert False, "expected QueueFull"
+        except admission.QueueFull as e:
+            assert e.retry_after >= 1
+        assert controller.stats()["rejected"] == 1
+        controller.release(service_s=2.0)
+        await queued
+        assert controller.active == 2 and controller.stats()["avg_pipeline_s"] == 2.0
+    asyncio.run(main())
+
+def test_timeout_leaves_queue_consistent():
+    async def main():
+        controller = admission.AdmissionController(limit=1, max_queue=5)
+        await controller.acquire()
+        order = []
+        late = asyncio.create_task(waiter(controller, "interactive", order, timeout=0.01))
+        patient = asyncio.create_task(waiter(controller, "batch", order))
+        try:
+            await late
+            assert False, "expected TimeoutError"
+        except asyncio.TimeoutError:
+            pass
+        assert controller.queued() == 1 and controller.stats()["timed_out"] == 1
+        # The slot skips the abandoned entry
+        controller.release()
+        await patient
+        assert order == ["batch"] and controller.active == 1
+    asyncio.run(main())
+
+def test_cancelled_waiter_is_skipped():
+    async def main():
+        controller = admission.AdmissionController(limit=1, max_queue=5)
+        await controller.acquire()
+        gone = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        gone.cancel()
+        await asyncio.sleep(0)
+        assert controller.queued() == 0
+        controller.release()
+        assert controller.active == 0
+    asyncio.run(main())
+
+def test_unlimited():
+    async def main():
+        controller = admission.AdmissionController(limit=0, max_queue=0)
+        for _ in range(5):
+            assert await controller.acquire() == 0.0
+        assert controller.stats()["admitted"] == 5
+    asyncio.run(main())
+
+if __name__ == "__main__":
+    harness.run(globals())
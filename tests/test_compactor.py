@@ -0,0 +1,68 @@
+import random
+
+import harness  # noqa: F401  (puts api/ on sys.path)
+
+import compactor
+
+def numbered_contract():
+    lines = ["MUTUAL NON-DISCLOSURE AGREEMENT", ""]
+    for n in range(1, 7):
+        if n in (3, 5):
+            lines += ["ACME CORP CONFIDENTIAL", f"Page {n // 2} of 3"]
+        lines += [f"{n}.", f"Section {n}", "Article I", f"The Recipient shall keep clause {n} confi-", f"dential for {n + 1} years.", ""]
+    return "\n".join(lines)
+
+def test_numbered_headings_survive():
+    text = numbered_contract() + "\nACME CORP CONFIDENTIAL\n"
+    compacted = compactor.compact(text).text
+    for n in range(1, 7):
+        assert f"{n}." in compacted.split() and f"Section {n}" in compacted
+    # Repeated heading lines are clause headings, not running headers
+    assert compacted.count("Article I") == 6
+    # Real running headers and page numbers still go
+    assert "ACME CORP CONFIDENTIAL" not in compacted
+    assert "Page" not in compacted
+    assert "clause 6 confidential for 7 years." in compacted
+
+def test_offset_map_round_trip():
+    text = numbered_contract()
+    compacted = compactor.compact(text)
+    for needle in ("Section 4", "The Recipient shall keep clause 6", "for 4 years."):
+        start = compacted.text.index(needle)
+        orig_start, orig_end = compacted.span_to_original(start, start + len(needle))
+        assert " ".join(text[orig_start:orig_end].split()) == needle
+        assert compacted.to_compact(orig_start) == start
+    assert compacted.to_original(len(compacted.text)) == len(text)
+
+def test_offset_map_is_monotonic():
+    rng = random.Random(3)
+    words = ["clause", "Recipient", "shall", "confi-\ndential", "  ", "\n\n", "Page 2 of 9\n", "(a)"]
+    for _ in range(50):
+        text = " ".join(rng.choice(words) for _ in range(rng.randrange(1, 80)))
+        compacted = compactor.compact(text)
+        previous = 0
+        for pos in range(len(compacted.text) + 1):
+            mapped = compacted.to_original(pos)
+            assert previous <= mapped <= len(text)
+            previous = mapped
+        for pos, ch in enumerate(compacted.text):
+            if not ch.isspace():
+                assert text[compacted.to_original(pos)] == ch
+
+def test_restore_clause():
+    text = numbered_contract()
+    compacted = compactor.compact(text)
+    clause = "The Recipient shall keep clause 2 confidential for 3 years."
+    restored = compactor.restore_clause(compacted, clause)
+    assert restored in text and " ".join(restored.replace("-\n", "").split()) == clause
+
+def test_restore_clause_keeps_misquotes():
+    text = numbered_contract()
+    compacted = compactor.compact(text)
+    # One word off: close enough to be "approximate", so it must not be swapped for the
+    # document's text and pass verification as exact
+    clause = "The Recipient shall keep clause 2 confidential for 5 years."
+    assert compactor.restore_clause(compacted, clause) == clause
+
+if __name__ == "__main__":
+    harness.run(globals())
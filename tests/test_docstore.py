@@ -0,0 +1,36 @@
+import harness  # noqa: F401  (puts api/ on sys.path)
+
+import config
+import docstore
+
+def test_artifact_cached_with_document():
+    docstore.clear()
+    calls = []
+
+    def factory(text):
+        calls.append(text)
+        return text.upper()
+
+    doc_id = docstore.put_document("clause one")
+    assert docstore.get_artifact(doc_id, "upper", factory) == "CLAUSE ONE"
+    assert docstore.get_artifact(doc_id, "upper", factory) == "CLAUSE ONE"
+    assert calls == ["clause one"]
+
+def test_unknown_id_builds_from_text():
+    docstore.clear()
+    assert docstore.get_artifact("missing", "upper", str.upper) is None
+    assert docstore.get_artifact("missing", "upper", str.upper, "fallback") == "FALLBACK"
+
+def test_artifact_for_text_survives_eviction():
+    docstore.clear()
+    limit = config.DOCSTORE_MAX_DOCUMENTS
+    config.DOCSTORE_MAX_DOCUMENTS = 0
+    try:
+        # The document is evicted as soon as it is stored
+        assert docstore.artifact_for_text("evicted at once", "upper", str.upper) == "EVICTED AT ONCE"
+    finally:
+        config.DOCSTORE_MAX_DOCUMENTS = limit
+        docstore.clear()
+
+if __name__ == "__main__":
+    harness.run(globals())
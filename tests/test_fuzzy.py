@@ -0,0 +1,82 @@
+import random
+
+import harness  # noqa: F401  (puts api/ on sys.path)
+
+import fuzzy
+
+def levenshtein(a, b):
+    row = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        previous, row[0] = row[0], i
+        for j, cb in enumerate(b, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (ca != cb))
+    return row[-1]
+
+def best_substring_distance(pattern, text):
+    """
+    Smallest edit distance between pattern and any substring of text (semi-global DP).
+    """
+    row = list(range(len(pattern) + 1))
+    best = row[-1]
+    for ch in text:
+        previous, row[0] = row[0], 0
+        for i, cp in enumerate(pattern, 1):
+            previous, row[i] = row[i], min(row[i] + 1, row[i - 1] + 1, previous + (cp != ch))
+        best = min(best, row[-1])
+    return best
+
+def mutate(rng, text, edits):
+    chars = list(text)
+    for _ in range(edits):
+        op = rng.randrange(3)
+        pos = rng.randrange(len(chars) + (op == 0)) if chars else 0
+        if op == 0 or not chars:
+            chars.insert(pos, rng.choice("abcd "))
+        elif op == 1:
+            del chars[pos]
+        else:
+            chars[pos] = rng.choice("abcd ")
+    return "".join(chars)
+
+def test_edit_distance_matches_dp():
+    rng = random.Random(11)
+    for _ in range(300):
+        a = "".join(rng.choice("abc ") for _ in range(rng.randrange(0, 90)))
+        b = mutate(rng, a, rng.randrange(0, 10)) if rng.random() < 0.7 else "".join(rng.choice("abc ") for _ in range(rng.randrange(0, 90)))
+        assert fuzzy.edit_distance(a, b) == levenshtein(a, b), (a, b)
+
+def test_find_best_is_optimal():
+    rng = random.Random(5)
+    for _ in range(200):
+        text = "".join(rng.choice("abcd ") for _ in range(rng.randrange(20, 200)))
+        start = rng.randrange(len(text) - 10)
+        pattern = mutate(rng, text[start:start + rng.randrange(5, 80)], rng.randrange(0, 6)) or "a"
+        match = fuzzy.find_best(pattern, text)
+        assert match.distance == best_substring_distance(pattern, text), (pattern, text)
+        assert levenshtein(pattern, text[match.start:match.end]) == match.distance
+
+def test_filtered_search_agrees_with_full_scan():
+    rng = random.Random(9)
+    words = "the recipient shall hold all confidential information in strict confidence".split()
+    for _ in range(100):
+        text = " ".join(rng.choice(words) for _ in range(rng.randrange(50, 300)))
+        start = rng.randrange(len(text) - 40)
+        pattern = mutate(rng, text[start:start + rng.randrange(20, 120)], rng.randrange(0, 4))
+        full = fuzzy.find_best(pattern, text)
+        for limit in (0, 2, 5, 10):
+            limited = fuzzy.find_best(pattern, text, max_distance=limit)
+            if full.distance > limit:
+                assert limited is None
+            else:
+                assert limited is not None and limited.distance == full.distance
+
+def test_bounds_are_respected():
+    text = "governing law " * 3 + "jurisdiction " + "governing law"
+    first = text.index("jurisdiction")
+    match = fuzzy.find_best("governing law", text, start=first)
+    assert match.start >= first and match.distance == 0
+    assert text[match.start:match.end] == "governing law"
+    assert fuzzy.find_best("jurisdiction", text, end=first).distance > 0
+
+if __name__ == "__main__":
+    harness.run(globals())
@@ -0,0 +1,208 @@
+import contextvars
+import functools
+import threading
+import time
+
+import harness  # noqa: F401  (puts api/ on sys.path)
+
+import config
+import deadlines
+import fake_llm_server
+import llm
+
+def own_request(test):
+    """
+    Runs the test in a copy of the context, so its deadline does not leak into other tests.
+    """
+    @functools.wraps(test)
+    def run():
+        return contextvars.copy_context().run(test)
+    return run
+
+def against_fake_server(**options):
+    """
+    Runs the test with llm's client, buckets and limiter pointed at a fresh fake server,
+    passed to the test; restores the previous configuration afterwards.
+    """
+    def decorate(test):
+        @functools.wraps(test)
+        def run():
+            names = ["OPENAI_API_KEY", "OPENAI_BASE_URL", "LLM_RPM", "LLM_TPM", "LLM_MAX_CONCURRENCY",
+                     "LLM_MIN_CONCURRENCY", "LLM_MAX_RETRIES", "LLM_BACKOFF_BASE_S", "LLM_BACKOFF_MAX_S"]
+            saved = {name: getattr(config, name) for name in names}
+            server, base_url = fake_llm_server.start(**options)
+            config.OPENAI_API_KEY = "fake"
+            config.OPENAI_BASE_URL = base_url
+            config.LLM_RPM = 10 ** 6
+            config.LLM_TPM = 10 ** 9
+            config.LLM_MAX_CONCURRENCY = 4
+            config.LLM_MIN_CONCURRENCY = 1
+            config.LLM_MAX_RETRIES = 3
+            config.LLM_BACKOFF_BASE_S = 0.01
+            config.LLM_BACKOFF_MAX_S = 2
+            llm._client = llm._request_bucket = llm._token_bucket = llm._limiter = None
+            try:
+                return contextvars.copy_context().run(test, server)
+            finally:
+                server.shutdown()
+                server.server_close()
+                for name, value in saved.items():
+                    setattr(config, name, value)
+                llm._client = llm._request_bucket = llm._token_bucket = llm._limiter = None
+        return run
+    return decorate
+
+def ask():
+    response = llm.chat_completion([{"role": "user", "content": "Align these."}])
+    return response.choices[0].message.content
+
+def drained_bucket(per_minute=60):
+    bucket = llm.TokenBucket(per_minute)
+    bucket.acquire(per_minute)
+    return bucket
+
+@own_request
+def test_acquire_waits_for_refill():
+    deadlines.start(None)
+    bucket = drained_bucket(per_minute=600)  # 10 units per second
+    waited = bucket.acquire(1)
+    assert 0.05 <= waited < 1.0
+
+@own_request
+def test_acquire_stops_at_deadline():
+    deadlines.start(0.2)
+    bucket = drained_bucket()  # next unit in 1s, after the deadline
+    started = time.monotonic()
+    try:
+        bucket.acquire(1)
+        assert False, "expected DeadlineExceeded"
+    except deadlines.DeadlineExceeded:
+        pass
+    assert time.monotonic() - started < 0.5
+
+@own_request
+def test_acquire_wakes_on_cancel():
+    deadline = deadlines.start(None)
+    bucket = drained_bucket(per_minute=6)  # next unit in 10s
+    threading.Timer(0.1, deadline.cancel).start()
+    started = time.monotonic()
+    try:
+        bucket.acquire(1)
+        assert False, "expected Cancelled"
+    except deadlines.Cancelled:
+        pass
+    assert time.monotonic() - started < 1.0
+    # Nothing was taken
+    assert bucket.level < 1
+
+@own_request
+def test_cancelled_request_does_not_wait():
+    deadline = deadlines.start(None)
+    deadline.cancel()
+    try:
+        llm.TokenBucket(60).acquire(1)
+        assert False, "expected Cancelled"
+    except deadlines.Cancelled:
+        pass
+
+@own_request
+def test_limiter_halves_once_per_burst():
+    limiter = llm.AdaptiveLimiter(8, 1, 8)
+    epochs = [limiter.acquire() for _ in range(8)]
+    # Every call in flight is throttled: one decrease, not eight
+    for epoch in epochs:
+        limiter.release(epoch, throttled=True)
+    assert limiter.limit == 4
+    # A call started after the decrease may decrease again
+    limiter.release(limiter.acquire(), throttled=True)
+    assert limiter.limit == 2
+
+@own_request
+def test_limiter_acquire_stops_at_deadline():
+    limiter = llm.AdaptiveLimiter(1, 1, 1)
+    limiter.acquire()
+    deadlines.start(0.2)
+    started = time.monotonic()
+    try:
+        limiter.acquire()
+        assert False, "expected DeadlineExceeded"
+    except deadlines.DeadlineExceeded:
+        pass
+    assert time.monotonic() - started < 0.5
+    assert limiter.in_flight == 1
+
+@own_request
+def test_limiter_acquire_wakes_on_cancel():
+    limiter = llm.AdaptiveLimiter(1, 1, 1)
+    limiter.acquire()
+    deadline = deadlines.start(None)
+    threading.Timer(0.1, deadline.cancel).start()
+    started = time.monotonic()
+    try:
+        limiter.acquire()
+        assert False, "expected Cancelled"
+    except deadlines.Cancelled:
+        pass
+    assert time.monotonic() - started < 0.5
+
+@against_fake_server(script=[429, 500, 503], retry_after_s=0)
+def test_retries_rate_limits_and_server_errors(server):
+    assert ask() == fake_llm_server.DEFAULT_REPLY
+    assert server.counts == {"requests": 4, "ok": 1, "rate_limited": 1, "server_errors": 2}
+    metrics = llm.metrics()
+    assert metrics["retries"] == 3 and metrics["rate_limited"] == 1 and metrics["server_errors"] == 2
+
+@against_fake_server(script=[500, 500, 500, 500])
+def test_gives_up_after_max_retries(server):
+    import openai
+    try:
+        ask()
+        assert False, "expected InternalServerError"
+    except openai.InternalServerError:
+        pass
+    assert server.counts["requests"] == config.LLM_MAX_RETRIES + 1
+
+@against_fake_server(script=[429], retry_after_s=0.5)
+def test_honours_retry_after(server):
+    started = time.monotonic()
+    assert ask() == fake_llm_server.DEFAULT_REPLY
+    # Full-jitter backoff alone would be at most LLM_BACKOFF_BASE_S (0.01s)
+    assert time.monotonic() - started >= 0.5
+
+@against_fake_server(script=[429], retry_after_s=5)
+def test_retry_after_is_clipped_to_deadline(server):
+    deadlines.start(0.3)
+    started = time.monotonic()
+    try:
+        ask()
+        assert False, "expected DeadlineExceeded"
+    except deadlines.DeadlineExceeded:
+        pass
+    assert time.monotonic() - started < 1.0
+    assert server.counts["requests"] == 1
+
+@against_fake_server(script=[429] * 3, retry_after_s=0)
+def test_limit_recovers_after_errors(server):
+    # Three sequential 429s, each from a call started after the previous decrease: 4 -> 1
+    ask()
+    assert llm.metrics()["concurrency_limit"] < config.LLM_MAX_CONCURRENCY
+    # About one slot back per limit's worth of successes
+    for _ in range(8):
+        ask()
+    assert llm.metrics()["concurrency_limit"] == config.LLM_MAX_CONCURRENCY
+
+@against_fake_server(script=[429] * 8, retry_after_s=0, error_latency_ms=300)
+def test_concurrent_429s_halve_the_limit_once(server):
+    config.LLM_MAX_CONCURRENCY = 8
+    threads = [threading.Thread(target=ask) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.counts["rate_limited"] == 8 and server.counts["ok"] == 8
+    # All eight were in flight together: one decrease (8 -> 4), then growth from there
+    assert llm._limiter.epoch == 1
+    assert llm._limiter.limit >= 4
+
+if __name__ == "__main__":
+    harness.run(globals())
@@ -0,0 +1,118 @@
+import random
+
+import harness  # noqa: F401  (puts api/ on sys.path)
+
+import augmenter
+import piecetable
+import utils
+
+class NaiveDocument:
+    """
+    Reference model: the edited text as a list of (char, original offset or None).
+    """
+    def __init__(self, text):
+        self.original = text
+        self.chars = [(ch, i) for i, ch in enumerate(text)]
+
+    def insert(self, offset, text):
+        self.chars[offset:offset] = [(ch, None) for ch in text]
+
+    def text(self):
+        return "".join(ch for ch, _ in self.chars)
+
+    def position(self, original_offset):
+        return next(i for i, (_, o) in enumerate(self.chars) if o == original_offset)
+
+    def to_current(self, offset, before_insertions=False):
+        if before_insertions:
+            return 0 if offset == 0 else self.position(offset - 1) + 1
+        return len(self.chars) if offset == len(self.original) else self.position(offset)
+
+def random_edits(rng, table, naive, count):
+    for _ in range(count):
+        if rng.random() < 0.5:
+            offset = rng.randrange(len(naive.original) + 1)
+            current = table.to_current(offset, before_insertions=rng.random() < 0.5)
+        else:
+            current = rng.randrange(len(naive.chars) + 1)
+        text = "".join(rng.choice("XYZ") for _ in range(rng.randrange(0, 4)))
+        assert table.insert(current, text) == (current, current + len(text))
+        naive.insert(current, text)
+
+def test_edits_match_reference():
+    rng = random.Random(1)
+    for _ in range(200):
+        original = "".join(rng.choice("abc") for _ in range(rng.randrange(0, 30)))
+        table = piecetable.PieceTable(original)
+        naive = NaiveDocument(original)
+        random_edits(rng, table, naive, rng.randrange(0, 10))
+        assert table.text() == naive.text()
+        assert len(table) == len(naive.chars)
+        assert table.original == original
+        for offset in range(len(original) + 1):
+            for before in (False, True):
+                assert table.to_current(offset, before) == naive.to_current(offset, before), (original, offset, before)
+
+def test_remap_span_keeps_the_clause():
+    text = "1. Term. Two years.\n2. Notices. In writing.\n"
+    table = piecetable.PieceTable(text)
+    start = text.index("2. Notices")
+    end = len(text) - 1
+    # Insertions right before the span, right after it and at the start of the document
+    table.insert(table.to_current(start), "1a. Survival.\n")
+    table.insert(table.to_current(end, before_insertions=True), " Extra.")
+    table.insert(table.to_current(0), "Preamble.\n")
+    new_start, new_end = table.remap_span(start, end)
+    assert table.text()[new_start:new_end] == "2. Notices. In writing."
+
+def test_shift_offset_agrees_with_piece_table():
+    rng = random.Random(2)
+    for _ in range(100):
+        original = "".join(rng.choice("ab\n") for _ in range(rng.randrange(1, 40)))
+        table = piecetable.PieceTable(original)
+        offset_map = []
+        for at in sorted(rng.randrange(len(original) + 1) for _ in range(rng.randrange(0, 6))):
+            start, end = table.insert(table.to_current(at), "N" * rng.randrange(1, 5))
+            offset_map.append([at, end - start])
+        for offset in range(len(original) + 1):
+            for before in (False, True):
+                assert piecetable.shift_offset(offset_map, offset, before) == table.to_current(offset, before)
+
+def test_apply_patches():
+    base = "alpha\ngamma\n"
+    patches = [[6, "beta\n"], [6, "beta2\n"], [len(base), "delta\n"], [0, "start\n"]]
+    assert piecetable.apply_patches(base, patches) == "start\nalpha\nbeta\nbeta2\ngamma\ndelta\n"
+    assert piecetable.apply_patches(base, patches, utils.content_hash(base)).startswith("start")
+    for bad in ([[len(base) + 1, "x"]], [[-1, "x"]]):
+        try:
+            piecetable.apply_patches(base, bad)
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+    try:
+        piecetable.apply_patches(base, patches, utils.content_hash("other"))
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+def test_remap_alignments():
+    mod = "1. Term. Two years.\n2. Notices. In writing.\n"
+    table = piecetable.PieceTable(mod)
+    notices = [mod.index("2. Notices"), len(mod) - 1]
+    table.insert(table.to_current(notices[0]), "1a. Survival. Forever.\n")
+    alignments = [
+        {"topic": "Notices", "doc_b": mod[notices[0]:notices[1]], "spans_b": [notices]},
+        {"topic": "Survival", "doc_b": "N/A"},
+    ]
+    insertion = {"text": "1a. Survival. Forever.", "span": [notices[0], notices[0] + 22]}
+    remapped = augmenter.remap_alignments(alignments, table, {1: insertion})
+    text = table.text()
+    start, end = remapped[0]["spans_b"][0]
+    assert text[start:end] == alignments[0]["doc_b"]
+    start, end = remapped[1]["spans_b"][0]
+    assert remapped[1]["augmented"] and text[start:end] == insertion["text"]
+    # The input alignments are not modified
+    assert alignments[0]["spans_b"] == [notices] and "augmented" not in alignments[1]
+
+if __name__ == "__main__":
+    harness.run(globals())
@@ -0,0 +1,41 @@
+import harness  # noqa: F401  (puts api/ on sys.path)
+
+from fastapi.testclient import TestClient
+
+import config
+import index
+
+def with_profiling(enabled, token):
+    def decorate(test):
+        def run():
+            saved = config.PROFILING_ENABLED, config.ADMIN_TOKEN
+            config.PROFILING_ENABLED, config.ADMIN_TOKEN = enabled, token
+            try:
+                test()
+            finally:
+                config.PROFILING_ENABLED, config.ADMIN_TOKEN = saved
+        run.__name__ = test.__name__
+        return run
+    return decorate
+
+@with_profiling(True, "")
+def test_no_token_means_disabled():
+    client = TestClient(index.app)
+    assert client.get("/admin/profiles").status_code == 404
+    assert client.get("/admin/profiles", headers={"X-Admin-Token": ""}).status_code == 404
+
+@with_profiling(True, "s3cret")
+def test_token_required():
+    client = TestClient(index.app)
+    assert client.get("/admin/profiles").status_code == 403
+    assert client.get("/admin/profiles", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    response = client.get("/admin/profiles", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200 and "profiles" in response.json()
+
+@with_profiling(False, "s3cret")
+def test_disabled():
+    client = TestClient(index.app)
+    assert client.get("/admin/profiles", headers={"X-Admin-Token": "s3cret"}).status_code == 404
+
+if __name__ == "__main__":
+    harness.run(globals())
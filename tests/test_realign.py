@@ -0,0 +1,162 @@
+import harness  # noqa: F401  (puts api/ on sys.path)
+
+import contextvars
+
+from fastapi.testclient import TestClient
+
+import aligner_clauses
+import aligner_local
+import config
+import deadlines
+import docstore
+import index
+import realign
+
+TARGET = (
+    "1. Definitions. Confidential Information means any information disclosed by the Discloser.\n"
+    "2. Obligations. The Recipient shall keep the Confidential Information secret at all times.\n"
+    "3. Term. This agreement remains in force for three years from the effective date.\n"
+    "4. Governing Law. This agreement is governed by the laws of England and Wales.\n"
+)
+MOD = (
+    "1. Definitions. Confidential Information means any information disclosed by the Discloser.\n"
+    "2. Obligations. The Recipient shall keep the Confidential Information secret at all times.\n"
+    "3. Term. This agreement remains in force for two years from the effective date.\n"
+    "4. Governing Law. This agreement is governed by the laws of England and Wales.\n"
+)
+
+def clause(text, number):
+    start = text.index(f"{number}. ")
+    end = text.index("\n", start)
+    return text[start:end]
+
+def standard_alignments():
+    # Standard-strategy alignments: text only, no spans or clause ids
+    return [{"topic": topic, "doc_a": clause(TARGET, n), "doc_b": clause(MOD, n)}
+            for n, topic in enumerate(["Definitions", "Confidentiality Obligations", "Term", "Governing Law"], 1)]
+
+def test_normalize_edits_rejects_bad_input():
+    for edits in ([{"start": 5, "end": 2, "text": ""}],
+                  [{"start": 0, "end": len(MOD) + 1, "text": ""}],
+                  [{"start": 0, "end": 10, "text": "a"}, {"start": 5, "end": 12, "text": "b"}],
+                  [{"end": 3, "text": "x"}],
+                  [{"start": "a", "end": 3}],
+                  [{"start": 0, "end": 1, "text": 5}],
+                  ["not an edit"]):
+        try:
+            realign.normalize_edits(edits, len(MOD))
+            assert False, f"expected ValueError for {edits}"
+        except ValueError:
+            pass
+    assert realign.normalize_edits([{"start": 9, "end": 9, "text": "b"}, {"start": 1, "end": 2}], len(MOD)) == [
+        (1, 2, ""), (9, 9, "b")]
+
+def test_order_kept_without_target_spans():
+    start = MOD.index("two years")
+    edits = realign.normalize_edits([{"start": start, "end": start + 3, "text": "five"}], len(MOD))
+    new_mod, merged, stats = realign.realign(TARGET, MOD, standard_alignments(), edits, strategy="local")
+    assert "five years" in new_mod
+    assert stats["kept"] == 3 and stats["affected"] == 1
+    # Target document order, though only the re-queried alignment has target spans
+    assert [a["doc_a"][:2] for a in merged] == ["1.", "2.", "3.", "4."]
+    assert "five years" in merged[2]["doc_b"] and merged[2]["spans_a"]
+
+def test_unlocated_alignment_stays_in_place():
+    alignments = standard_alignments()
+    alignments.insert(1, {"topic": "Recitals", "doc_a": "not in the target", "doc_b": "N/A"})
+    start = MOD.index("two years")
+    edits = realign.normalize_edits([{"start": start, "end": start + 3, "text": "five"}], len(MOD))
+    merged = realign.realign(TARGET, MOD, alignments, edits, strategy="local")[1]
+    assert [a["topic"] for a in merged][:3] == ["Definitions", "Recitals", "Confidentiality Obligations"]
+
+def test_endpoint_validation_and_errors():
+    client = TestClient(index.app)
+    body = {"target_text": TARGET, "mod_text": MOD, "alignments": standard_alignments(), "strategy": "local"}
+    response = client.post("/realign", json=dict(body, edits=[{"start": 10, "end": 5, "text": ""}]))
+    assert response.status_code == 422
+
+    start = MOD.index("two years")
+    response = client.post("/realign", json=dict(body, edits=[{"start": start, "end": start + 3, "text": "five"}]))
+    assert response.status_code == 200 and response.json()["stats"]["affected"] == 1
+
+    # A bug inside the pipeline is a server error, not an invalid request
+    original = realign.realign
+    realign.realign = lambda *args: {}["missing"]
+    try:
+        response = client.post("/realign", json=dict(body, edits=[{"start": start, "end": start + 3, "text": "five"}]))
+    finally:
+        realign.realign = original
+    assert response.status_code == 500
+
+def test_stored_alignments_must_match_documents():
+    client = TestClient(index.app)
+    target_id, mod_id = docstore.put_document(TARGET), docstore.put_document(MOD)
+    other_id = docstore.put_document(MOD.replace("two years", "ten years"))
+    alignment_id = docstore.put_alignments(standard_alignments(), target_id, mod_id)
+    start = MOD.index("two years")
+    body = {"target_id": target_id, "alignment_id": alignment_id, "strategy": "local",
+            "edits": [{"start": start, "end": start + 3, "text": "five"}]}
+
+    assert client.post("/realign", json=dict(body, mod_id=mod_id)).status_code == 200
+    # Spans from one document pair must not be applied to another
+    assert client.post("/realign", json=dict(body, mod_id=other_id)).status_code == 422
+    assert client.post("/verify", json={"target_id": target_id, "mod_id": other_id,
+                                        "alignment_id": alignment_id}).status_code == 422
+    assert client.post("/verify", json={"target_id": mod_id, "mod_id": target_id,
+                                        "alignment_id": alignment_id}).status_code == 422
+
+def two_edits():
+    first = MOD.index("two years")
+    second = MOD.index("England and Wales")
+    return [{"start": first, "end": first + 3, "text": "five"},
+            {"start": second, "end": second + 7, "text": "Scotland"}]
+
+def deadline_on_second_call():
+    """
+    Stands in for the LLM re-query: aligns locally once, then runs out of time.
+    """
+    calls = []
+
+    def align(target_text, mod_text, segments_a, segments_b):
+        calls.append(len(segments_a))
+        if len(calls) > 1:
+            raise deadlines.DeadlineExceeded("Request deadline exceeded.")
+        return aligner_local.align_documents_local(target_text, mod_text, segments_a, segments_b)
+    return align, calls
+
+def with_small_batches(test):
+    def run():
+        limit, original = config.CHUNK_INPUT_TOKENS, aligner_clauses.align_documents_clauses
+        config.CHUNK_INPUT_TOKENS = 1  # every edit in its own batch
+        try:
+            return contextvars.copy_context().run(test)
+        finally:
+            config.CHUNK_INPUT_TOKENS, aligner_clauses.align_documents_clauses = limit, original
+    run.__name__ = test.__name__
+    return run
+
+@with_small_batches
+def test_deadline_returns_finished_batches():
+    deadline = deadlines.start(None)
+    aligner_clauses.align_documents_clauses, calls = deadline_on_second_call()
+    edits = realign.normalize_edits(two_edits(), len(MOD))
+    new_mod, merged, stats = realign.realign(TARGET, MOD, standard_alignments(), edits)
+    assert len(calls) == 2 and deadline.partial
+    assert stats["batches"] == 2 and stats["stale"] == 1 and stats["kept"] == 2
+    assert [a["doc_a"][:2] for a in merged] == ["1.", "2.", "3.", "4."]
+    # The first edit's clause was re-aligned, the second's is stale
+    assert "five years" in merged[2]["doc_b"] and not merged[2].get("stale")
+    assert merged[3]["stale"] and merged[3]["doc_b"] == "N/A"
+
+@with_small_batches
+def test_endpoint_marks_partial():
+    aligner_clauses.align_documents_clauses, _ = deadline_on_second_call()
+    client = TestClient(index.app)
+    response = client.post("/realign", json={"target_text": TARGET, "mod_text": MOD, "alignments": standard_alignments(),
+                                             "edits": two_edits(), "strategy": "clauses"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["partial"] and body["stats"]["stale"] == 1
+
+if __name__ == "__main__":
+    harness.run(globals())
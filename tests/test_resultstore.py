@@ -0,0 +1,60 @@
+import os
+import tempfile
+
+import harness  # noqa: F401  (puts api/ on sys.path)
+
+import config
+import resultstore
+
+def with_store(max_results):
+    def decorate(test):
+        def run():
+            saved = config.RESULTS_DB_PATH, config.RESULTS_MAX_RESULTS
+            with tempfile.TemporaryDirectory() as tmp:
+                config.RESULTS_DB_PATH = os.path.join(tmp, "results.db")
+                config.RESULTS_MAX_RESULTS = max_results
+                resultstore._conn, resultstore._disabled = None, False
+                try:
+                    test()
+                finally:
+                    if resultstore._conn is not None:
+                        resultstore._conn.close()
+                    resultstore._conn, resultstore._disabled = None, False
+                    config.RESULTS_DB_PATH, config.RESULTS_MAX_RESULTS = saved
+        run.__name__ = test.__name__
+        return run
+    return decorate
+
+def record(n):
+    target = f"Governing Law. This agreement number {n} is governed by the laws of England."
+    mod = f"Governing Law. Agreement {n} is subject to the laws of Scotland."
+    alignments = [{"topic": "Governing Law", "doc_a": target, "doc_b": mod}]
+    return resultstore.record_alignment(alignments, target, mod, f"alignment-{n}", "standard")
+
+def test_disabled_by_default():
+    assert os.getenv("RESULTS_DB_PATH") or config.RESULTS_DB_PATH == ""
+
+@with_store(max_results=0)
+def test_records_and_searches():
+    assert resultstore.enabled()
+    first = record(1)
+    assert first is not None and record(1) == first  # recorded once per alignment id
+    clauses = resultstore.search_clauses("scotland")
+    assert len(clauses) == 1 and clauses[0]["side"] == "B" and clauses[0]["span"][0] == 0
+    assert resultstore.search_topics("govern")[0]["clauses"] == 2
+
+@with_store(max_results=2)
+def test_retention_drops_oldest():
+    for n in range(5):
+        record(n)
+    stats = resultstore.stats()
+    assert stats["results"] == {"alignment": 2} and stats["clauses"] == 4
+    # The full-text index forgets the pruned clauses too
+    found = {c["result"]["alignment_id"] for c in resultstore.search_clauses("governed", limit=50)}
+    assert found == {"alignment-3", "alignment-4"}
+    assert resultstore._conn.execute("SELECT COUNT(*) FROM clause_index WHERE clause_index MATCH 'england'").fetchone()[0] == 2
+    # Raises if the index and the clauses table disagree
+    resultstore._conn.execute("INSERT INTO clause_index (clause_index) VALUES ('integrity-check')")
+
+if __name__ == "__main__":
+    harness.run(globals())
@@ -0,0 +1,135 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+import harness  # noqa: F401  (puts api/ on sys.path)
+
+import deadlines
+import singleflight
+
+def test_make_key_is_stable():
+    assert singleflight.make_key("a", 1) == singleflight.make_key("a", 1)
+    assert singleflight.make_key("a", 1) != singleflight.make_key("a", "1 ")
+
+def test_concurrent_calls_share_one_run():
+    group = singleflight.Group()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(2)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(group.do("k", work))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while group.stats()["coalesced"] < 4:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert calls == [1]
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert all(result == "result" for result, _ in results)
+    # Nothing is kept once the call finishes
+    assert group.stats()["in_flight"] == 0
+    assert group.do("k", lambda: "again") == ("again", False)
+
+def test_error_reaches_waiters():
+    group = singleflight.Group()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(2)
+        raise ValueError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            group.do("k", fail)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(2)
+    waiter = threading.Thread(target=call)
+    waiter.start()
+    while group.stats()["coalesced"] < 1:
+        time.sleep(0.01)
+    release.set()
+    leader.join()
+    waiter.join()
+    assert errors == ["boom", "boom"]
+
+def test_waiter_reruns_after_leader_cancelled():
+    group = singleflight.Group()
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def work():
+        runs.append(threading.current_thread().name)
+        if len(runs) == 1:
+            started.set()
+            release.wait(2)
+            deadlines.check()
+        return "done"
+
+    outcome = {}
+
+    def leader():
+        deadline = deadlines.start(None)
+        outcome["leader_deadline"] = deadline
+        try:
+            group.do("k", work)
+        except deadlines.Cancelled:
+            outcome["leader"] = "cancelled"
+
+    def waiter():
+        deadlines.start(None)
+        outcome["waiter"] = group.do("k", work)
+
+    t1 = threading.Thread(target=lambda: contextvars.copy_context().run(leader), name="leader")
+    t1.start()
+    started.wait(2)
+    t2 = threading.Thread(target=lambda: contextvars.copy_context().run(waiter), name="waiter")
+    t2.start()
+    while group.stats()["coalesced"] < 1:
+        time.sleep(0.01)
+    outcome["leader_deadline"].cancel()
+    release.set()
+    t1.join()
+    t2.join()
+
+    assert outcome["leader"] == "cancelled"
+    assert outcome["waiter"] == ("done", False)
+    assert runs == ["leader", "waiter"]
+
+def test_async_group_shares_one_run():
+    group = singleflight.AsyncGroup()
+    calls = []
+
+    def work(x):
+        calls.append(x)
+        time.sleep(0.1)
+        return x * 2
+
+    async def main():
+        return await asyncio.gather(*(group.do("k", work, 21) for _ in range(4)))
+
+    results = asyncio.run(main())
+    assert calls == [21]
+    assert [r for r, _ in results] == [42] * 4
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    assert group.stats() == {"in_flight": 0, "coalesced": 3}
+
+if __name__ == "__main__":
+    harness.run(globals())
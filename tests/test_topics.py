@@ -0,0 +1,53 @@
+import harness  # noqa: F401  (puts api/ on sys.path)
+
+import augmenter
+import insertion
+import topics
+
+def test_variants_map_to_one_name():
+    topics.reset()
+    for name in ("Governing Law", "**12. Governing Laws:**", "Choice of Law", "Section 9 - Applicable Law"):
+        assert topics.canonical(name) == "Governing Law", name
+    assert topics.canonical("Non solicitation") == topics.canonical("NON-SOLICITATION") == "Non-Solicitation"
+    assert topics.canonical("No Licence") == "No License"
+    assert topics.canonical("Intelectual Property") == "Intellectual Property"
+
+def test_ambiguous_names_are_not_merged():
+    topics.reset()
+    for name, wrong in (("License", "No License"), ("Title", "Ownership"), ("Liability", "Limitation of Liability"),
+                        ("Obligations", "Confidentiality Obligations"), ("Confidentiality", "Confidentiality Obligations"),
+                        ("Period of Confidentiality", "Term"), ("Warranties", "No Warranty")):
+        assert topics.canonical(name) != wrong, name
+
+def test_new_names_are_learned():
+    topics.reset()
+    assert topics.canonical("Escrow Arrangements") == "Escrow Arrangements"
+    assert topics.canonical("1. escrow arrangement") == "Escrow Arrangements"
+    # The second spelling has the same lookup key: a table hit
+    stats = topics.stats()
+    assert stats["learned"] == 1 and stats["misses"] == 1 and stats["hits"] == 1
+    # Close variants match the learned name
+    assert topics.canonical("Escrow Arrangments") == "Escrow Arrangements"
+    topics.reset()
+    assert topics.stats()["table"] == 0 and topics.stats()["learned"] == 0
+
+def alignments(first_name, second_name):
+    # The same canonical topic under two model names: missing once, found once
+    mod = "1. Law. This agreement is governed by English law.\n"
+    return mod, [
+        {"topic": "Governing Law", "model_topic": first_name, "doc_a": "Governed by the laws of England.", "doc_b": "N/A"},
+        {"topic": "Governing Law", "model_topic": second_name, "doc_a": "English law applies.",
+         "doc_b": "This agreement is governed by English law."},
+    ]
+
+def test_missing_topic_kept_unless_named_exactly():
+    mod, different = alignments("Choice of Law", "Governing Law")
+    assert [m["topic"] for m in augmenter.identify_missing_topics(different)] == ["Governing Law"]
+    assert [p["topic"] for p in insertion.plan_insertions(mod, different)] == ["Governing Law"]
+
+    mod, same = alignments("Governing Law", "**Governing law**")
+    assert augmenter.identify_missing_topics(same) == []
+    assert insertion.plan_insertions(mod, same) == []
+
+if __name__ == "__main__":
+    harness.run(globals())
@@ -0,0 +1,61 @@
+import harness  # noqa: F401  (puts api/ on sys.path)
+
+import json
+import os
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+
+from fastapi.testclient import TestClient
+
+import index
+import utils
+
+def crash(*args):
+    # Kills the worker process, as a segfaulting PDF parser would
+    os._exit(1)
+
+def upload(client, *texts):
+    files = [("files", (f"note{i}.txt", text.encode("utf-8"), "text/plain")) for i, text in enumerate(texts)]
+    response = client.post("/upload/batch", files=files)
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def with_fresh_pool(test):
+    def run():
+        index._upload_pool = None
+        try:
+            test()
+        finally:
+            if index._upload_pool is not None:
+                index._upload_pool.shutdown()
+            index._upload_pool = None
+    run.__name__ = test.__name__
+    return run
+
+@with_fresh_pool
+def test_worker_crash_does_not_break_later_batches():
+    client = TestClient(index.app)
+    original = utils.extract_upload
+    utils.extract_upload = crash
+    try:
+        lines = upload(client, "crashes the worker")
+    finally:
+        utils.extract_upload = original
+    assert "error" in lines[0] and "content" not in lines[0]
+
+    lines = upload(client, "extracted by a new pool")
+    assert lines[0]["content"].strip() == "extracted by a new pool"
+
+@with_fresh_pool
+def test_pool_broken_between_batches_is_replaced():
+    if not isinstance(index.get_upload_pool(), ProcessPoolExecutor):
+        return
+    try:
+        index._upload_pool.submit(os._exit, 1).result()
+    except BrokenExecutor:
+        pass
+    client = TestClient(index.app)
+    lines = upload(client, "after the crash")
+    assert lines[0]["content"].strip() == "after the crash"
+
+if __name__ == "__main__":
+    harness.run(globals())
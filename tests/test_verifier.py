@@ -0,0 +1,72 @@
+import random
+
+import harness  # noqa: F401  (puts api/ on sys.path)
+
+import verifier
+
+def brute_first(pattern, text):
+    start = text.find(pattern)
+    return None if start == -1 else (start, start + len(pattern))
+
+def test_overlapping_patterns():
+    patterns = ["he", "she", "his", "hers", "usher", "xyz"]
+    text = "ushers and his sheep"
+    assert verifier.find_all_first(patterns, text) == [brute_first(p, text) for p in patterns]
+
+def test_matches_str_find_on_random_text():
+    rng = random.Random(7)
+    for _ in range(200):
+        text = "".join(rng.choice("abc ") for _ in range(rng.randrange(0, 60)))
+        patterns = []
+        for _ in range(rng.randrange(1, 8)):
+            if text and rng.random() < 0.7:
+                start = rng.randrange(len(text))
+                patterns.append(text[start:start + rng.randrange(1, 8)])
+            else:
+                patterns.append("".join(rng.choice("abc") for _ in range(rng.randrange(1, 5))))
+        assert verifier.find_all_first(patterns, text) == [brute_first(p, text) for p in patterns], (patterns, text)
+
+def test_normalize_with_map_offsets():
+    text = "  Governing\n law  of\tEngland \n"
+    normalized, offsets = verifier.normalize_with_map(text)
+    assert normalized == "Governing law of England"
+    assert len(offsets) == len(normalized) + 1
+    for i, ch in enumerate(normalized):
+        assert text[offsets[i]] == ch or (ch == " " and text[offsets[i]].isspace())
+    assert offsets[-1] == text.index("England") + len("England")
+
+def test_normalize_with_map_matches_normalize_text():
+    rng = random.Random(11)
+    for _ in range(200):
+        text = "".join(rng.choice("ab \n\t") for _ in range(rng.randrange(0, 40)))
+        normalized, offsets = verifier.normalize_with_map(text)
+        assert normalized == verifier.normalize_text(text), repr(text)
+        assert len(offsets) == len(normalized) + 1
+        assert all(text[offsets[i]] == ch for i, ch in enumerate(normalized) if ch != " ")
+
+def test_verify_document_statuses():
+    doc = "1. Term.\nThis Agreement lasts\ntwo years.\n2. Notices. Notices must be in writing."
+    clauses = [
+        "Notices must be in writing.",          # verbatim
+        "This Agreement lasts two years.",      # line break in the document
+        "This Agreement last two years.",       # one edit away
+        "Completely unrelated wording here.",   # not in the document
+        "N/A",
+    ]
+    results = verifier.verify_document(clauses, doc)
+    assert [r["status"] for r in results] == ["exact", "normalized", "approximate", "missing", "skipped"]
+    start, end = results[0]["span"]
+    assert doc[start:end] == clauses[0]
+    start, end = results[1]["span"]
+    assert doc[start:end] == "This Agreement lasts\ntwo years."
+    assert results[2]["edit_distance"] == 2
+
+def test_verify_alignments_summary():
+    report = verifier.verify_alignments(
+        [{"topic": "Term", "doc_a": "lasts two years", "doc_b": "N/A"}],
+        "It lasts two years.", "Nothing here.")
+    assert report["valid"] and report["valid_normalized"]
+    assert report["summary"]["exact"] == 1 and report["summary"]["skipped"] == 1
+
+if __name__ == "__main__":
+    harness.run(globals())